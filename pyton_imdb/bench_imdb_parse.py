@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Benchmark the IMDb extraction code over saved HTML fixtures, without touching the network.
+
+Usage:
+  python bench_imdb_parse.py --repeat 50
+  python bench_imdb_parse.py --collect          # add pages from the fetch cache to the corpus
+  python bench_imdb_parse.py --json before.json
+  python bench_imdb_parse.py --baseline before.json
+
+Options:
+  --fixtures   Fixture corpus with title/, search/ and credits/ subdirectories
+               of saved .html pages (default: fixtures/ next to this script)
+  --repeat     Passes over each page per extractor (default 20)
+  --collect    Copy every title, find and fullcredits page in the imdb_fetch
+               cache into the corpus first, then benchmark
+  --json       Write the results to this file
+  --baseline   Compare against an earlier --json file and exit 1 when pages/s
+               drops by more than --tolerance (default 0.15)
+
+Behavior:
+  - title pages run through parse_title_page() (split into lxml parse and
+    extract), parse_imdb_details() and imdb_info_from_page(); search pages
+    through match_search_results() with a title that matches nothing, so every
+    result is examined; credits pages through has_credit()
+  - Per-field times are the compiled HTML_FIELDS XPaths plus the
+    __NEXT_DATA__ and JSON-LD decoders, each timed alone over the title pages
+  - Memory per page is the tracemalloc peak of one extraction, taken in a
+    separate pass; it counts Python allocations only, so lxml trees (C heap)
+    are mostly invisible to it while BeautifulSoup trees are not
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+from lxml import html as lxml_html
+
+import imdb_fetch
+import imdb_parse
+from extract_imdb_info import imdb_info_from_page
+from imdb_scraper import parse_imdb_details
+from veirfy_urls import has_credit, match_search_results
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+KINDS = ('title', 'search', 'credits')
+NO_MATCH = {'title': '\x00', 'year': ''}
+
+
+def load_fixtures(root):
+    corpus = {}
+    for kind in KINDS:
+        directory = os.path.join(root, kind)
+        names = sorted(n for n in os.listdir(directory) if n.endswith('.html')) if os.path.isdir(directory) else []
+        corpus[kind] = []
+        for name in names:
+            with open(os.path.join(directory, name), 'rb') as f:
+                corpus[kind].append((name, f.read()))
+    return corpus
+
+
+def fixture_kind(url):
+    if '/fullcredits' in url:
+        return 'credits'
+    if '/find' in url:
+        return 'search'
+    if '/title/tt' in url:
+        return 'title'
+    return None
+
+
+def collect(root):
+    """Copy the cached IMDb pages into the corpus. Returns the number of new fixtures."""
+    meta_dir = os.path.join(imdb_fetch.CACHE_DIR, 'meta')
+    added = 0
+    for name in sorted(os.listdir(meta_dir)) if os.path.isdir(meta_dir) else []:
+        with open(os.path.join(meta_dir, name), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        kind = fixture_kind(meta['url'])
+        if kind is None or 'html' not in (meta.get('content_type') or 'html'):
+            continue
+        dest = os.path.join(root, kind, meta['blob'][:16] + '.html')
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(imdb_fetch._blob_path(meta['blob']), dest)
+            added += 1
+    return added
+
+
+def extractors():
+    """(name, page kind, function taking the raw page)."""
+    text = lambda page: page.decode('utf-8', errors='replace')
+    return [
+        ('lxml parse', 'title', lxml_html.fromstring),
+        ('extract_title_page', 'title', None),
+        ('parse_title_page', 'title', imdb_parse.parse_title_page),
+        ('parse_imdb_details', 'title', lambda page: parse_imdb_details('bench', 'https://www.imdb.com/title/tt0000000/', page)),
+        ('imdb_info_from_page', 'title', lambda page: imdb_info_from_page(imdb_parse.parse_title_page(page))),
+        ('match_search_results', 'search', lambda page: match_search_results(NO_MATCH, text(page))),
+        ('has_credit', 'credits', lambda page: has_credit(text(page), 'Hila Yuval')),
+    ]
+
+
+def time_pages(fn, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            fn(page)
+    return time.perf_counter() - start
+
+
+def peak_kib(fn, pages):
+    peaks = []
+    for page in pages:
+        tracemalloc.start()
+        fn(page)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks) / 1024
+
+
+def bench_extractors(corpus, repeat):
+    rows = []
+    for name, kind, fn in extractors():
+        pages = [page for _, page in corpus[kind]]
+        if not pages:
+            continue
+        if fn is None:
+            # Extraction alone, on documents parsed up front.
+            docs = [lxml_html.fromstring(page) for page in pages]
+            pages, fn = docs, imdb_parse.extract_title_page
+        seconds = time_pages(fn, pages, repeat)
+        count = len(pages) * repeat
+        rows.append({
+            'extractor': name,
+            'kind': kind,
+            'pages': count,
+            'pages_per_s': round(count / seconds, 1),
+            'ms_per_page': round(seconds / count * 1000, 3),
+            'py_kib_per_page': round(peak_kib(fn, pages), 1),
+        })
+    return rows
+
+
+def bench_fields(corpus, repeat):
+    docs = [lxml_html.fromstring(page) for _, page in corpus['title']]
+    if not docs:
+        return []
+    fields = [(f"{name} ({kind})", xpath) for name, kind, xpath in imdb_parse._COMPILED]
+    fields.append(('__NEXT_DATA__', lambda doc: imdb_parse._load_json(imdb_parse._NEXT_DATA(doc))))
+    fields.append(('JSON-LD', lambda doc: imdb_parse._load_json(imdb_parse._JSON_LD(doc))))
+    rows = []
+    for name, fn in fields:
+        seconds = time_pages(fn, docs, repeat)
+        rows.append({'field': name, 'us_per_page': round(seconds / (len(docs) * repeat) * 1e6, 1)})
+    return sorted(rows, key=lambda r: -r['us_per_page'])
+
+
+def print_table(rows):
+    if not rows:
+        return
+    keys = list(rows[0])
+    widths = [max(len(k), *(len(str(r[k])) for r in rows)) for k in keys]
+    print("  ".join(k.ljust(w) for k, w in zip(keys, widths)))
+    for row in rows:
+        print("  ".join(str(row[k]).ljust(w) for k, w in zip(keys, widths)))
+
+
+def compare(rows, baseline_path, tolerance):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {r['extractor']: r for r in json.load(f)['extractors']}
+    regressed = False
+    for row in rows:
+        before = baseline.get(row['extractor'])
+        if not before:
+            continue
+        change = row['pages_per_s'] / before['pages_per_s'] - 1
+        flag = "  REGRESSION" if change < -tolerance else ""
+        regressed |= bool(flag)
+        print(f"  {row['extractor']:<22} {before['pages_per_s']:>10} -> {row['pages_per_s']:>10} pages/s ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the IMDb extraction code over saved HTML fixtures.")
+    parser.add_argument("--fixtures", default=FIXTURES, help="Fixture corpus directory")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over each page per extractor")
+    parser.add_argument("--collect", action="store_true", help="Add the pages in the imdb_fetch cache to the corpus first")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Earlier --json file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed pages/s drop against --baseline")
+    args = parser.parse_args()
+
+    if args.collect:
+        print(f"Collected {collect(args.fixtures)} new fixtures from {imdb_fetch.CACHE_DIR}")
+    corpus = load_fixtures(args.fixtures)
+    print("Fixtures: " + ", ".join(f"{len(corpus[k])} {k}" for k in KINDS))
+    if not any(corpus.values()):
+        sys.exit(f"No fixtures under {args.fixtures}")
+
+    extractor_rows = bench_extractors(corpus, args.repeat)
+    field_rows = bench_fields(corpus, args.repeat)
+    print()
+    print_table(extractor_rows)
+    print()
+    print_table(field_rows)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'repeat': args.repeat, 'extractors': extractor_rows, 'fields': field_rows}, f, indent=2)
+    if args.baseline:
+        print(f"\nAgainst {args.baseline}:")
+        if compare(extractor_rows, args.baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import argparse
 import json
-import requests
-from bs4 import BeautifulSoup
-import time
-import re
+
+import imdb_profile
+from imdb_fetch import fetch
+from imdb_journal import Journal, write_json_atomic
+from imdb_parse import parse_title_page
 
 def extract_imdb_info(url):
     """
@@ -14,78 +16,18 @@ def extract_imdb_info(url):
     Returns:
         dict: A dictionary containing director and production_company information
     """
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     result = {
         'director': [],
         'production_company': []
     }
     
     try:
-        # Add a delay to avoid being rate-limited
-        time.sleep(1)
-        
-        # Make the request
-        response = requests.get(url, headers=headers)
+        # Make the request (served from the local cache when fresh; rate-limited otherwise)
+        response = fetch(url)
         response.raise_for_status()
         
-        # Parse the HTML content
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Find the director(s)
-        # Different IMDb pages may have different structures, so we try multiple selectors
-        director_section = soup.find('section', string=re.compile(r'Director|Directors', re.IGNORECASE))
-        if director_section:
-            director_links = director_section.find_all('a')
-            for link in director_links:
-                if link.text.strip() and not link.text.strip().startswith('See '):
-                    result['director'].append(link.text.strip())
-        
-        # Try another selector for directors
-        director_div = soup.find('div', {'data-testid': 'title-pc-principal-credit'})
-        if director_div and not result['director']:
-            director_links = director_div.find_all('a')
-            for link in director_links:
-                if link.text.strip() and not link.text.strip().startswith('See '):
-                    result['director'].append(link.text.strip())
-                    
-        # Find the production company
-        company_section = soup.find('section', string=re.compile(r'Production company|Production companies', re.IGNORECASE))
-        if company_section:
-            company_links = company_section.find_all('a')
-            for link in company_links:
-                if link.text.strip() and not link.text.strip().startswith('See '):
-                    result['production_company'].append(link.text.strip())
-        
-        # Try another way to find production companies
-        company_div = soup.find('li', {'data-testid': 'title-details-companies'})
-        if company_div and not result['production_company']:
-            company_links = company_div.find_all('a')
-            for link in company_links:
-                if link.text.strip() and not link.text.strip().startswith('See '):
-                    result['production_company'].append(link.text.strip())
-        
-        # For TV series, try to find creators as alternative to directors
-        if not result['director']:
-            creator_section = soup.find('section', string=re.compile(r'Creator|Creators', re.IGNORECASE))
-            if creator_section:
-                creator_links = creator_section.find_all('a')
-                for link in creator_links:
-                    if link.text.strip() and not link.text.strip().startswith('See '):
-                        result['director'].append(link.text.strip() + " (Creator)")
-        
-        # Convert lists to strings if needed
-        if result['director']:
-            result['director'] = ", ".join(result['director'])
-        else:
-            result['director'] = "Not found"
-            
-        if result['production_company']:
-            result['production_company'] = ", ".join(result['production_company'])
-        else:
-            result['production_company'] = "Not found"
+        # Parse the page once; directors and companies come from the shared extraction schema
+        result = imdb_info_from_page(parse_title_page(response.content))
             
     except Exception as e:
         print(f"Error extracting info from {url}: {e}")
@@ -94,17 +36,57 @@ def extract_imdb_info(url):
         
     return result
 
-def update_portfolio_with_imdb_info(input_file, output_file):
+def imdb_info_from_page(page):
+    """
+    Build the director / production company strings from a parse_title_page() record.
+
+    Args:
+        page (dict): The parsed title page
+
+    Returns:
+        dict: ``director`` and ``production_company`` strings ("Not found" when empty)
+    """
+    director = [name for name in page['directors'] if not name.startswith('See ')]
+    companies = [name for name in page['companies'] if not name.startswith('See ')]
+
+    # For TV series, use the creators as an alternative to directors
+    if not director:
+        director = [name + " (Creator)" for name in page['creators'] if not name.startswith('See ')]
+
+    return {
+        'director': ", ".join(director) if director else "Not found",
+        'production_company': ", ".join(companies) if companies else "Not found",
+    }
+
+def merge_imdb_info(project, info):
+    """Fill in a portfolio project's missing director / production company from ``info``. Returns True if either changed."""
+    changed = False
+    for field in ('director', 'production_company'):
+        if (project.get(field) == "Not specified" or not project.get(field)) and project.get(field) != info[field]:
+            project[field] = info[field]
+            changed = True
+    return changed
+
+def update_portfolio_with_imdb_info(input_file, output_file, journal_file=None):
     """
     Update the portfolio JSON with director and production company information.
+
+    Each successful lookup is appended to a JSONL journal as soon as it finishes,
+    and a restarted run takes earlier lookups from the journal instead of asking
+    IMDb again. The output file is written (atomically) from the journal at the end.
     
     Args:
         input_file (str): Path to the input JSON file
         output_file (str): Path to the output JSON file
+        journal_file (str): Path to the checkpoint journal (default: output_file + ".journal.jsonl")
     """
     # Load the portfolio data
     with open(input_file, 'r', encoding='utf-8') as f:
         portfolio = json.load(f)
+
+    journal = Journal(journal_file or output_file + ".journal.jsonl")
+    if len(journal):
+        print(f"Resuming: {len(journal)} lookups already in {journal.path}")
     
     # Process each project
     for i, project in enumerate(portfolio):
@@ -120,23 +102,37 @@ def update_portfolio_with_imdb_info(input_file, output_file):
             print(f"  Already has info: {project['title']}")
             continue
         
-        # Extract info from IMDb
+        # Extract info from IMDb, unless an earlier run already did
+        if project['imdb_url'] in journal:
+            continue
         info = extract_imdb_info(project['imdb_url'])
+        if info['director'] != "Error":
+            journal.append(project['imdb_url'], info)
+
+    # Compaction: apply the journal to the portfolio and rewrite both files
+    for project in portfolio:
+        info = journal.get(project.get('imdb_url'))
+        if not info:
+            continue
         
-        # Update the project data
-        if project.get('director') == "Not specified" or not project.get('director'):
-            project['director'] = info['director']
-        
-        if project.get('production_company') == "Not specified" or not project.get('production_company'):
-            project['production_company'] = info['production_company']
+        merge_imdb_info(project, info)
     
     # Save the updated portfolio data
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(portfolio, f, ensure_ascii=False, indent=2)
+    write_json_atomic(output_file, portfolio)
+    journal.compact()
+    journal.close()
     
     print(f"Updated portfolio saved to {output_file}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Fill in director and production company from IMDb for the portfolio projects.")
+    parser.add_argument("--input", default="../data/portfolio_new.json", help="Portfolio JSON to update")
+    parser.add_argument("--output", default="../data/portfolio_updated.json", help="Where the updated portfolio is written")
+    imdb_profile.add_arguments(parser)
+    args = parser.parse_args()
+    imdb_profile.from_args(args)
+    update_portfolio_with_imdb_info(args.input, args.output)
+    imdb_profile.report(args.profile_out)
+
 if __name__ == "__main__":
-    input_file = "../data/portfolio_new.json"
-    output_file = "../data/portfolio_updated.json"
-    update_portfolio_with_imdb_info(input_file, output_file)
\ No newline at end of file
+    main()
\ No newline at end of file
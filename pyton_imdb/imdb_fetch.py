@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from imdb_profile import stage
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+CACHE_DIR = os.environ.get('IMDB_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.imdb-cache'))
+CACHE_TTL = float(os.environ.get('IMDB_CACHE_TTL', 7 * 24 * 3600))
+RATE = float(os.environ.get('IMDB_RATE', 1.0))
+BURST = int(os.environ.get('IMDB_BURST', 1))
+TIMEOUT = 15
+
+_session = None
+_session_lock = threading.Lock()
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average and up to ``burst`` at once."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Block until a token is available, then consume it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CachedResponse:
+    """The parts of a requests.Response the scripts use, served from the network or the cache."""
+
+    def __init__(self, url, status_code, content, headers=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} for url: {self.url}", response=self)
+
+
+def get_session(pool_size=10):
+    """
+    Return the shared requests session (created on first use).
+
+    Args:
+        pool_size (int): Connections kept alive per host
+
+    Returns:
+        requests.Session: A session with pooled keep-alive connections
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def set_rate(rate, burst=1):
+    """
+    Set the politeness limit applied to network requests (cache hits are free).
+
+    Args:
+        rate (float): Requests per second allowed per host
+        burst (int): Requests per host that may go out back to back
+    """
+    global RATE, BURST
+    with _buckets_lock:
+        RATE, BURST = rate, burst
+        _buckets.clear()
+
+
+def _wait_turn(url):
+    """Take a token from the per-host bucket, sleeping if the host is at its rate."""
+    host = urlparse(url).netloc
+    with _buckets_lock:
+        bucket = _buckets.get(host)
+        if bucket is None:
+            bucket = _buckets[host] = TokenBucket(RATE, BURST)
+    bucket.take()
+
+
+def _meta_path(url):
+    return os.path.join(CACHE_DIR, 'meta', hashlib.sha256(url.encode('utf-8')).hexdigest() + '.json')
+
+
+def _blob_path(digest):
+    return os.path.join(CACHE_DIR, 'blobs', digest[:2], digest)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _load(url):
+    try:
+        with open(_meta_path(url), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(_blob_path(meta['blob']), 'rb') as f:
+            return meta, f.read()
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+
+def _store(url, response):
+    """Save a 200 response: the body under its SHA-256, the validators under the URL."""
+    digest = hashlib.sha256(response.content).hexdigest()
+    blob = _blob_path(digest)
+    if not os.path.exists(blob):
+        _write_atomic(blob, response.content)
+    meta = {
+        'url': url,
+        'blob': digest,
+        'fetched_at': time.time(),
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'content_type': response.headers.get('Content-Type'),
+    }
+    _write_atomic(_meta_path(url), json.dumps(meta).encode('utf-8'))
+    return meta
+
+
+def _touch(url, meta):
+    meta['fetched_at'] = time.time()
+    _write_atomic(_meta_path(url), json.dumps(meta).encode('utf-8'))
+
+
+def fetch(url, session=None, ttl=None, headers=None, use_cache=True):
+    """
+    GET a page through the on-disk cache.
+
+    Fresh entries (younger than ``ttl`` seconds) are served without touching the
+    network. Stale entries are revalidated with If-None-Match / If-Modified-Since,
+    and a 304 reuses the cached body. Only 200 responses are cached; bodies are
+    stored once per content hash, so identical pages share one file.
+
+    Args:
+        url (str): The URL to fetch
+        session (requests.Session): Session to use (default: the shared pooled session)
+        ttl (float): Seconds a cached response stays fresh (default CACHE_TTL)
+        headers (dict): Extra request headers
+        use_cache (bool): Set to False to always go to the network
+
+    Returns:
+        CachedResponse: status_code, content, text, headers and from_cache
+    """
+    session = session or get_session()
+    ttl = CACHE_TTL if ttl is None else ttl
+    meta, body = _load(url) if use_cache else (None, None)
+    if meta and time.time() - meta['fetched_at'] < ttl:
+        return CachedResponse(url, 200, body, {'Content-Type': meta.get('content_type')}, from_cache=True)
+
+    request_headers = dict(DEFAULT_HEADERS, **(headers or {}))
+    if meta:
+        if meta.get('etag'):
+            request_headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            request_headers['If-Modified-Since'] = meta['last_modified']
+
+    _wait_turn(url)
+    with stage('fetch'):
+        response = session.get(url, headers=request_headers, timeout=TIMEOUT)
+    if response.status_code == 304 and meta:
+        _touch(url, meta)
+        return CachedResponse(url, 200, body, {'Content-Type': meta.get('content_type')}, from_cache=True)
+    if response.status_code == 200 and use_cache:
+        _store(url, response)
+    return CachedResponse(url, response.status_code, response.content, dict(response.headers))
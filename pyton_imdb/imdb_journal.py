@@ -0,0 +1,80 @@
+import json
+import os
+import threading
+
+from imdb_profile import stage
+
+
+class Journal:
+    """
+    Append-only JSONL checkpoint of finished records, keyed by a string (usually the IMDb URL).
+
+    Every record is flushed to disk as soon as it is appended, so a crash loses at
+    most the record being written. Opening an existing journal resumes from it: the
+    last record written for a key wins, and a torn final line is ignored, as are
+    records rejected by ``valid`` (e.g. a journal written by another script).
+    """
+
+    def __init__(self, path, valid=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.records = {}
+        torn = False
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    torn = not line.endswith('\n')
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if valid is None or valid(entry['record']):
+                        self.records[entry['key']] = entry['record']
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+        if torn:
+            # Terminate the torn line so the next record starts on a line of its own.
+            self.file.write('\n')
+
+    def __contains__(self, key):
+        return key in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    def get(self, key, default=None):
+        return self.records.get(key, default)
+
+    def append(self, key, record):
+        line = json.dumps({'key': key, 'record': record}, ensure_ascii=False)
+        with self.lock, stage('write'):
+            self.file.write(line + '\n')
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.records[key] = record
+
+    def compact(self):
+        """Rewrite the journal with one line per key, dropping superseded and torn lines."""
+        with self.lock:
+            self.file.close()
+            write_atomic(self.path, ''.join(json.dumps({'key': k, 'record': r}, ensure_ascii=False) + '\n'
+                                            for k, r in self.records.items()))
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def write_atomic(path, text):
+    """Write ``text`` to ``path`` via a temporary file, so readers never see a half-written file."""
+    with stage('write'):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+
+def write_json_atomic(path, data):
+    write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
@@ -0,0 +1,222 @@
+import json
+import re
+
+from lxml import etree, html as lxml_html
+
+from imdb_profile import stage
+
+
+def _cls(name):
+    """XPath test equivalent to the CSS class selector ``.name``."""
+    return f'contains(concat(" ", normalize-space(@class), " "), " {name} ")'
+
+
+def _credit(label):
+    return f'//li[@data-testid="title-pc-principal-credit"][.//span[contains(., "{label}")]]//a'
+
+
+# Field schema for the rendered page: (name, kind, xpath). "text" takes the first
+# match, "list" every match, "attr" the first matching attribute value. Each
+# XPath is the union of the selectors IMDb has used for the field over time and
+# is compiled once at import.
+HTML_FIELDS = [
+    ('title', 'text', '//h1[@data-testid="hero__pageTitle"]'),
+    ('year', 'text', f'//span[{_cls("sc-8c396aa2-2")}] | //*[{_cls("TitleBlockMetaData__ListItemText-sc-12ein40-2")}]'),
+    ('rating', 'text', f'//span[{_cls("sc-7ab21ed2-1")}] | //*[{_cls("AggregateRatingButton__RatingScore-sc-1ll29m0-1")}]'
+                       ' | //div[@data-testid="hero-rating-bar__aggregate-rating__score"]/span[1]'),
+    ('genres', 'list', f'//a[contains(@href, "/search/title/?genres=")] | //span[{_cls("ipc-chip__text")}]'),
+    ('runtime', 'text', '//li[@data-testid="title-techspec_runtime"]//span'
+                        f' | //*[{_cls("TitleBlockMetaData__ListItemText-sc-12ein40-2")}]'),
+    ('plot', 'text', f'//*[@data-testid="plot-xl"] | //*[{_cls("GenresAndPlot__TextContainerBreakpointXS_TO_M-cum89p-0")}]'),
+    ('languages', 'list', '//li[@data-testid="title-details-languages"]//a'),
+    ('countries', 'list', '//li[@data-testid="title-details-origin"]//a'),
+    ('companies', 'list', '//li[@data-testid="title-details-companies"]//a'),
+    ('poster', 'attr', f'//img[{_cls("ipc-image")}][contains(@alt, "Poster")]/@src | //*[{_cls("poster")}]//img/@src'),
+    ('cast', 'list', '//a[@data-testid="title-cast-item__actor"] | //*[@data-testid="title-cast-item__actor"]//a'
+                     f' | //*[{_cls("cast_list")}]//td[{_cls("primary_photo")}]/following-sibling::td[1]//a'),
+    ('creators', 'list', _credit('Creator')),
+    ('directors', 'list', _credit('Director')),
+    ('writers', 'list', _credit('Writer')),
+    ('box_office', 'text', '//li[@data-testid="title-boxoffice-cumulativeworldwidegross"]//span'),
+    ('budget', 'text', '//li[@data-testid="title-boxoffice-budget"]//span'),
+    ('release_date', 'text', '//li[@data-testid="title-details-releasedate"]//a'),
+    ('episodes', 'text', f'//li[@data-testid="episodes-header"]//span | //*[{_cls("bp_heading")}][contains(., "Episode Guide")]'),
+]
+
+_COMPILED = [(name, kind, etree.XPath(xpath)) for name, kind, xpath in HTML_FIELDS]
+_JSON_LD = etree.XPath('//script[@type="application/ld+json"]/text()')
+_NEXT_DATA = etree.XPath('//script[@id="__NEXT_DATA__"]/text()')
+
+
+def _text(node):
+    value = node if isinstance(node, str) else node.text_content()
+    return ' '.join(value.split())
+
+
+def _dig(obj, *path):
+    for key in path:
+        if isinstance(obj, dict):
+            obj = obj.get(key)
+        elif isinstance(obj, list) and isinstance(key, int) and -len(obj) <= key < len(obj):
+            obj = obj[key]
+        else:
+            return None
+    return obj
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _names(items, kind=None):
+    return [i['name'] for i in _as_list(items) if isinstance(i, dict) and i.get('name') and (kind is None or i.get('@type') == kind)]
+
+
+def _runtime(seconds):
+    hours, minutes = divmod(int(seconds) // 60, 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+
+def _iso_duration(value):
+    match = re.fullmatch(r'PT(?:(\d+)H)?(?:(\d+)M)?', value or '')
+    if not match or not any(match.groups()):
+        return None
+    return _runtime(int(match.group(1) or 0) * 3600 + int(match.group(2) or 0) * 60)
+
+
+def _money(amount):
+    if not amount or amount.get('amount') is None:
+        return None
+    return f"{amount.get('currency', '')} {amount['amount']:,}".strip()
+
+
+def _date(release):
+    """ISO date ("2024-03-14", or "2024-03" / "2024" when partial), as JSON-LD datePublished gives it."""
+    parts = []
+    for key, width in (('year', 4), ('month', 2), ('day', 2)):
+        if not release.get(key):
+            break
+        parts.append(f"{int(release[key]):0{width}d}")
+    return '-'.join(parts) or None
+
+
+def _from_next_data(data):
+    """Fields from the ``__NEXT_DATA__`` blob IMDb's React pages embed."""
+    page = _dig(data, 'props', 'pageProps') or {}
+    top = page.get('aboveTheFoldData') or {}
+    main = page.get('mainColumnData') or {}
+    credits = {}
+    for group in _as_list(top.get('principalCredits')) + _as_list(main.get('principalCredits')):
+        label = (_dig(group, 'category', 'text') or '').lower()
+        people = [_dig(c, 'name', 'nameText', 'text') for c in _as_list(group.get('credits'))]
+        credits.setdefault(label.rstrip('s'), [p for p in people if p])
+    release = main.get('releaseDate') or top.get('releaseDate') or {}
+    episodes = _dig(main, 'episodes', 'episodes', 'total')
+    title_type = _dig(top, 'titleType', 'id') or ''
+    return {
+        'title': _dig(top, 'titleText', 'text'),
+        'year': str(_dig(top, 'releaseYear', 'year') or '') or None,
+        'rating': str(_dig(top, 'ratingsSummary', 'aggregateRating') or '') or None,
+        'genres': [g.get('text') for g in _as_list(_dig(top, 'genres', 'genres')) if g.get('text')],
+        'runtime': _runtime(_dig(top, 'runtime', 'seconds')) if _dig(top, 'runtime', 'seconds') else None,
+        'plot': _dig(top, 'plot', 'plotText', 'plainText'),
+        'languages': [l.get('text') for l in _as_list(_dig(main, 'spokenLanguages', 'spokenLanguages')) if l.get('text')],
+        'countries': [c.get('text') for c in _as_list(_dig(main, 'countriesOfOrigin', 'countries')) if c.get('text')],
+        'companies': [_dig(e, 'node', 'company', 'companyText', 'text') for e in _as_list(_dig(main, 'production', 'edges'))
+                      if _dig(e, 'node', 'company', 'companyText', 'text')],
+        'poster': _dig(top, 'primaryImage', 'url'),
+        'cast': [_dig(e, 'node', 'name', 'nameText', 'text') for e in _as_list(_dig(main, 'cast', 'edges'))
+                 if _dig(e, 'node', 'name', 'nameText', 'text')],
+        'creators': credits.get('creator', []),
+        'directors': credits.get('director', []),
+        'writers': credits.get('writer', []),
+        'box_office': _money(_dig(main, 'worldwideGross', 'total')),
+        'budget': _money(_dig(main, 'productionBudget', 'budget')),
+        'release_date': _date(release),
+        'episodes': f"{episodes} episodes" if episodes else None,
+        'type': ('TV Series' if title_type.startswith('tv') and title_type != 'tvMovie' else 'Film') if title_type else None,
+    }
+
+
+def _from_json_ld(ld):
+    """Fields from the schema.org JSON-LD block."""
+    person_creators = _names(ld.get('creator'), 'Person')
+    is_series = ld.get('@type') == 'TVSeries'
+    return {
+        'title': ld.get('name'),
+        'year': (ld.get('datePublished') or '')[:4] or None,
+        'rating': str(_dig(ld, 'aggregateRating', 'ratingValue') or '') or None,
+        'genres': _as_list(ld.get('genre')),
+        'runtime': _iso_duration(ld.get('duration')),
+        'plot': ld.get('description'),
+        'companies': _names(ld.get('creator'), 'Organization'),
+        'poster': ld.get('image'),
+        'cast': _names(ld.get('actor')),
+        'creators': person_creators if is_series else [],
+        'directors': _names(ld.get('director')),
+        'writers': [] if is_series else person_creators,
+        'release_date': ld.get('datePublished'),
+        'type': ('TV Series' if is_series else 'Film') if ld.get('@type') else None,
+    }
+
+
+def _from_html(doc):
+    record = {}
+    for name, kind, xpath in _COMPILED:
+        matches = [m for m in (_text(n) for n in xpath(doc)) if m]
+        record[name] = matches if kind == 'list' else (matches[0] if matches else None)
+    return record
+
+
+def _load_json(texts):
+    for text in texts:
+        try:
+            data = json.loads(text)
+        except ValueError:
+            continue
+        return data[0] if isinstance(data, list) and data else data
+    return None
+
+
+def parse_title_page(page):
+    """
+    Extract every field we use from an IMDb title page in one pass.
+
+    The page is parsed once with lxml. Values come from the embedded
+    ``__NEXT_DATA__`` blob first, then the JSON-LD block, then the compiled
+    HTML_FIELDS XPaths, taking the first source that has each field.
+
+    Args:
+        page (str or bytes): The title page HTML
+
+    Returns:
+        dict: One key per HTML_FIELDS name plus ``type`` ("Film" or "TV Series").
+              Missing text fields are None and missing list fields are [].
+    """
+    with stage('parse'):
+        doc = lxml_html.fromstring(page)
+    with stage('extract'):
+        return extract_title_page(doc)
+
+
+def extract_title_page(doc):
+    """The parse_title_page() record for an already parsed lxml document."""
+    sources = []
+    next_data = _load_json(_NEXT_DATA(doc))
+    if isinstance(next_data, dict):
+        sources.append(_from_next_data(next_data))
+    ld = _load_json(_JSON_LD(doc))
+    if isinstance(ld, dict):
+        sources.append(_from_json_ld(ld))
+    sources.append(_from_html(doc))
+
+    record = {}
+    for name, kind, _ in HTML_FIELDS + [('type', 'text', None)]:
+        values = [s.get(name) for s in sources if s.get(name)]
+        record[name] = values[0] if values else ([] if kind == 'list' else None)
+    if record['type'] is None:
+        is_series = 'episodes' in (record['episodes'] or '').lower() or bool(record['creators'])
+        record['type'] = 'TV Series' if is_series else 'Film'
+    return record
@@ -0,0 +1,184 @@
+import argparse
+import glob
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from pypdf import PdfReader
+
+from imdb_journal import write_json_atomic
+from imdb_scraper import record_from_page
+
+DEFAULT_PDFS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', '*IMDb*.pdf')
+
+# Filmography title links ("..._t_3" is the text link; "_i_"/"_c_" are the image and card links to the same title).
+TITLE_LINK = re.compile(r'imdb\.com/title/(tt\d+)/?\?ref_=[^&]*_t_\d+$')
+RATING_TYPE = re.compile(r'^(\d{1,2}\.\d)?\s*(TV Mini Series|TV Series|TV Movie|TV Special|TV Short|Video Game|Video|Movie|Short|Podcast Series)?$')
+EPISODES_YEAR = re.compile(r'^(?:(\d+) episodes?)?\s*(\d{4}(?:–(?:\d{4})?)?)?(?:\s*•\s*(\d+) eps)?$')
+SERIES_TYPES = ('TV Series', 'TV Mini Series')
+LINE_TOLERANCE = 1.5   # points; fragments closer than this vertically are one line
+ENTRY_GAP = 15         # points; a larger gap below a line ends the credit block
+
+_readers = {}
+
+
+def _reader(path):
+    """One PdfReader per file per worker process."""
+    if path not in _readers:
+        _readers[path] = PdfReader(path)
+    return _readers[path]
+
+
+def _lines(page):
+    """Text on the page as [y, x, text] lines, top to bottom."""
+    fragments = []
+
+    def visit(text, cm, tm, font, size):
+        if text.strip():
+            fragments.append((tm[5] * cm[3] + cm[5], tm[4] * cm[0] + cm[4], text.strip()))
+
+    page.extract_text(visitor_text=visit)
+    rows = []
+    for fragment in sorted(fragments, key=lambda f: -f[0]):
+        if rows and rows[-1][0][0] - fragment[0] <= LINE_TOLERANCE:
+            rows[-1].append(fragment)
+        else:
+            rows.append([fragment])
+    lines = []
+    for row in rows:
+        row.sort(key=lambda f: f[1])
+        lines.append([row[0][0], row[0][1], ' '.join(f[2] for f in row)])
+    return lines
+
+
+def _title_links(page):
+    links = []
+    for annot in page.get('/Annots') or []:
+        annot = annot.get_object()
+        match = TITLE_LINK.search(str((annot.get('/A') or {}).get('/URI') or ''))
+        if match:
+            x1, y1, x2, y2 = (float(v) for v in annot['/Rect'])
+            links.append((match.group(1), min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)))
+    return links
+
+
+def _fill(entry, text):
+    """Put one line of a credit block into the entry field it belongs to. Returns False if it fits none."""
+    rating_type = RATING_TYPE.match(text)
+    if rating_type and any(rating_type.groups()):
+        entry['rating'] = entry['rating'] or rating_type.group(1)
+        entry['type'] = entry['type'] or rating_type.group(2)
+        return True
+    years = EPISODES_YEAR.match(text)
+    if years and any(years.groups()):
+        episodes = years.group(1) or years.group(3)
+        entry['episodes'] = entry['episodes'] or (int(episodes) if episodes else None)
+        entry['year'] = entry['year'] or years.group(2)
+        return True
+    return False
+
+
+def extract_page(path, index):
+    """
+    Pull the credits off one page of a saved IMDb name page. Runs in a worker process.
+
+    A credit is a title link followed by its rating/type, role and
+    episodes/years lines. Lines at the top of the page that continue a credit
+    from the previous page are returned separately as ``carry``.
+
+    Args:
+        path (str): The PDF
+        index (int): Page number (0-based)
+
+    Returns:
+        dict: ``entries`` (tconst, title, rating, type, role, episodes, year) and ``carry`` (text lines)
+    """
+    page = _reader(path).pages[index]
+    links = _title_links(page)
+    entries, carry, entry, last_y = [], [], None, None
+    for y, x, text in _lines(page):
+        link = next((l for l in links if l[1] - 1 <= x <= l[3] and l[2] - 1 <= y <= l[4] + 1), None)
+        if link:
+            if entry and entry['tconst'] == link[0] and last_y - y <= LINE_TOLERANCE * 2:
+                entry['title'] += ' ' + text
+            else:
+                entry = {'tconst': link[0], 'title': text, 'rating': None, 'type': None,
+                         'role': None, 'episodes': None, 'year': None}
+                entries.append(entry)
+        elif not entries:
+            carry.append(text)
+        elif entry is None or last_y - y > ENTRY_GAP:
+            entry = None
+        elif not _fill(entry, text) and entry['role'] is None:
+            entry['role'] = text
+        last_y = y
+    return {'entries': entries, 'carry': carry}
+
+
+def to_record(entry):
+    """The imdb_scraper record for a PDF credit, with "Unknown" for what the PDF does not show."""
+    is_series = entry['type'] in SERIES_TYPES
+    page = {
+        'title': entry['title'], 'year': entry['year'], 'rating': entry['rating'],
+        'genres': [], 'runtime': None, 'plot': None, 'languages': [], 'countries': [], 'companies': [],
+        'poster': None, 'cast': [], 'creators': [], 'directors': [], 'writers': [],
+        'box_office': None, 'budget': None, 'release_date': None,
+        'episodes': f"{entry['episodes']} episodes" if entry['episodes'] else None,
+        'type': 'TV Series' if is_series else 'Film',
+    }
+    record = record_from_page(entry['title'], f"https://www.imdb.com/title/{entry['tconst']}/", page)
+    record['Role'] = entry['role'] or "Unknown"
+    return record
+
+
+def extract_credits(pdf_paths, workers=None):
+    """
+    Extract the credits from saved IMDb name-page PDFs, one page per task in a process pool.
+
+    Credits split across a page break are stitched back together, and a title
+    listed more than once (in "Known for" and in the filmography, or in both
+    PDFs) becomes one record with the fields of all its listings.
+
+    Args:
+        pdf_paths (list): The PDFs
+        workers (int): Processes (default: one per CPU)
+
+    Returns:
+        list: Records in the imdb_scraper format plus ``Role``, in order of first appearance
+    """
+    tasks = [(path, i) for path in pdf_paths for i in range(len(PdfReader(path).pages))]
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        previous = None
+        for (path, i), page in zip(tasks, pool.map(extract_page, *zip(*tasks))):
+            if previous is not None and i > 0:
+                for text in page['carry']:
+                    _fill(previous, text)
+            for entry in page['entries']:
+                merged = entries.setdefault(entry['tconst'], entry)
+                if merged is not entry:
+                    for key, value in entry.items():
+                        merged[key] = merged[key] or value
+            previous = page['entries'][-1] if page['entries'] else previous
+    return [to_record(entry) for entry in entries.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract IMDb credits from saved name-page PDFs, with no network access.")
+    parser.add_argument("pdfs", nargs="*", help=f"PDFs to read (default: {DEFAULT_PDFS})")
+    parser.add_argument("--output", default="../data/portfolio_pdf.json", help="Where the records are written (imdb_scraper.py --seed input)")
+    parser.add_argument("--markdown", default=None, help="Also write the credits as a Markdown link list (imdb_scraper.py --input)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes reading pages (default: CPU count)")
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob(DEFAULT_PDFS))
+    records = extract_credits(pdfs, args.workers)
+    write_json_atomic(args.output, {"projects": records})
+    if args.markdown:
+        with open(args.markdown, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(f"- [{record['Title']}]({record['IMDb URL']}) ({record['Year']}) - {record['Type']}\n")
+    print(f"✅ {len(records)} credits from {len(pdfs)} PDFs saved in '{args.output}'")
+
+if __name__ == "__main__":
+    main()
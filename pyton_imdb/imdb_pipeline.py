@@ -0,0 +1,206 @@
+import argparse
+import json
+import queue
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import imdb_profile
+from extract_imdb_info import imdb_info_from_page, merge_imdb_info
+from imdb_fetch import get_session, set_rate
+from imdb_journal import Journal, write_atomic, write_json_atomic
+from imdb_parse import parse_title_page
+from imdb_scraper import fetch_title_page, record_from_page
+from imdb_titles import DEFAULT_TITLE_DB
+from veirfy_urls import iter_verified, open_title_index, parse_chronological, report_failures
+
+_DONE = object()
+
+
+class _Failed:
+    def __init__(self, error):
+        self.error = error
+
+
+def threaded(items, maxsize):
+    """
+    Run a generator stage in a background thread, handing its items over a bounded queue.
+
+    The producer blocks once ``maxsize`` items are waiting, so a fast stage never
+    runs far ahead of a slow one. An exception in the stage is re-raised here.
+
+    Args:
+        items (iterable): The stage to run
+        maxsize (int): Items allowed to wait between the stages
+
+    Yields:
+        The stage's items, as soon as each is produced
+    """
+    q = queue.Queue(maxsize)
+
+    def pump():
+        try:
+            for item in items:
+                q.put(item)
+        except BaseException as e:
+            q.put(_Failed(e))
+        finally:
+            q.put(_DONE)
+
+    threading.Thread(target=pump, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is _DONE:
+            return
+        if isinstance(item, _Failed):
+            raise item.error
+        yield item
+
+
+def is_stage_record(done):
+    """Whether a journal record is a pipeline checkpoint ({'record', 'info'})."""
+    return isinstance(done, dict) and 'record' in done and 'info' in done
+
+
+def title_id(url):
+    match = re.search(r"(tt\d+)", url or "")
+    return match.group(1) if match else None
+
+
+def parse_stage_page(title, url, html):
+    """Parse a title page once into (scraper record, director/company info). Runs in a worker process."""
+    page = parse_title_page(html)
+    return record_from_page(title, url, page), imdb_info_from_page(page)
+
+
+def scrape_stage(verified, journal, workers, parsers):
+    """
+    Yield (verified project, record, info) for each verified project as soon as it is scraped.
+
+    Up to ``workers`` titles are in flight at once; pages come through the fetch
+    cache (verification has usually just fetched them) and are parsed in the
+    ``parsers`` process pool. Titles already in the journal are not fetched again.
+    """
+    session = get_session(pool_size=workers)
+
+    def scrape(project):
+        done = journal.get(project['url'])
+        if done is not None:
+            return project, done['record'], done['info']
+        html = fetch_title_page(project['title'], project['url'], session)
+        if html is None:
+            return project, None, None
+        try:
+            record, info = imdb_profile.submit(parsers, parse_stage_page, project['title'], project['url'], html).result()
+        except Exception as e:
+            print(f"Error scraping {project['title']}: {e}")
+            return project, None, None
+        journal.append(project['url'], {'record': record, 'info': info})
+        return project, record, info
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for project in verified:
+            pending.add(pool.submit(scrape, project))
+            if len(pending) >= workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def run_pipeline(chronological, verified_output, scraped_output, portfolio_input, portfolio_output,
+                 index_path=DEFAULT_TITLE_DB, workers=4, parse_workers=None, queue_size=8, journal_file=None):
+    """
+    Verify, scrape and merge every project in one streaming pass.
+
+    The three stages run concurrently, connected by bounded queues: a title moves
+    on to scraping the moment it is verified, and into the portfolio the moment it
+    is scraped. Scraped titles are checkpointed to a journal, so a restarted run
+    only scrapes what is missing. Titles finish in any order; the verified links
+    and scraped records are written in the order of the chronological file.
+
+    Args:
+        chronological (str): Chronological Markdown file (veirfy_urls.py input)
+        verified_output (str): Where the verified Markdown links are written
+        scraped_output (str): Where the scraped records are written (imdb_scraper.py output)
+        portfolio_input (str): Portfolio JSON to fill in (extract_imdb_info.py input)
+        portfolio_output (str): Where the updated portfolio is written
+        index_path (str): Offline title index (live search is used if it does not exist)
+        workers (int): Titles scraped concurrently
+        parse_workers (int): Parser processes (default: one per CPU)
+        queue_size (int): Titles allowed to wait between stages
+        journal_file (str): Checkpoint journal (default: scraped_output + ".pipeline.jsonl"; the
+                            ".journal.jsonl" next to it is imdb_scraper.py's, in another format)
+
+    Returns:
+        int: Number of portfolio projects updated
+    """
+    projects = parse_chronological(chronological)
+    for i, project in enumerate(projects):
+        project['index'] = i
+    with open(portfolio_input, 'r', encoding='utf-8') as f:
+        portfolio = json.load(f)
+    by_id = {}
+    for project in portfolio:
+        by_id.setdefault(title_id(project.get('imdb_url')), []).append(project)
+
+    journal = Journal(journal_file or scraped_output + ".pipeline.jsonl", valid=is_stage_record)
+    if len(journal):
+        print(f"Resuming: {len(journal)} titles already in {journal.path}")
+    failures = []
+    finished, updated = [], 0
+
+    print(f"Found {len(projects)} projects in {chronological}")
+    with ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+        verified = threaded(iter_verified(projects, open_title_index(index_path), get_session(), failures), queue_size)
+        scraped = threaded(scrape_stage(verified, journal, workers, parsers), queue_size)
+        for project, record, info in scraped:
+            finished.append((project['index'], project['line'], record))
+            if record is None:
+                print(f"Failed to get data for: {project['title']}")
+                continue
+            for entry in by_id.get(title_id(project['url']), []):
+                updated += merge_imdb_info(entry, info)
+            print(f"Merged: {project['title']}")
+
+    finished.sort(key=lambda f: f[0])
+    verified_lines = [line for _, line, _ in finished]
+    records = [record for _, _, record in finished if record is not None]
+    write_atomic(verified_output, ''.join(line + '\n' for line in verified_lines))
+    write_json_atomic(scraped_output, {"projects": records})
+    write_json_atomic(portfolio_output, portfolio)
+    journal.compact()
+    journal.close()
+
+    report_failures(failures)
+    print(f"\nVerified {len(verified_lines)} out of {len(projects)} projects, scraped {len(records)}, "
+          f"updated {updated} portfolio entries")
+    print(f"✅ Results saved to {verified_output}, {scraped_output} and {portfolio_output}")
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify, scrape and merge IMDb data in one streaming pipeline.")
+    parser.add_argument("--chronological", default="../data/hila-yuval-chronological.md", help="Chronological Markdown file")
+    parser.add_argument("--verified-output", default="../data/verified-imdb-links.md", help="Where the verified links are written")
+    parser.add_argument("--scraped-output", default="../data/portfolio_imdb.json", help="Where the scraped records are written")
+    parser.add_argument("--portfolio", default="../data/portfolio_new.json", help="Portfolio JSON to fill in")
+    parser.add_argument("--portfolio-output", default="../data/portfolio_updated.json", help="Where the updated portfolio is written")
+    parser.add_argument("--index", default=DEFAULT_TITLE_DB, help="Offline title index built by imdb_titles.py")
+    parser.add_argument("--workers", type=int, default=4, help="Titles scraped concurrently")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes parsing pages (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=8, help="Titles allowed to wait between stages")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second allowed to imdb.com")
+    parser.add_argument("--burst", type=int, default=2, help="Requests allowed back to back before --rate applies")
+    imdb_profile.add_arguments(parser)
+    args = parser.parse_args()
+    imdb_profile.from_args(args)
+    set_rate(args.rate, args.burst)
+    run_pipeline(args.chronological, args.verified_output, args.scraped_output, args.portfolio, args.portfolio_output,
+                 args.index, args.workers, args.parse_workers, args.queue_size)
+    imdb_profile.report(args.profile_out)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from PIL import Image, ImageOps, features
+
+from imdb_fetch import fetch, get_session, set_rate
+from imdb_journal import write_json_atomic
+
+POSTER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'public', 'images', 'posters')
+POSTER_URL_PREFIX = '/images/posters'
+LOCAL_ASSET_DIRS = ['public/images/posterim', 'public/images/accordion-headers']
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.avif')
+
+# Widths (px) the site displays artwork at, doubled for high-DPI screens:
+# .accordion-header-image (50px square), .carousel-image on project cards and
+# .accordion-header-image-top (full container width).
+VARIANTS = {'thumb': 100, 'card': 800, 'header': 1600}
+FORMATS = [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+SAVE_OPTIONS = {
+    'webp': {'quality': 80, 'method': 6},
+    'avif': {'quality': 55, 'speed': 6},
+}
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _save_original(data, outdir):
+    """Store downloaded bytes once per content hash. Returns (digest, path)."""
+    digest = _digest(data)
+    path = os.path.join(outdir, 'originals', digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+    return digest, path
+
+
+def download_poster(url, outdir, session=None):
+    """
+    Download one poster into the content-addressed originals store.
+
+    Args:
+        url (str): Poster image URL
+        outdir (str): Poster output directory
+        session (requests.Session): Session to use
+
+    Returns:
+        tuple: (digest, path) or None if the download failed
+    """
+    try:
+        # Posters are kept in the originals store, so skip the page cache.
+        response = fetch(url, session=session, use_cache=False)
+    except Exception as e:
+        print(f"Error downloading {url}: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"Failed to download {url}: {response.status_code}")
+        return None
+    return _save_original(response.content, outdir)
+
+
+def render_variants(source, outdir, digest, variants=None, formats=None):
+    """
+    Write resized variants of one image. CPU-only, so it runs in a worker process.
+
+    Images are only ever scaled down, and variants that already exist are kept,
+    since their names are derived from the source content hash.
+
+    Args:
+        source (str): Path of the original image
+        outdir (str): Poster output directory
+        digest (str): Content hash used to name the variants
+        variants (dict): Variant name -> maximum width (default VARIANTS)
+        formats (list): Output formats (default: AVIF and WebP, whichever Pillow supports)
+
+    Returns:
+        dict: width, height and variants ({name: {format: public URL}})
+    """
+    variants = VARIANTS if variants is None else variants
+    formats = FORMATS if formats is None else formats
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        width, height = image.size
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        rendered = {}
+        for name, max_width in variants.items():
+            size = (max_width, round(height * max_width / width)) if width > max_width else (width, height)
+            resized = None
+            rendered[name] = {}
+            for fmt in formats:
+                filename = f"{digest}-{name}.{fmt}"
+                path = os.path.join(outdir, filename)
+                if not os.path.exists(path):
+                    if resized is None:
+                        resized = image.resize(size, Image.LANCZOS) if size != image.size else image
+                    resized.save(path + '.tmp', fmt.upper(), **SAVE_OPTIONS.get(fmt, {}))
+                    os.replace(path + '.tmp', path)
+                rendered[name][fmt] = f"{POSTER_URL_PREFIX}/{filename}"
+    return {'width': width, 'height': height, 'variants': rendered}
+
+
+def build_posters(poster_urls, local_files=(), outdir=POSTER_DIR, workers=4, render_workers=None, manifest=None):
+    """
+    Download posters concurrently and render their variants in a process pool.
+
+    Downloads run in a thread pool (rate-limited per host by imdb_fetch) and each
+    image is handed to the process pool as soon as it arrives. Identical images,
+    whether fetched from different URLs or already on disk, are rendered once.
+
+    Args:
+        poster_urls (dict): Key (usually the IMDb title URL) -> poster URL
+        local_files (list): Existing image files to optimise as well
+        outdir (str): Poster output directory
+        workers (int): Concurrent downloads
+        render_workers (int): Rendering processes (default: one per CPU)
+        manifest (dict): Previous manifest; keys whose poster URL is unchanged are not downloaded again
+
+    Returns:
+        dict: Key -> {source, digest, width, height, variants}
+    """
+    os.makedirs(outdir, exist_ok=True)
+    manifest = dict(manifest or {})
+    session = get_session(pool_size=workers)
+    rendered = {}
+
+    def record(key, source, digest, future):
+        try:
+            manifest[key] = dict(future.result(), source=source, digest=digest)
+        except Exception as e:
+            print(f"Error rendering {source}: {e}")
+
+    def render(key, source, digest, path):
+        if digest not in rendered:
+            rendered[digest] = renderers.submit(render_variants, path, outdir, digest)
+        rendered[digest].add_done_callback(lambda f: record(key, source, digest, f))
+
+    todo = {key: url for key, url in poster_urls.items()
+            if not (manifest.get(key, {}).get('source') == url
+                    and os.path.exists(os.path.join(outdir, 'originals', manifest[key]['digest'])))}
+    with ThreadPoolExecutor(max_workers=workers) as downloaders, ProcessPoolExecutor(max_workers=render_workers) as renderers:
+        downloads = {downloaders.submit(download_poster, url, outdir, session): key for key, url in todo.items()}
+        for path in local_files:
+            with open(path, 'rb') as f:
+                digest = _digest(f.read())
+            render(path, path, digest, path)
+        for future in as_completed(downloads):
+            stored = future.result()
+            if stored:
+                key = downloads[future]
+                render(key, poster_urls[key], *stored)
+    return manifest
+
+
+def find_local_assets(dirs):
+    files = []
+    for directory in dirs:
+        for name in sorted(os.listdir(directory)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                files.append(os.path.join(directory, name))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the scraped IMDb posters and render resized AVIF/WebP variants.")
+    parser.add_argument("--input", default="../data/portfolio_imdb.json", help="imdb_scraper.py output")
+    parser.add_argument("--outdir", default=POSTER_DIR, help="Where originals, variants and posters.json go")
+    parser.add_argument("--assets", nargs="*", default=None, metavar="DIR",
+                        help=f"Also optimise the images in these directories (default with no DIR: {', '.join(LOCAL_ASSET_DIRS)})")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent downloads")
+    parser.add_argument("--render-workers", type=int, default=None, help="Processes rendering variants (default: CPU count)")
+    parser.add_argument("--rate", type=float, default=2.0, help="Downloads per second allowed per host")
+    parser.add_argument("--burst", type=int, default=4, help="Downloads allowed back to back before --rate applies")
+    args = parser.parse_args()
+    set_rate(args.rate, args.burst)
+    if not FORMATS:
+        parser.error("this Pillow build supports neither AVIF nor WebP")
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        projects = json.load(f)['projects']
+    poster_urls = {p['IMDb URL']: p['Poster URL'] for p in projects
+                   if p.get('Poster URL', '').startswith(('http://', 'https://'))}
+    asset_dirs = args.assets if args.assets else [os.path.join('..', d) for d in LOCAL_ASSET_DIRS]
+    local_files = find_local_assets(asset_dirs) if args.assets is not None else []
+
+    manifest_path = os.path.join(args.outdir, 'posters.json')
+    previous = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    print(f"Found {len(poster_urls)} posters and {len(local_files)} local images; rendering {', '.join(FORMATS)}")
+    manifest = build_posters(poster_urls, local_files, args.outdir, args.workers, args.render_workers, previous)
+    write_json_atomic(manifest_path, manifest)
+    print(f"✅ {len(manifest)} images, {len({m['digest'] for m in manifest.values()})} unique, manifest in '{manifest_path}'")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import cProfile
+import pstats
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+STAGES = ('fetch', 'parse', 'extract', 'write')
+
+_enabled = False
+_lock = threading.Lock()
+_stats = {}
+_profiler = None
+_snapshots = []
+
+
+def enable(cprofile=False):
+    """
+    Start recording per-stage timings (and cProfile data if ``cprofile`` is set).
+
+    Stages are timed wherever the scripts call ``stage()``; while disabled those
+    calls cost a flag check. cProfile covers the calling thread and every call
+    sent to a process pool through ``submit()``.
+    """
+    global _enabled, _profiler
+    _enabled = True
+    if cprofile and _profiler is None:
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def _add(name, seconds, count=1):
+    with _lock:
+        total, calls = _stats.get(name, (0.0, 0))
+        _stats[name] = (total + seconds, calls + count)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block under ``name`` (fetch, parse, extract or write)."""
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(name, time.perf_counter() - start)
+
+
+class _Snapshot:
+    """Lets pstats.Stats load a plain stats dict shipped back from a worker process."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _profiled_call(fn, args, cprofile):
+    global _enabled
+    _enabled = True
+    _stats.clear()
+    profile = cProfile.Profile() if cprofile else None
+    if profile:
+        profile.enable()
+    try:
+        result = fn(*args)
+    finally:
+        if profile:
+            profile.disable()
+    snapshot = None
+    if profile:
+        profile.create_stats()
+        snapshot = profile.stats
+    return result, dict(_stats), snapshot
+
+
+def submit(pool, fn, *args):
+    """
+    ``pool.submit(fn, *args)`` for a process pool that also brings the worker's timings
+    (and cProfile data) back when profiling.
+
+    Returns:
+        Future: Resolves to ``fn``'s result, as with pool.submit()
+    """
+    if not _enabled:
+        return pool.submit(fn, *args)
+    outer = Future()
+
+    def unwrap(inner):
+        try:
+            result, timings, snapshot = inner.result()
+        except BaseException as e:
+            outer.set_exception(e)
+            return
+        for name, (seconds, count) in timings.items():
+            _add(name, seconds, count)
+        if snapshot is not None:
+            with _lock:
+                _snapshots.append(snapshot)
+        outer.set_result(result)
+
+    pool.submit(_profiled_call, fn, args, _profiler is not None).add_done_callback(unwrap)
+    return outer
+
+
+def report(cprofile_out=None, top=25):
+    """
+    Print the stage timings, and write or print the cProfile results.
+
+    Args:
+        cprofile_out (str): Save the combined cProfile stats here (view with ``python -m pstats``);
+                            without it the ``top`` functions by cumulative time are printed
+        top (int): Functions shown when printing cProfile results
+    """
+    if not _enabled:
+        return
+    with _lock:
+        stats = dict(_stats)
+    print("\nStage timings:")
+    print(f"  {'stage':<10} {'calls':>7} {'total s':>9} {'avg ms':>9}")
+    for name in sorted(stats, key=lambda n: (STAGES.index(n) if n in STAGES else len(STAGES), n)):
+        seconds, count = stats[name]
+        print(f"  {name:<10} {count:>7} {seconds:>9.3f} {seconds / count * 1000:>9.2f}")
+
+    if _profiler is None:
+        return
+    _profiler.disable()
+    combined = pstats.Stats(_profiler)
+    for snapshot in _snapshots:
+        combined.add(_Snapshot(snapshot))
+    if cprofile_out:
+        combined.dump_stats(cprofile_out)
+        print(f"cProfile stats written to {cprofile_out}")
+    else:
+        combined.sort_stats('cumulative').print_stats(top)
+
+
+def add_arguments(parser):
+    """Add the shared --profile / --profile-out options to a script's argument parser."""
+    parser.add_argument("--profile", action="store_true", help="Report time spent per stage (fetch, parse, extract, write)")
+    parser.add_argument("--profile-out", default=None, metavar="FILE",
+                        help="Also run cProfile and save its stats to FILE (implies --profile)")
+
+
+def from_args(args):
+    if args.profile or args.profile_out:
+        enable(cprofile=bool(args.profile_out))
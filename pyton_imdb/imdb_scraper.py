@@ -1,108 +1,187 @@
-import requests
-from bs4 import BeautifulSoup
-import re
+import argparse
 import json
-import time
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import imdb_profile
+from imdb_fetch import fetch, get_session, set_rate
+from imdb_journal import Journal, write_json_atomic
+from imdb_parse import parse_title_page
 
 def extract_imdb_links(md_filepath):
-    """Extract IMDb links from a markdown file."""
+    """Extract IMDb links from a markdown file. URLs are returned without a trailing slash."""
     links = []
     with open(md_filepath, 'r', encoding='utf-8') as f:
         content = f.read()
-        pattern = r'\[([^\]]+)\]\((https://www\.imdb\.com/title/tt[0-9]+)\)'
+        pattern = r'\[([^\]]+)\]\((https://www\.imdb\.com/title/tt[0-9]+)/?\)'
         matches = re.findall(pattern, content)
         for title, url in matches:
             links.append((title.strip(), url.strip()))
     return links
 
-def get_text_or_default(soup, selector, default="Unknown"):
-    elem = soup.select_one(selector)
-    return elem.get_text(strip=True) if elem else default
+def fetch_title_page(title, url, session=None):
+    """Download a title page (through the cache). Returns the raw HTML bytes or None."""
+    print(f"Scraping: {title} from {url}")
+    try:
+        response = fetch(url, session=session)
+    except Exception as e:
+        print(f"Error scraping {title}: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"Failed to access {url}: {response.status_code}")
+        return None
+    return response.content
 
-def get_list_from_links(soup, selector):
-    return [a.get_text(strip=True) for a in soup.select(selector)] or ["Unknown"]
+def scrape_imdb_details(title, url, session=None):
+    html = fetch_title_page(title, url, session)
+    return parse_imdb_details(title, url, html) if html is not None else None
 
-def scrape_imdb_details(title, url, session):
-    print(f"Scraping: {title} from {url}")
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept-Language': 'en-US,en;q=0.9',
-    }
+def parse_imdb_details(title, url, html):
+    """Extract the portfolio record from a title page. CPU-only, so it can run in a worker process."""
     try:
-        response = session.get(url, headers=headers, timeout=15)
-        if response.status_code != 200:
-            print(f"Failed to access {url}: {response.status_code}")
-            return None
-        soup = BeautifulSoup(response.text, 'html.parser')
-
-        # Title and year
-        year = get_text_or_default(soup, 'span.sc-8c396aa2-2, .TitleBlockMetaData__ListItemText-sc-12ein40-2')
-        rating = get_text_or_default(soup, 'span.sc-7ab21ed2-1, .AggregateRatingButton__RatingScore-sc-1ll29m0-1')
-        genres = get_list_from_links(soup, 'a[href*="/search/title/?genres="], span.ipc-chip__text')
-        runtime = get_text_or_default(soup, 'li[data-testid="title-techspec_runtime"] span, .TitleBlockMetaData__ListItemText-sc-12ein40-2')
-        plot = get_text_or_default(soup, '[data-testid="plot-xl"], .GenresAndPlot__TextContainerBreakpointXS_TO_M-cum89p-0')
-        language = get_list_from_links(soup, 'li[data-testid="title-details-languages"] a')
-        country = get_list_from_links(soup, 'li[data-testid="title-details-origin"] a')
-        production = get_list_from_links(soup, 'li[data-testid="title-details-companies"] a')
-        poster_elem = soup.select_one('img.ipc-image[alt*="Poster"], .poster img')
-        poster_url = poster_elem['src'] if poster_elem and 'src' in poster_elem.attrs else "No poster available"
-        cast = get_list_from_links(soup, '[data-testid="title-cast-item__actor"] a, .cast_list td.primary_photo + td a')[:5]
-        creators = get_list_from_links(soup, 'li[data-testid="title-pc-principal-credit"]:has(span:contains("Creator")) a')
-        directors = get_list_from_links(soup, 'li[data-testid="title-pc-principal-credit"]:has(span:contains("Director")) a')
-        writers = get_list_from_links(soup, 'li[data-testid="title-pc-principal-credit"]:has(span:contains("Writer")) a')
-        box_office = get_text_or_default(soup, 'li[data-testid="title-boxoffice-cumulativeworldwidegross"] span')
-        budget = get_text_or_default(soup, 'li[data-testid="title-boxoffice-budget"] span')
-        release_date = get_text_or_default(soup, 'li[data-testid="title-details-releasedate"] a')
-        episodes = get_text_or_default(soup, 'li[data-testid="episodes-header"] span, .bp_heading:contains("Episode Guide")')
-        content_type = "TV Series" if "episodes" in episodes.lower() or creators != ["Unknown"] else "Film"
-
-        return {
-            "Title": title,
-            "IMDb URL": url,
-            "Year": year,
-            "Rating": rating,
-            "Genres": genres,
-            "Runtime": runtime,
-            "Plot": plot,
-            "Language": language,
-            "Country": country,
-            "Production Company": production,
-            "Poster URL": poster_url,
-            "Cast": cast,
-            "Creators": creators if content_type == "TV Series" else [],
-            "Directors": directors if content_type == "Film" else [],
-            "Writers": writers,
-            "Box Office": box_office,
-            "Budget": budget,
-            "Release Date": release_date,
-            "Episodes": episodes if content_type == "TV Series" else "",
-            "Type": content_type
-        }
+        return record_from_page(title, url, parse_title_page(html))
     except Exception as e:
         print(f"Error scraping {title}: {e}")
         return None
 
+def record_from_page(title, url, page):
+    """Map a parse_title_page() result onto the portfolio record format."""
+    unknown = lambda value: value or "Unknown"
+    content_type = page['type']
+
+    return {
+        "Title": title,
+        "IMDb URL": url,
+        "Year": unknown(page['year']),
+        "Rating": unknown(page['rating']),
+        "Genres": page['genres'] or ["Unknown"],
+        "Runtime": unknown(page['runtime']),
+        "Plot": unknown(page['plot']),
+        "Language": page['languages'] or ["Unknown"],
+        "Country": page['countries'] or ["Unknown"],
+        "Production Company": page['companies'] or ["Unknown"],
+        "Poster URL": page['poster'] or "No poster available",
+        "Cast": (page['cast'] or ["Unknown"])[:5],
+        "Creators": (page['creators'] or ["Unknown"]) if content_type == "TV Series" else [],
+        "Directors": (page['directors'] or ["Unknown"]) if content_type == "Film" else [],
+        "Writers": page['writers'] or ["Unknown"],
+        "Box Office": unknown(page['box_office']),
+        "Budget": unknown(page['budget']),
+        "Release Date": unknown(page['release_date']),
+        "Episodes": unknown(page['episodes']) if content_type == "TV Series" else "",
+        "Type": content_type
+    }
+
+UNKNOWN = ("Unknown", ["Unknown"], "No poster available")
+
+def merge_seed(seed, record):
+    """
+    Overlay a scraped record on a seed record (e.g. one imdb_pdf.py extracted offline).
+
+    Scraped values win, except where the scraper found nothing and the seed knows better.
+
+    Args:
+        seed (dict): The seed record
+        record (dict): The scraped record, or None if scraping failed
+
+    Returns:
+        dict: The merged record
+    """
+    merged = dict(seed)
+    for key, value in (record or {}).items():
+        if key not in merged or merged[key] in UNKNOWN or (value not in UNKNOWN and value != ""):
+            merged[key] = value
+    return merged
+
+def scrape_all(projects, workers=4, parse_workers=None, journal=None):
+    """
+    Scrape many titles concurrently.
+
+    Pages are fetched by a thread pool (politeness is left to the per-host token
+    bucket in imdb_fetch) and each page is handed to a process pool for parsing as
+    soon as it arrives, so fetching and parsing overlap. With a journal, each record
+    is checkpointed the moment it is parsed and titles already in it are not fetched.
+
+    Args:
+        projects (list): (title, url) pairs
+        workers (int): Concurrent page fetches
+        parse_workers (int): Parser processes (default: one per CPU)
+        journal (Journal): Checkpoint journal keyed by URL
+
+    Returns:
+        list: The scraped records, in the order of ``projects``
+    """
+    session = get_session(pool_size=workers)
+    results = [journal.get(url) if journal is not None else None for _, url in projects]
+    todo = [i for i, record in enumerate(results) if record is None]
+
+    def checkpoint(future, i):
+        record = future.result()
+        results[i] = record
+        if journal is not None and record:
+            journal.append(projects[i][1], record)
+
+    with ThreadPoolExecutor(max_workers=workers) as fetchers, ProcessPoolExecutor(max_workers=parse_workers) as parsers:
+        pages = {fetchers.submit(fetch_title_page, *projects[i], session): i for i in todo}
+        for future in as_completed(pages):
+            i = pages[future]
+            html = future.result()
+            if html is not None:
+                title, url = projects[i]
+                imdb_profile.submit(parsers, parse_imdb_details, title, url, html).add_done_callback(lambda f, i=i: checkpoint(f, i))
+    return results
+
 def main():
-    md_filepath = "E:/PROG/hilayuval-claude/data/imdb-hila-yuval-projects.md"
-    output_filepath = "E:/PROG/hilayuval-claude/data/portfolio_imdb.json"
-    session = requests.Session()
-    projects = extract_imdb_links(md_filepath)
+    parser = argparse.ArgumentParser(description="Scrape IMDb details for the titles linked in a Markdown file.")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent page fetches (1 = one after another)")
+    parser.add_argument("--parse-workers", type=int, default=None, help="Processes parsing pages (default: CPU count)")
+    parser.add_argument("--rate", type=float, default=1.0, help="Requests per second allowed to imdb.com")
+    parser.add_argument("--burst", type=int, default=2, help="Requests allowed back to back before --rate applies")
+    parser.add_argument("--input", default="../data/imdb-hila-yuval-projects.md", help="Markdown file with the IMDb links")
+    parser.add_argument("--output", default="../data/portfolio_imdb.json", help="Where the scraped records are written")
+    parser.add_argument("--seed", default=None, help="Records extracted offline (imdb_pdf.py output); their titles are scraped too "
+                                                     "and scraped values are merged over them")
+    parser.add_argument("--seed-only", action="store_true", help="With --seed, write the seed records without any network access")
+    imdb_profile.add_arguments(parser)
+    args = parser.parse_args()
+    imdb_profile.from_args(args)
+    set_rate(args.rate, args.burst)
+
+    md_filepath = args.input
+    output_filepath = args.output
+    seeds = {}
+    if args.seed:
+        with open(args.seed, 'r', encoding='utf-8') as f:
+            # Keyed like extract_imdb_links() URLs, so a title in both is scraped once.
+            seeds = {r["IMDb URL"].rstrip('/'): r for r in json.load(f)["projects"]}
+        print(f"Loaded {len(seeds)} seed records from {args.seed}")
+    projects = extract_imdb_links(md_filepath) if not args.seed or os.path.exists(md_filepath) else []
     print(f"Found {len(projects)} projects in the Markdown file")
+    linked = {url for _, url in projects}
+    projects += [(r["Title"], url) for url, r in seeds.items() if url not in linked]
+    if args.seed_only:
+        write_json_atomic(output_filepath, {"projects": list(seeds.values())})
+        print(f"✅ {len(seeds)} seed records saved in '{output_filepath}' (no network access)")
+        return
+    journal = Journal(output_filepath + ".journal.jsonl", valid=lambda record: "IMDb URL" in record)
+    if len(journal):
+        print(f"Resuming: {len(journal)} projects already in {journal.path}")
     all_projects = []
-    for i, (title, url) in enumerate(projects):
-        print(f"Processing project {i+1}/{len(projects)}: {title}")
-        project_data = scrape_imdb_details(title, url, session)
+    for (title, url), project_data in zip(projects, scrape_all(projects, args.workers, args.parse_workers, journal)):
         if project_data:
-            all_projects.append(project_data)
+            all_projects.append(merge_seed(seeds[url], project_data) if url in seeds else project_data)
             print(f"Successfully scraped data for: {title}")
+        elif url in seeds:
+            all_projects.append(seeds[url])
+            print(f"Failed to get data for: {title} (keeping the seed record)")
         else:
             print(f"Failed to get data for: {title}")
-        time.sleep(5)
-    os.makedirs(os.path.dirname(output_filepath), exist_ok=True)
-    with open(output_filepath, "w", encoding="utf-8") as f:
-        json.dump({"projects": all_projects}, f, indent=2, ensure_ascii=False)
+    write_json_atomic(output_filepath, {"projects": all_projects})
+    journal.compact()
+    journal.close()
     print(f"✅ Data saved in '{output_filepath}'!")
+    imdb_profile.report(args.profile_out)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,236 @@
+import argparse
+import csv
+import difflib
+import gzip
+import os
+import re
+import sqlite3
+import sys
+import unicodedata
+
+DEFAULT_TITLE_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'imdb-titles.sqlite')
+
+# title.basics rows worth indexing; episodes alone are most of the dump and are never searched for.
+INDEX_TYPES = {'movie', 'short', 'tvSeries', 'tvMiniSeries', 'tvMovie', 'tvSpecial', 'tvShort', 'video'}
+BATCH_SIZE = 50000
+MIN_SCORE = 0.8
+FUZZY_POSTINGS = 50000  # index entries the fuzzy query may read; the rarest trigrams go first
+
+
+def normalize_title(title):
+    """Lowercase, strip accents and punctuation, and collapse whitespace ("Amélie!" -> "amelie")."""
+    text = unicodedata.normalize('NFKD', title)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower().replace('&', ' and ')
+    return ' '.join(re.sub(r'[\W_]+', ' ', text).split())
+
+
+def parse_years(text):
+    """Turn "2020", "2020-2024" or "2020–2024" into a (start, end) pair of ints (or Nones)."""
+    years = [int(y) for y in re.findall(r'\d{4}', text or '')]
+    if not years:
+        return None, None
+    return years[0], years[-1]
+
+
+def _year(value):
+    return None if value in ('\\N', '') else int(value)
+
+
+def build_title_index(tsv_path, db_path=DEFAULT_TITLE_DB, types=INDEX_TYPES):
+    """
+    Build the offline title index from an IMDb ``title.basics.tsv(.gz)`` dump.
+
+    Titles go in a plain table with normalised names for exact lookups, and in a
+    contentless FTS5 trigram index for fuzzy candidate search. The database is
+    built under a temporary name and swapped in when complete.
+
+    Args:
+        tsv_path (str): Path to title.basics.tsv or title.basics.tsv.gz
+        db_path (str): Where to write the SQLite index
+        types (set): titleType values to keep
+
+    Returns:
+        int: Number of titles indexed
+    """
+    tmp_path = db_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    conn.executescript(
+        """
+        CREATE TABLE titles (
+            id INTEGER PRIMARY KEY,
+            tconst TEXT NOT NULL,
+            type TEXT,
+            title TEXT,
+            original_title TEXT,
+            norm TEXT,
+            original_norm TEXT,
+            start_year INTEGER,
+            end_year INTEGER
+        );
+        CREATE VIRTUAL TABLE titles_fts USING fts5(norm, original_norm, content='', tokenize='trigram');
+        """
+    )
+    opener = gzip.open if tsv_path.endswith('.gz') else open
+    count = 0
+    batch = []
+
+    def flush():
+        conn.executemany('INSERT INTO titles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+        conn.executemany('INSERT INTO titles_fts (rowid, norm, original_norm) VALUES (?, ?, ?)',
+                         [(row[0], row[5], row[6]) for row in batch])
+        batch.clear()
+
+    with opener(tsv_path, 'rt', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f, delimiter='\t', quoting=csv.QUOTE_NONE)
+        header = next(reader)
+        col = {name: i for i, name in enumerate(header)}
+        for row in reader:
+            if row[col['titleType']] not in types:
+                continue
+            count += 1
+            title, original = row[col['primaryTitle']], row[col['originalTitle']]
+            norm, original_norm = normalize_title(title), normalize_title(original)
+            batch.append((count, row[col['tconst']], row[col['titleType']], title, original, norm,
+                          original_norm if original_norm != norm else '',
+                          _year(row[col['startYear']]), _year(row[col['endYear']])))
+            if len(batch) >= BATCH_SIZE:
+                flush()
+    flush()
+    conn.executescript(
+        """
+        CREATE INDEX titles_norm ON titles (norm);
+        CREATE INDEX titles_original_norm ON titles (original_norm);
+        INSERT INTO titles_fts (titles_fts) VALUES ('optimize');
+        """
+    )
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+class TitleIndex:
+    """Read-only access to an index built by build_title_index()."""
+
+    def __init__(self, db_path=DEFAULT_TITLE_DB):
+        self.conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, check_same_thread=False)
+        self.conn.execute("CREATE VIRTUAL TABLE temp.titles_vocab USING fts5vocab(main, titles_fts, row)")
+        self.doc_counts = {}
+
+    def close(self):
+        self.conn.close()
+
+    def _rows(self, where, params, limit, source='titles t', order=''):
+        return self.conn.execute(
+            f"SELECT t.tconst, t.type, t.title, t.original_title, t.norm, t.original_norm, t.start_year, t.end_year "
+            f"FROM {source} WHERE {where} {order} LIMIT {int(limit)}", params).fetchall()
+
+    def _rare_grams(self, grams):
+        """The query trigrams to search on, rarest first, within FUZZY_POSTINGS.
+
+        Trigrams such as "the" are in a large share of all titles; OR-ing them in
+        makes every lookup read most of the index while adding little to the ranking.
+        Counting a trigram's titles reads its whole index entry too, so counts are cached.
+        """
+        for gram in grams - self.doc_counts.keys():
+            row = self.conn.execute("SELECT doc FROM temp.titles_vocab WHERE term = ?", (gram,)).fetchone()
+            self.doc_counts[gram] = row[0] if row else 0
+        counts = {gram: self.doc_counts[gram] for gram in grams if self.doc_counts[gram]}
+        chosen, total = [], 0
+        for gram in sorted(counts, key=counts.get):
+            if chosen and total + counts[gram] > FUZZY_POSTINGS:
+                break
+            chosen.append(gram)
+            total += counts[gram]
+        return chosen
+
+    def search(self, title, year=None, limit=5, candidates=1000):
+        """
+        Find the titles that best match ``title``.
+
+        Exact matches on the normalised primary or original title are returned
+        on their own when there are any; otherwise the candidates are titles of
+        a similar length sharing trigrams with the query (so typos and small
+        wording differences still match), ranked by similarity.
+
+        Args:
+            title (str): The title to look up
+            year (str or int): Optional year or "2020-2024" range; titles must overlap it (±1 year)
+            limit (int): Maximum number of matches returned
+            candidates (int): How many fuzzy candidates to score
+
+        Returns:
+            list: Dicts with tconst, url, title, original_title, type, start_year, end_year and score (0-1)
+        """
+        norm = normalize_title(title)
+        if not norm:
+            return []
+        where, params = '', ()
+        first, last = parse_years(str(year)) if year else (None, None)
+        if first is not None:
+            where = ' AND (t.start_year IS NULL OR (t.start_year - 1 <= ? AND ? <= COALESCE(t.end_year, t.start_year) + 1))'
+            params = (last, first)
+        rows = self._rows('(t.norm = ? OR t.original_norm = ?)' + where, (norm, norm) + params, candidates)
+        grams = self._rare_grams({norm[i:i + 3] for i in range(len(norm) - 2)}) if not rows else []
+        if grams:
+            # Titles under half or over twice the query's length cannot score
+            # well, and would crowd the real candidates out of the FTS ranking.
+            query = ' OR '.join('"' + g.replace('"', '""') + '"' for g in grams)
+            lengths = (len(norm) // 2, len(norm) * 2)
+            rows = self._rows('titles_fts MATCH ? AND (length(t.norm) BETWEEN ? AND ? OR length(t.original_norm) BETWEEN ? AND ?)' + where,
+                              (query,) + lengths + lengths + params, candidates,
+                              source='titles_fts JOIN titles t ON t.id = titles_fts.rowid', order='ORDER BY titles_fts.rank')
+
+        matches = {}
+        for tconst, kind, primary, original, n, original_n, start, end in rows:
+            score = max(difflib.SequenceMatcher(None, norm, n).ratio(),
+                        difflib.SequenceMatcher(None, norm, original_n).ratio() if original_n else 0)
+            matches[tconst] = {
+                'tconst': tconst,
+                'url': f"https://www.imdb.com/title/{tconst}/",
+                'title': primary,
+                'original_title': original,
+                'type': kind,
+                'start_year': start,
+                'end_year': end,
+                'score': round(score, 3),
+            }
+        return sorted(matches.values(), key=lambda m: -m['score'])[:limit]
+
+    def best_match(self, title, year=None, min_score=MIN_SCORE):
+        """The top search() result if it scores at least ``min_score``, else None."""
+        found = self.search(title, year, limit=1)
+        return found[0] if found and found[0]['score'] >= min_score else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the offline IMDb title index.")
+    parser.add_argument("--db", default=DEFAULT_TITLE_DB, help="SQLite index path")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index a title.basics.tsv(.gz) dump (https://datasets.imdbws.com/)")
+    build.add_argument("tsv")
+    search = sub.add_parser("search", help="Look up a title")
+    search.add_argument("title")
+    search.add_argument("--year", default=None)
+    search.add_argument("--limit", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_title_index(args.tsv, args.db)
+        print(f"Indexed {count} titles into {args.db}")
+        return
+    if not os.path.exists(args.db):
+        print(f"No title index at {args.db}; build one with: python imdb_titles.py build title.basics.tsv.gz", file=sys.stderr)
+        sys.exit(2)
+    for match in TitleIndex(args.db).search(args.title, args.year, args.limit):
+        years = f"{match['start_year']}" + (f"-{match['end_year']}" if match['end_year'] else "")
+        print(f"{match['score']:.2f}  {match['url']}  {match['title']} ({years}) [{match['type']}]")
+
+if __name__ == "__main__":
+    main()
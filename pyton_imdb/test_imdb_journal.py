@@ -0,0 +1,93 @@
+"""
+Tests for imdb_journal.py.
+
+Usage:
+  python -m pytest pyton_imdb/test_imdb_journal.py
+"""
+
+import json
+
+from imdb_journal import Journal, write_atomic
+
+
+def read_lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def test_resume_keeps_the_last_record_per_key(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = Journal(path)
+    journal.append('tt1', {'title': 'First'})
+    journal.append('tt2', {'title': 'Second'})
+    journal.append('tt1', {'title': 'First, again'})
+    journal.close()
+
+    resumed = Journal(path)
+    try:
+        assert len(resumed) == 2
+        assert 'tt2' in resumed and 'tt3' not in resumed
+        assert resumed.get('tt1') == {'title': 'First, again'}
+        assert resumed.get('tt3', 'missing') == 'missing'
+    finally:
+        resumed.close()
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = Journal(path)
+    journal.append('tt1', {'title': 'Kept'})
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "tt2", "record": {"tit')
+
+    resumed = Journal(path)
+    resumed.append('tt3', {'title': 'After the crash'})
+    resumed.close()
+
+    reopened = Journal(path)
+    reopened.close()
+    assert reopened.records == {'tt1': {'title': 'Kept'}, 'tt3': {'title': 'After the crash'}}
+    assert json.loads(read_lines(path)[-1]) == {'key': 'tt3', 'record': {'title': 'After the crash'}}
+
+
+def test_valid_filters_foreign_records(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = Journal(path)
+    journal.append('a', {'title': 'Scraped'})
+    journal.append('b', ['not', 'a', 'record'])
+    journal.close()
+
+    resumed = Journal(path, valid=lambda record: isinstance(record, dict))
+    resumed.close()
+
+    assert list(resumed.records) == ['a']
+
+
+def test_compact_drops_superseded_and_torn_lines(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = Journal(path)
+    journal.append('tt1', {'n': 1})
+    journal.append('tt1', {'n': 2})
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"key": "tt')
+
+    journal = Journal(path)
+    journal.compact()
+    journal.append('tt2', {'n': 3})
+    journal.close()
+
+    assert [json.loads(line) for line in read_lines(path)] == [
+        {'key': 'tt1', 'record': {'n': 2}},
+        {'key': 'tt2', 'record': {'n': 3}},
+    ]
+
+
+def test_write_atomic_replaces_the_file(tmp_path):
+    path = str(tmp_path / 'out' / 'projects.json')
+    write_atomic(path, 'old')
+    write_atomic(path, 'new')
+
+    assert read_lines(path) == ['new']
+    assert not (tmp_path / 'out' / 'projects.json.tmp').exists()
@@ -0,0 +1,75 @@
+"""
+Tests for imdb_parse.py against the saved pages in fixtures/title.
+
+Usage:
+  python -m pytest pyton_imdb/test_imdb_parse.py
+"""
+
+import json
+import os
+
+import pytest
+
+from imdb_parse import HTML_FIELDS, parse_title_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def title_page(name):
+    with open(os.path.join(FIXTURES, 'title', name), 'rb') as f:
+        return parse_title_page(f.read())
+
+
+def test_next_data_page():
+    record = title_page('night_therapy_next_data.html')
+
+    assert record['title'] == 'Night Therapy'
+    assert record['year'] == '2024'
+    assert record['rating'] == '7.4'
+    assert record['genres'] == ['Drama', 'Thriller']
+    assert record['runtime'] == '45m'
+    assert record['languages'] == ['Hebrew']
+    assert record['countries'] == ['Israel']
+    assert record['companies'] == ['Yes Studios', 'Keshet']
+    assert record['creators'] == ['Noa Levi']
+    assert record['release_date'] == '2024-03-14'
+    assert record['episodes'] == '8 episodes'
+    assert record['type'] == 'TV Series'
+    assert record['poster'] == 'https://m.media-amazon.com/images/M/MV5BNightTherapy._V1_.jpg'
+    assert record['cast'] == [f'Actor {i}' for i in range(1, 31)]
+
+
+def test_legacy_html_page():
+    record = title_page('valley_of_tears_legacy.html')
+
+    assert record['title'] == 'Valley of Tears'
+    assert record['year'] == '2020'
+    assert record['rating'] == '8.5'
+    assert record['genres'] == ['Drama', 'War']
+    assert record['directors'] == ['Yaron Zilberman']
+    assert record['writers'] == ['Ron Leshem', 'Amit Cohen']
+    assert record['cast'] == [f'Legacy Actor {i}' for i in range(1, 16)]
+    assert record['poster'] == 'https://m.media-amazon.com/images/M/MV5BValley._V1_UX182_.jpg'
+    assert record['plot'] == 'October 1973: young soldiers face the Yom Kippur War on the Golan Heights.'
+
+
+@pytest.mark.parametrize('name', ['night_therapy_next_data.html', 'valley_of_tears_legacy.html'])
+def test_every_field_is_present(name):
+    record = title_page(name)
+
+    assert set(record) == {field for field, _, _ in HTML_FIELDS} | {'type'}
+    for field, kind, _ in HTML_FIELDS:
+        assert isinstance(record[field], list) if kind == 'list' else not isinstance(record[field], list)
+
+
+@pytest.mark.parametrize('release, expected', [
+    ({'year': 2024, 'month': 3, 'day': 4}, '2024-03-04'),
+    ({'year': 2024, 'month': 3}, '2024-03'),
+    ({'year': 2024}, '2024'),
+    ({}, None),
+])
+def test_next_data_release_date_is_iso(release, expected):
+    data = {'props': {'pageProps': {'aboveTheFoldData': {'titleText': {'text': 'X'}, 'releaseDate': release}}}}
+    page = f'<html><body><script id="__NEXT_DATA__">{json.dumps(data)}</script></body></html>'
+
+    assert parse_title_page(page)['release_date'] == expected
@@ -0,0 +1,72 @@
+"""
+Tests for imdb_pdf.py over the saved name-page PDFs in data/ (skipped when they or pypdf are missing).
+
+Usage:
+  python -m pytest pyton_imdb/test_imdb_pdf.py
+"""
+
+import glob
+
+import pytest
+
+pytest.importorskip('pypdf')
+
+from imdb_pdf import DEFAULT_PDFS, _fill, extract_credits, to_record  # noqa: E402
+
+PDFS = sorted(glob.glob(DEFAULT_PDFS))
+
+
+def blank_entry(**fields):
+    entry = {'tconst': 'tt0000001', 'title': 'Night Therapy', 'role': None, 'rating': None, 'type': None,
+             'year': None, 'episodes': None}
+    entry.update(fields)
+    return entry
+
+
+@pytest.mark.parametrize('text, fields', [
+    ('7.4 TV Series', {'rating': '7.4', 'type': 'TV Series'}),
+    ('Movie', {'type': 'Movie'}),
+    ('8 episodes 2024', {'episodes': 8, 'year': '2024'}),
+    ('2020–2024 • 12 eps', {'episodes': 12, 'year': '2020–2024'}),
+])
+def test_fill(text, fields):
+    entry = blank_entry()
+
+    assert _fill(entry, text)
+    assert entry == blank_entry(**fields)
+
+
+def test_fill_rejects_role_lines():
+    entry = blank_entry()
+
+    assert not _fill(entry, 'Casting Director')
+    assert entry == blank_entry()
+
+
+def test_to_record():
+    record = to_record(blank_entry(role='Casting Director', rating='7.4', type='TV Mini Series', year='2024',
+                                   episodes=8))
+
+    assert record['IMDb URL'] == 'https://www.imdb.com/title/tt0000001/'
+    assert record['Type'] == 'TV Series'
+    assert record['Episodes'] == '8 episodes'
+    assert record['Role'] == 'Casting Director'
+    assert record['Rating'] == '7.4'
+    assert record['Plot'] == 'Unknown'
+
+
+@pytest.mark.skipif(len(PDFS) < 2, reason='the saved IMDb PDFs are not in data/')
+def test_extract_credits_from_saved_pdfs():
+    records = extract_credits(PDFS, workers=2)
+
+    assert len(records) == 80
+    assert len({r['IMDb URL'] for r in records}) == 80
+    fauda = records[0]
+    assert fauda['Title'] == 'Fauda'
+    assert fauda['IMDb URL'] == 'https://www.imdb.com/title/tt4565380/'
+    assert (fauda['Year'], fauda['Rating'], fauda['Type']) == ('2015', '8.3', 'TV Series')
+    assert fauda['Episodes'] == '12 episodes'
+    assert fauda['Role'] == 'Casting Director'
+    assert records[-1]['Title'] == 'Tyrant'
+    assert records[-1]['Role'] == 'casting: Israel additional casting'
+    assert all(r['Year'] != 'Unknown' for r in records)
@@ -0,0 +1,77 @@
+"""
+Tests for imdb_scraper.py; scraping is replaced by canned records, so nothing touches the network.
+
+Usage:
+  python -m pytest pyton_imdb/test_imdb_scraper.py
+"""
+
+import json
+import os
+import sys
+
+import imdb_scraper
+from imdb_parse import parse_title_page
+from imdb_scraper import extract_imdb_links, merge_seed, record_from_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+NIGHT_THERAPY = "https://www.imdb.com/title/tt0000001"
+VALLEY_OF_TEARS = "https://www.imdb.com/title/tt0000003"
+
+
+def test_extract_imdb_links_strips_trailing_slash(tmp_path):
+    md = tmp_path / 'projects.md'
+    md.write_text(f"- [Night Therapy]({NIGHT_THERAPY}/)\n- [ Valley of Tears ]({VALLEY_OF_TEARS})\n", encoding='utf-8')
+
+    assert extract_imdb_links(str(md)) == [('Night Therapy', NIGHT_THERAPY), ('Valley of Tears', VALLEY_OF_TEARS)]
+
+
+def test_record_from_page():
+    with open(os.path.join(FIXTURES, 'title', 'night_therapy_next_data.html'), 'rb') as f:
+        record = record_from_page('Night Therapy', NIGHT_THERAPY, parse_title_page(f.read()))
+
+    assert record['Year'] == '2024'
+    assert record['Type'] == 'TV Series'
+    assert record['Creators'] == ['Noa Levi']
+    assert record['Directors'] == []
+    assert record['Cast'] == ['Actor 1', 'Actor 2', 'Actor 3', 'Actor 4', 'Actor 5']
+    assert record['Writers'] == ['Unknown']
+    assert record['Episodes'] == '8 episodes'
+
+
+def test_merge_seed_prefers_known_values():
+    seed = {"Title": "Night Therapy", "Year": "2024", "Rating": "7.4", "Role": "Dana", "Genres": ["Unknown"]}
+    scraped = {"Title": "Night Therapy", "Year": "Unknown", "Rating": "7.6", "Genres": ["Drama"], "Episodes": ""}
+
+    assert merge_seed(seed, scraped) == {"Title": "Night Therapy", "Year": "2024", "Rating": "7.6", "Role": "Dana",
+                                         "Genres": ["Drama"], "Episodes": ""}
+    assert merge_seed(seed, None) == seed
+
+
+def test_seed_titles_are_scraped_once_with_or_without_trailing_slash(tmp_path, monkeypatch):
+    md = tmp_path / 'projects.md'
+    md.write_text(f"- [Night Therapy]({NIGHT_THERAPY}/)\n", encoding='utf-8')
+    seed = tmp_path / 'seed.json'
+    seed.write_text(json.dumps({"projects": [
+        {"Title": "Night Therapy", "IMDb URL": NIGHT_THERAPY + "/", "Year": "2024", "Role": "Dana"},
+        {"Title": "Valley of Tears", "IMDb URL": VALLEY_OF_TEARS, "Year": "2020", "Role": "Unknown"},
+    ]}), encoding='utf-8')
+    output = tmp_path / 'portfolio.json'
+    scraped = []
+
+    def fake_scrape_all(projects, workers=4, parse_workers=None, journal=None):
+        scraped.extend(projects)
+        return [{"Title": title, "IMDb URL": url, "Year": "Unknown", "Rating": "7.4"} if 'tt0000001' in url else None
+                for title, url in projects]
+
+    monkeypatch.setattr(imdb_scraper, 'scrape_all', fake_scrape_all)
+    monkeypatch.setattr(sys, 'argv', ['imdb_scraper.py', '--input', str(md), '--seed', str(seed),
+                                      '--output', str(output), '--rate', '1000'])
+    imdb_scraper.main()
+
+    assert scraped == [('Night Therapy', NIGHT_THERAPY), ('Valley of Tears', VALLEY_OF_TEARS)]
+    with open(output, 'r', encoding='utf-8') as f:
+        projects = json.load(f)["projects"]
+    assert projects == [
+        {"Title": "Night Therapy", "IMDb URL": NIGHT_THERAPY, "Year": "2024", "Role": "Dana", "Rating": "7.4"},
+        {"Title": "Valley of Tears", "IMDb URL": VALLEY_OF_TEARS, "Year": "2020", "Role": "Unknown"},
+    ]
@@ -0,0 +1,84 @@
+"""
+Tests for imdb_titles.py, over a small title.basics dump built in a temporary directory.
+
+Usage:
+  python -m pytest pyton_imdb/test_imdb_titles.py
+"""
+
+import gzip
+
+import pytest
+
+from imdb_titles import TitleIndex, build_title_index, normalize_title, parse_years
+
+HEADER = ['tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+          'runtimeMinutes', 'genres']
+ROWS = [
+    ['tt0000001', 'tvSeries', 'Night Therapy', 'Night Therapy', '0', '2024', '\\N', '45', 'Drama,Thriller'],
+    ['tt0000002', 'movie', 'Night Therapy', 'Night Therapy', '0', '1995', '\\N', '90', 'Drama'],
+    ['tt0000003', 'tvSeries', 'Valley of Tears', "Sha'at Neila", '0', '2020', '2020', '50', 'Drama,War'],
+    ['tt0000004', 'tvEpisode', 'Night Therapy: Episode 1', 'Night Therapy: Episode 1', '0', '2024', '\\N', '45', 'Drama'],
+    ['tt0000005', 'movie', 'Amélie', "Le Fabuleux Destin d'Amélie Poulain", '0', '2001', '\\N', '122', 'Comedy'],
+    ['tt0000006', 'movie', 'The Night Shift', 'The Night Shift', '0', '2010', '\\N', '100', 'Comedy'],
+]
+
+
+@pytest.fixture(scope='module')
+def index(tmp_path_factory):
+    tmp = tmp_path_factory.mktemp('titles')
+    tsv = str(tmp / 'title.basics.tsv.gz')
+    with gzip.open(tsv, 'wt', encoding='utf-8') as f:
+        for row in [HEADER] + ROWS:
+            f.write('\t'.join(row) + '\n')
+    assert build_title_index(tsv, str(tmp / 'titles.sqlite')) == 5  # the episode is not indexed
+    index = TitleIndex(str(tmp / 'titles.sqlite'))
+    yield index
+    index.close()
+
+
+def test_normalize_title():
+    assert normalize_title('Amélie!') == 'amelie'
+    assert normalize_title('  Law & Order:  SVU ') == 'law and order svu'
+
+
+def test_parse_years():
+    assert parse_years('2020') == (2020, 2020)
+    assert parse_years('2020–2024') == (2020, 2024)
+    assert parse_years('') == (None, None)
+
+
+def test_exact_match(index):
+    found = index.search('Night Therapy')
+
+    assert {m['tconst'] for m in found} == {'tt0000001', 'tt0000002'}
+    assert all(m['score'] == 1.0 for m in found)
+    assert found[0]['url'] == f"https://www.imdb.com/title/{found[0]['tconst']}/"
+
+
+def test_exact_match_on_original_title(index):
+    found = index.search("sha'at neila")
+
+    assert [m['tconst'] for m in found] == ['tt0000003']
+    assert found[0]['title'] == 'Valley of Tears'
+
+
+def test_year_filter(index):
+    assert [m['tconst'] for m in index.search('Night Therapy', year=2024)] == ['tt0000001']
+    assert [m['tconst'] for m in index.search('Night Therapy', year='1994')] == ['tt0000002']
+    assert [m['tconst'] for m in index.search('Night Therapy', year='2023-2025')] == ['tt0000001']
+    # No exact hit in range: the fuzzy fallback only offers titles from that year.
+    assert [m['tconst'] for m in index.search('Night Therapy', year=2010)] == ['tt0000006']
+    assert index.best_match('Night Therapy', 2010) is None
+
+
+def test_fuzzy_match(index):
+    found = index.search('Nite Therapy', year=2024)
+
+    assert found[0]['tconst'] == 'tt0000001'
+    assert 0.8 <= found[0]['score'] < 1.0
+    assert index.best_match('Nite Therapy', 2024)['tconst'] == 'tt0000001'
+
+
+def test_best_match_below_min_score(index):
+    assert index.best_match('Completely Different Show') is None
+    assert index.search('!!!') == []
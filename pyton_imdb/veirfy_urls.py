@@ -1,18 +1,63 @@
-import requests
-from bs4 import BeautifulSoup
+import argparse
+import os
 import re
-import time
-import csv
+from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 
-def verify_imdb_links(input_file, output_file):
-    # Parse your chronological file
+import imdb_profile
+from imdb_fetch import fetch, get_session
+from imdb_profile import stage
+from imdb_titles import DEFAULT_TITLE_DB, TitleIndex
+
+
+def search_imdb(project, session):
+    """Live IMDb search fallback used when no offline title index has been built."""
+    search_url = f"https://www.imdb.com/find?q={project['title'].replace(' ', '+')}"
+    response = fetch(search_url, session=session)
+
+    if response.status_code != 200:
+        print(f"Failed to search for {project['title']}")
+        return None
+    return match_search_results(project, response.text)
+
+
+def match_search_results(project, html):
+    """The title URL of the first IMDb search result matching the project's title and year, or None."""
+    with stage('parse'):
+        soup = BeautifulSoup(html, 'html.parser')
+    with stage('extract'):
+        return _first_match(project, soup)
+
+
+def _first_match(project, soup):
+    for result in soup.select("li.find-result-item"):
+        result_title = result.select_one(".ipc-metadata-list-summary-item__t")
+        if not result_title:
+            continue
+
+        result_title_text = result_title.get_text().strip()
+        result_year = result.select_one(".ipc-metadata-list-summary-item__st")
+        result_year_text = result_year.get_text().strip() if result_year else ""
+
+        # Check if title and year match
+        if (project['title'].lower() in result_title_text.lower() or
+            result_title_text.lower() in project['title'].lower()):
+
+            if project['year'] in result_year_text:
+                link = result_title.get('href')
+                if link and "/title/tt" in link:
+                    return urljoin("https://www.imdb.com", link)
+    return None
+
+
+def parse_chronological(input_file):
+    """Read the "- Title (year) - info" lines of the chronological Markdown file."""
     projects = []
     with open(input_file, 'r', encoding='utf-8') as f:
         for line in f:
             line = line.strip()
             # Match lines starting with - followed by a title and year pattern
-            match = re.match(r"- ([^(]+) \((\d{4}(?:-\d{4})?)\)(?: - (.+))?", line)
+            match = re.match(r"- ([^(]+) \((\d{4}(?:[-–]\d{4})?)\)(?: - (.+))?", line)
             if match:
                 title = match.group(1).strip()
                 year = match.group(2).strip()
@@ -23,110 +68,124 @@ def verify_imdb_links(input_file, output_file):
                     'info': info,
                     'original_line': line
                 })
+    return projects
 
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.9',
-    }
-    
-    session = requests.Session()
-    
-    verified_projects = []
-    failures = []
-    
+
+def open_title_index(index_path=DEFAULT_TITLE_DB):
+    """The offline title index, or None (with a note) when it has not been built."""
+    if index_path and os.path.exists(index_path):
+        return TitleIndex(index_path)
+    print(f"No offline title index at {index_path}; falling back to live IMDb search")
+    return None
+
+
+def verify_project(project, index, session):
+    """
+    Find the IMDb page for one project and check its credits.
+
+    Args:
+        project (dict): A parse_chronological() entry
+        index (TitleIndex): Offline title index, or None to use the live search
+        session (requests.Session): Session for the page fetches
+
+    Returns:
+        dict: The project plus ``url``, ``type_info``, ``credited`` and ``line``
+              (its verified Markdown line), or None if it could not be verified
+    """
+    if index is not None:
+        match = index.best_match(project['title'], project['year'])
+        best_match = match['url'] if match else None
+    else:
+        best_match = search_imdb(project, session)
+
+    if not best_match:
+        print(f"Could not find a match for {project['title']}")
+        return None
+
+    # Visit the IMDb page to verify
+    response = fetch(best_match, session=session)
+    if response.status_code != 200:
+        print(f"Failed to fetch {best_match}")
+        return None
+
+    # Extract IMDb ID
+    imdb_id = re.search(r"title/(tt\d+)", best_match).group(1)
+
+    # Check if Hila Yuval is listed in credits
+    has_hila = has_credit(response.text, "Hila Yuval")
+
+    # Verify type (Film vs Series) and episode count
+    type_info = "Film"
+    if "episode" in project['info'].lower():
+        type_info = f"{project['info']}"
+
+    verified_url = f"https://www.imdb.com/title/{imdb_id}/"
+    print(f"✓ Verified: {project['title']} -> {verified_url}")
+    return dict(project, url=verified_url, type_info=type_info, credited=has_hila,
+                line=f"- [{project['title']}]({verified_url}) ({project['year']}) - {type_info}")
+
+
+def has_credit(html, name):
+    """Whether ``name`` appears in the credit lists of a title or full credits page."""
+    with stage('parse'):
+        soup = BeautifulSoup(html, 'html.parser')
+    with stage('extract'):
+        for credit in soup.select(".ipc-metadata-list-item__content-container"):
+            if name in credit.get_text():
+                return True
+    return False
+
+
+def iter_verified(projects, index, session, failures=None):
+    """Yield each project as soon as it is verified; unverified ones go to ``failures``."""
     for i, project in enumerate(projects):
         print(f"Verifying {i+1}/{len(projects)}: {project['title']}")
-        
-        # Search IMDb for the title
-        search_url = f"https://www.imdb.com/find?q={project['title'].replace(' ', '+')}"
-        response = session.get(search_url, headers=headers)
-        
-        if response.status_code != 200:
-            print(f"Failed to search for {project['title']}")
-            failures.append(project)
-            continue
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        search_results = soup.select("li.find-result-item")
-        
-        # Find the best match
-        best_match = None
-        for result in search_results:
-            result_title = result.select_one(".ipc-metadata-list-summary-item__t")
-            if not result_title:
-                continue
-                
-            result_title_text = result_title.get_text().strip()
-            result_year = result.select_one(".ipc-metadata-list-summary-item__st")
-            result_year_text = result_year.get_text().strip() if result_year else ""
-            
-            # Check if title and year match
-            if (project['title'].lower() in result_title_text.lower() or 
-                result_title_text.lower() in project['title'].lower()):
-                
-                if project['year'] in result_year_text:
-                    link = result_title.get('href')
-                    if link and "/title/tt" in link:
-                        best_match = urljoin("https://www.imdb.com", link)
-                        break
-
-        if not best_match:
-            print(f"Could not find a match for {project['title']}")
-            failures.append(project)
-            continue
-            
-        # Visit the IMDb page to verify
-        response = session.get(best_match, headers=headers)
-        if response.status_code != 200:
-            print(f"Failed to fetch {best_match}")
+        verified = verify_project(project, index, session)
+        if verified:
+            yield verified
+        elif failures is not None:
             failures.append(project)
-            continue
-            
-        # Extract IMDb ID
-        imdb_id = re.search(r"title/(tt\d+)", best_match).group(1)
-        
-        # Check if Hila Yuval is listed in credits
-        soup = BeautifulSoup(response.text, 'html.parser')
-        has_hila = False
-        credits = soup.select(".ipc-metadata-list-item__content-container")
-        for credit in credits:
-            if "Hila Yuval" in credit.get_text():
-                has_hila = True
-                break
-        
-        # Verify type (Film vs Series) and episode count
-        type_info = "Film"
-        if "episode" in project['info'].lower():
-            type_info = f"{project['info']}"
-        
-        verified_title = soup.select_one("h1.sc-b73cd867-0")
-        verified_title = verified_title.get_text().strip() if verified_title else project['title']
-        
-        verified_url = f"https://www.imdb.com/title/{imdb_id}/"
-        verified_projects.append(
-            f"- [{project['title']}]({verified_url}) ({project['year']}) - {type_info}"
-        )
-        
-        print(f"✓ Verified: {project['title']} -> {verified_url}")
-        time.sleep(3)  # Respect rate limits
-    
-    # Write verified links to output file
-    with open(output_file, 'w', encoding='utf-8') as f:
-        for project in verified_projects:
-            f.write(f"{project}\n")
-    
-    # Report failures
+
+
+def report_failures(failures):
     if failures:
         print("\nCouldn't verify these projects:")
         for project in failures:
             print(f"- {project['title']} ({project['year']})")
-    
+
+
+def verify_imdb_links(input_file, output_file, index_path=DEFAULT_TITLE_DB):
+    """
+    Match each project in the chronological file to its IMDb page and check the credits.
+
+    Titles are matched against the offline index built by ``imdb_titles.py build``
+    when it exists, so the network is only used to fetch each matched title page.
+    Without an index the live IMDb search is used instead.
+    """
+    projects = parse_chronological(input_file)
+    failures = []
+    verified_projects = [v['line'] for v in iter_verified(projects, open_title_index(index_path), get_session(), failures)]
+
+    # Write verified links to output file
+    with open(output_file, 'w', encoding='utf-8') as f:
+        for project in verified_projects:
+            f.write(f"{project}\n")
+
+    report_failures(failures)
     print(f"\nVerified {len(verified_projects)} out of {len(projects)} projects")
     print(f"Results saved to {output_file}")
 
-# Run the verification
-verify_imdb_links(
-    "E:/PROG/hilayuval-claude/data/hila-yuval-chronological.md", 
-    "E:/PROG/hilayuval-claude/data/verified-imdb-links.md"
-)
\ No newline at end of file
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the IMDb links for the projects in the chronological Markdown file.")
+    parser.add_argument("--input", default="../data/hila-yuval-chronological.md", help="Chronological Markdown file")
+    parser.add_argument("--output", default="../data/verified-imdb-links.md", help="Where the verified links are written")
+    parser.add_argument("--index", default=DEFAULT_TITLE_DB, help="Offline title index built by imdb_titles.py")
+    imdb_profile.add_arguments(parser)
+    args = parser.parse_args()
+    imdb_profile.from_args(args)
+    verify_imdb_links(args.input, args.output, args.index)
+    imdb_profile.report(args.profile_out)
+
+if __name__ == "__main__":
+    main()
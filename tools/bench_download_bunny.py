@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""
+Benchmark tools/download_bunny.py against a local fake Bunny Storage server.
+
+Requirements:
+  - Python 3.8+
+  - pip install requests tqdm
+  - pip install 'httpx[http2]'  (only for --engine async)
+
+Usage:
+  python tools/bench_download_bunny.py --files 2000 --size-dist lognormal:48k:1.2 \
+      --parallel 4,16,64 --chunk-kib 64,1024 --page-size 0,500 --latency-ms 5
+
+Options:
+  --files          Number of synthetic files (default 1000)
+  --files-per-dir  Files per leaf directory (default 20); leaves are grouped
+                   into project folders of 10, like proj/audition/file
+  --size-dist      fixed:<size> | uniform:<min>:<max> | lognormal:<median>:<sigma>
+                   Sizes accept k/m/g suffixes (default lognormal:48k:1.0)
+  --latency-ms     Delay added to every request (default 0)
+  --throttle-rate  Fraction of object GETs answered with 429 (default 0)
+  --no-checksum    Leave Checksum out of the listing (skips hashing)
+  --parallel       Comma-separated download worker counts to sweep (default 4,16)
+  --list-parallel  Comma-separated listing worker counts to sweep (default 8)
+  --chunk-kib      Comma-separated read chunk sizes in KiB to sweep (default 1024)
+  --page-size      Comma-separated listing page sizes to sweep; 0 returns a
+                   directory in one JSON array like Bunny does (default 0)
+  --engine         Comma-separated engines to sweep: threads,async (default threads)
+  --json           Write the results to this file
+  --baseline       Compare against an earlier --json file and exit 1 when
+                   files/s or MB/s drops by more than --tolerance (default 0.15)
+
+Behavior:
+  - The fake server mimics the JSON directory listing (ObjectName,
+    IsDirectory, Length, LastChanged, Checksum), pagination markers and
+    Range requests; bodies are generated on the fly, nothing touches disk
+  - Each scenario runs in its own process; on Linux the peak RSS mark is
+    reset between phases, so listing and download peaks are separate
+    (elsewhere the download peak includes the listing)
+  - Reports files/s, MB/s, peak RSS and p50/p99 latency for list_files()
+    (per directory) and download_file() (per file)
+"""
+
+import sys
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import queue
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+ZONE = "bench"
+ACCESS_KEY = "bench-key"
+PATTERN_SIZE = 1024 * 1024
+WRITE_SIZE = 64 * 1024
+LAST_CHANGED = "2024-01-01T00:00:00.000"
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    units = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def size_sampler(spec, seed=0):
+    """Return a function producing file sizes for a ``--size-dist`` spec."""
+    rng = random.Random(seed)
+    kind, _, rest = spec.partition(":")
+    parts = rest.split(":") if rest else []
+    if kind == "fixed" and len(parts) == 1:
+        size = parse_size(parts[0])
+        return lambda: size
+    if kind == "uniform" and len(parts) == 2:
+        lo, hi = parse_size(parts[0]), parse_size(parts[1])
+        return lambda: rng.randint(lo, hi)
+    if kind == "lognormal" and len(parts) == 2:
+        mu, sigma = math.log(parse_size(parts[0])), float(parts[1])
+        return lambda: max(1, int(rng.lognormvariate(mu, sigma)))
+    raise ValueError(f"bad --size-dist: {spec}")
+
+
+class SyntheticZone:
+    """An in-memory storage zone: ``files`` keys spread over
+    ``proj<i>/aud<j>/`` folders whose bodies are a shared random pattern
+    read from a per-key offset."""
+
+    def __init__(self, files, files_per_dir, size_dist, checksums=True, seed=0):
+        rng = random.Random(seed)
+        self.pattern = rng.getrandbits(PATTERN_SIZE * 8).to_bytes(PATTERN_SIZE, "little")
+        self.checksums = checksums
+        self.dirs = {"": ([], [])}
+        self.objects = {}
+        self._checksum_cache = {}
+        self._lock = threading.Lock()
+        sample = size_sampler(size_dist, seed)
+        for i in range(files):
+            leaf = i // max(1, files_per_dir)
+            proj, aud = f"proj{leaf // 10}/", f"proj{leaf // 10}/aud{leaf % 10}/"
+            if proj not in self.dirs:
+                self.dirs[proj] = ([], [])
+                self.dirs[""][0].append(proj)
+            if aud not in self.dirs:
+                self.dirs[aud] = ([], [])
+                self.dirs[proj][0].append(aud)
+            key = f"{aud}file{i}.jpg"
+            self.dirs[aud][1].append(key)
+            self.objects[key] = (sample(), rng.randrange(PATTERN_SIZE))
+
+    @property
+    def total_bytes(self):
+        return sum(size for size, _ in self.objects.values())
+
+    def body(self, key, start=0, end=None):
+        """Yield bytes ``[start, end)`` of an object."""
+        size, offset = self.objects[key]
+        end = size if end is None else end
+        pos = start
+        while pos < end:
+            at = (offset + pos) % PATTERN_SIZE
+            n = min(WRITE_SIZE, end - pos, PATTERN_SIZE - at)
+            yield self.pattern[at:at + n]
+            pos += n
+
+    def checksum(self, key):
+        with self._lock:
+            cached = self._checksum_cache.get(key)
+        if cached is None:
+            hasher = hashlib.sha256()
+            for block in self.body(key):
+                hasher.update(block)
+            cached = hasher.hexdigest().upper()
+            with self._lock:
+                self._checksum_cache[key] = cached
+        return cached
+
+    def listing(self, prefix):
+        subdirs, files = self.dirs[prefix]
+        items = [{"ObjectName": d[len(prefix):-1], "IsDirectory": True, "Length": 0, "LastChanged": LAST_CHANGED}
+                 for d in subdirs]
+        for key in files:
+            item = {"ObjectName": key[len(prefix):], "IsDirectory": False,
+                    "Length": self.objects[key][0], "LastChanged": LAST_CHANGED}
+            if self.checksums:
+                item["Checksum"] = self.checksum(key)
+            items.append(item)
+        return items
+
+
+def make_handler(zone, page_size=0, latency=0.0, throttle_rate=0.0):
+    rng = random.Random(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; with Nagle on, clients
+        # that wait for the body stall on delayed ACKs.
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_empty(self, status):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            url = urlparse(self.path)
+            _, _, rel = unquote(url.path).lstrip("/").partition("/")
+            if self.headers.get("AccessKey") != ACCESS_KEY:
+                return self.send_empty(401)
+
+            if rel == "" or rel.endswith("/"):
+                if rel not in zone.dirs:
+                    return self.send_empty(404)
+                items = zone.listing(rel)
+                if not page_size:
+                    return self.send_json(items)
+                start = int(parse_qs(url.query).get("marker", ["0"])[0])
+                payload = {"Items": items[start:start + page_size]}
+                if start + page_size < len(items):
+                    payload["NextMarker"] = str(start + page_size)
+                return self.send_json(payload)
+
+            if rel not in zone.objects:
+                return self.send_empty(404)
+            if throttle_rate and rng.random() < throttle_rate:
+                return self.send_empty(429)
+            size = zone.objects[rel][0]
+            start, end = 0, size
+            rng_header = self.headers.get("Range")
+            if rng_header and rng_header.startswith("bytes="):
+                first, _, last = rng_header[6:].partition("-")
+                start = int(first)
+                end = int(last) + 1 if last else size
+                if start >= size:
+                    return self.send_empty(416)
+                end = min(end, size)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(end - start))
+            self.end_headers()
+            try:
+                for block in zone.body(rel, start, end):
+                    self.wfile.write(block)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+class FakeBunnyServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs when many workers connect at once,
+    # which shows up as 1s retransmit stalls in the latency tail.
+    request_queue_size = 1024
+
+
+def serve(zone_args, server_args, ready):
+    """Server process entry point: build the zone and serve until killed."""
+    zone = SyntheticZone(**zone_args)
+    if zone.checksums:
+        for key in zone.objects:
+            zone.checksum(key)
+    server = FakeBunnyServer(("127.0.0.1", 0), make_handler(zone, **server_args))
+    ready.put((server.server_address[1], len(zone.objects), zone.total_bytes))
+    server.serve_forever()
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def reset_peak_rss():
+    """Restart the peak RSS mark (Linux), so the next ``peak_rss_mb()`` covers one phase."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def download_threads(db, entries, out, session, parallel):
+    def one(entry):
+        started = time.perf_counter()
+        r = db.download_file(ZONE, entry["key"], ACCESS_KEY, out, session,
+                             expected_size=entry["length"], checksum=entry["checksum"])
+        return time.perf_counter() - started, r
+
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        return list(ex.map(one, entries))
+
+
+def download_async(db, entries, out, parallel):
+    import asyncio
+    import httpx
+
+    async def run():
+        gate = asyncio.Semaphore(parallel)
+        limits = httpx.Limits(max_connections=parallel, max_keepalive_connections=parallel)
+        async with httpx.AsyncClient(limits=limits, timeout=60.0) as client:
+            async def one(entry):
+                async with gate:
+                    started = time.perf_counter()
+                    r = await db.download_file_async(client, ZONE, entry["key"], ACCESS_KEY, out,
+                                                     expected_size=entry["length"], checksum=entry["checksum"])
+                    return time.perf_counter() - started, r
+            return await asyncio.gather(*(one(e) for e in entries))
+
+    return asyncio.run(run())
+
+
+def run_scenario(base_url, params, results):
+    """Scenario process entry point: time list_files() and download_file()."""
+    import download_bunny as db
+
+    db.BUNNY_API_BASE = base_url
+    db.CHUNK_SIZE = params["chunk_kib"] * 1024
+    session = db.make_session(params["parallel"] + params["list_parallel"])
+    out = tempfile.mkdtemp(prefix="bunny-bench-")
+    dir_latencies = []
+    try:
+        reset_peak_rss()
+        started = time.perf_counter()
+        entries = db.list_files(ZONE, ACCESS_KEY, workers=params["list_parallel"], session=session,
+                                on_dir=lambda prefix, files, dirs, seconds: dir_latencies.append(seconds))
+        list_seconds = time.perf_counter() - started
+        list_rss = peak_rss_mb()
+
+        reset_peak_rss()
+        started = time.perf_counter()
+        if params["engine"] == "async":
+            timed = download_async(db, entries, out, params["parallel"])
+        else:
+            timed = download_threads(db, entries, out, session, params["parallel"])
+        download_seconds = time.perf_counter() - started
+        download_rss = peak_rss_mb()
+    finally:
+        shutil.rmtree(out, ignore_errors=True)
+
+    latencies = [lat for lat, r in timed if r.get("status") == "downloaded"]
+    nbytes = sum(e["length"] or 0 for e, (_, r) in zip(entries, timed) if r.get("status") == "downloaded")
+    results.put(dict(
+        params,
+        files=len(entries),
+        list_seconds=round(list_seconds, 3),
+        list_files_per_sec=round(len(entries) / list_seconds, 1) if list_seconds else None,
+        list_p50_ms=round(percentile(dir_latencies, 50) * 1000, 1) if dir_latencies else None,
+        list_p99_ms=round(percentile(dir_latencies, 99) * 1000, 1) if dir_latencies else None,
+        list_rss_mb=list_rss,
+        download_seconds=round(download_seconds, 3),
+        files_per_sec=round(len(latencies) / download_seconds, 1) if download_seconds else None,
+        mb_per_sec=round(nbytes / (1024 * 1024) / download_seconds, 2) if download_seconds else None,
+        p50_ms=round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        p99_ms=round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        errors=sum(1 for _, r in timed if r.get("status") == "error"),
+        download_rss_mb=download_rss,
+    ))
+
+
+def wait_for(results, proc):
+    """Get the next message from a child process, failing if it died first."""
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if not proc.is_alive():
+                sys.exit(f"ERROR: {proc.name} exited with code {proc.exitcode}")
+
+
+def int_list(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+COLUMNS = [
+    ("engine", "engine"), ("parallel", "par"), ("list_parallel", "lpar"), ("chunk_kib", "chunkKiB"),
+    ("page_size", "page"), ("list_seconds", "list s"), ("list_files_per_sec", "list f/s"),
+    ("list_p50_ms", "list p50"), ("list_p99_ms", "list p99"), ("list_rss_mb", "list RSS"),
+    ("download_seconds", "dl s"), ("files_per_sec", "files/s"), ("mb_per_sec", "MB/s"),
+    ("p50_ms", "p50 ms"), ("p99_ms", "p99 ms"), ("errors", "err"), ("download_rss_mb", "dl RSS"),
+]
+PARAM_KEYS = ("engine", "parallel", "list_parallel", "chunk_kib", "page_size")
+
+
+def print_table(rows):
+    cells = [[str(r.get(key, "")) for key, _ in COLUMNS] for r in rows]
+    widths = [max(len(title), *(len(c[i]) for c in cells)) for i, (_, title) in enumerate(COLUMNS)]
+    print("  ".join(title.rjust(w) for (_, title), w in zip(COLUMNS, widths)))
+    for c in cells:
+        print("  ".join(v.rjust(w) for v, w in zip(c, widths)))
+
+
+def compare(rows, baseline_path, tolerance):
+    """Print throughput changes against a baseline run; return the regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {tuple(r.get(k) for k in PARAM_KEYS): r for r in json.load(f)["results"]}
+    regressions = []
+    for r in rows:
+        old = baseline.get(tuple(r.get(k) for k in PARAM_KEYS))
+        if not old:
+            continue
+        for metric in ("files_per_sec", "mb_per_sec"):
+            if old.get(metric) and r.get(metric) is not None:
+                change = (r[metric] - old[metric]) / old[metric]
+                flag = change < -tolerance
+                print(f"{'REGRESSION' if flag else 'ok':>10}  {metric:<13} {old[metric]:>9} -> {r[metric]:<9} "
+                      f"({change:+.0%})  {dict((k, r[k]) for k in PARAM_KEYS)}")
+                if flag:
+                    regressions.append((r, metric, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark download_bunny.py against a fake Bunny Storage server.")
+    parser.add_argument("--files", type=int, default=1000, help="Number of synthetic files")
+    parser.add_argument("--files-per-dir", type=int, default=20, help="Files per leaf directory")
+    parser.add_argument("--size-dist", default="lognormal:48k:1.0", help="fixed:<size> | uniform:<min>:<max> | lognormal:<median>:<sigma>")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every request")
+    parser.add_argument("--throttle-rate", type=float, default=0, help="Fraction of object GETs answered with 429")
+    parser.add_argument("--no-checksum", action="store_true", help="Leave Checksum out of the listing")
+    parser.add_argument("--parallel", type=int_list, default=[4, 16], help="Download worker counts to sweep")
+    parser.add_argument("--list-parallel", type=int_list, default=[8], help="Listing worker counts to sweep")
+    parser.add_argument("--chunk-kib", type=int_list, default=[1024], help="Read chunk sizes (KiB) to sweep")
+    parser.add_argument("--page-size", type=int_list, default=[0], help="Listing page sizes to sweep (0 = unpaginated)")
+    parser.add_argument("--engine", default="threads", help="Engines to sweep: threads,async")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Earlier --json file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed throughput drop against --baseline")
+    args = parser.parse_args()
+
+    size_sampler(args.size_dist)  # validate before starting any process
+    zone_args = dict(files=args.files, files_per_dir=args.files_per_dir, size_dist=args.size_dist,
+                     checksums=not args.no_checksum)
+    engines = [e.strip() for e in args.engine.split(",") if e.strip()]
+
+    rows = []
+    for page_size in args.page_size:
+        ready = multiprocessing.Queue()
+        server_args = dict(page_size=page_size, latency=args.latency_ms / 1000.0, throttle_rate=args.throttle_rate)
+        server = multiprocessing.Process(target=serve, args=(zone_args, server_args, ready), daemon=True)
+        server.start()
+        port, count, total = wait_for(ready, server)
+        print(f"Fake zone on port {port}: {count} files, {total / (1024 * 1024):.1f} MiB, page size {page_size or 'none'}")
+        try:
+            for engine, parallel, list_parallel, chunk_kib in itertools.product(
+                    engines, args.parallel, args.list_parallel, args.chunk_kib):
+                params = dict(engine=engine, parallel=parallel, list_parallel=list_parallel,
+                              chunk_kib=chunk_kib, page_size=page_size)
+                results = multiprocessing.Queue()
+                worker = multiprocessing.Process(target=run_scenario, args=(f"http://127.0.0.1:{port}", params, results))
+                worker.start()
+                row = wait_for(results, worker)
+                worker.join()
+                rows.append(row)
+                print_table([row])
+        finally:
+            server.terminate()
+            server.join()
+
+    print()
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"zone": zone_args, "server": {"latency_ms": args.latency_ms, "throttle_rate": args.throttle_rate},
+                       "results": rows}, f, indent=2)
+        print(f"Results saved to {args.json}")
+    if args.baseline:
+        print()
+        if compare(rows, args.baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ Download all files from a Bunny Storage zone preserving folder structure.
 Requirements:
   - Python 3.8+
   - pip install requests tqdm
+  - pip install 'httpx[http2]'  (only for --engine async)
+  - pip install zstandard  (only for --archive --zstd)
 
 Usage:
   export BUNNY_ACCESS_KEY="your_key_here"
@@ -16,134 +18,2346 @@ Options:
   --parallel   Number of parallel downloads (default 4)
   --force      Redownload files even if present
   --limit      Optional limit to number of files to download (useful for testing)
+  --list-parallel  Number of directories listed concurrently (default 8)
+  --pipeline   Download while listing: keys flow through a bounded queue
+               straight to the download workers
+  --queue-size Max keys buffered between listing and downloading, and max
+               downloads in flight in the default mode (default 1000)
+  --incremental  Keep a SQLite manifest (<out>/.bunny-manifest.sqlite) of remote
+               Length/LastChanged/Checksum and local state; only download
+               objects that are new or changed since the last run
+  --delete-removed  With --incremental, delete local files that were removed
+               upstream (default: flag them in the manifest and report)
+  --engine     threads (default) or async: one asyncio event loop with a
+               pooled httpx client (HTTP/2 when available); suited to
+               hundreds of concurrent small transfers, e.g. --parallel 256.
+               Always lists and downloads concurrently. File writes, the
+               manifest and linking run on worker threads, off the loop.
+  --segments   Split objects above the threshold into N byte ranges fetched
+               concurrently into a preallocated <file>.part (default 4, 1 = off).
+               Each segment resumes on its own via <file>.part.json.
+  --segment-threshold-mb  Size at which segmenting kicks in (default 256)
+  --adaptive   AIMD concurrency: start low, ramp up while transfers are
+               healthy, halve on 429/503, timeouts or latency spikes;
+               --parallel becomes the ceiling
+  --max-bandwidth  Aggregate bandwidth cap in MiB/s (token bucket)
+  --retries    Retry rounds with jittered exponential backoff for throttled
+               and transient failures (default 3)
+  --failed-list  Where files that still fail are written as JSONL
+               (default <out>/.bunny-failed.jsonl); an unfiltered run with
+               no failures removes it
+  --from-list  Re-run only the entries of a failed list, without listing
+  --no-verify  Don't check downloads against the listing's SHA-256 Checksum
+  --to-zone    Mirror into another storage zone: each GET body is streamed
+               straight into a PUT on the destination (no temp files, one
+               chunk in memory per transfer). Objects whose Length and
+               Checksum already match on the destination are skipped;
+               --delete-removed deletes destination objects missing from
+               the source. Uses BUNNY_DEST_ACCESS_KEY if set.
+  --order      Scheduling by listing Length: largest (default) starts the
+               biggest objects first so one late video can't stretch the
+               run; smallest gets the most files done early; listing keeps
+               the order keys are found in. With --pipeline/async the order
+               applies to the keys waiting in the queue.
+  --include    Only sync keys matching a glob (e.g. 'proj1/*.jpg'; * also
+               matches /) or a plain key prefix (e.g. proj1/). Repeatable.
+  --exclude    Skip keys matching a glob or prefix. Repeatable. Filters are
+               applied while listing, so excluded folders are never walked;
+               filtered runs never flag or delete removed files.
+  --dedup      Group the listing by SHA-256 Checksum and download each
+               content once; other paths with the same content become
+               reflinks where the filesystem supports them (btrfs, XFS),
+               hardlinks otherwise. A hardlinked file is unlinked before it
+               is ever rewritten, so its twins are never modified.
+  --archive    Stream bodies straight into tar shards (<out>/shard-NNNNN.tar)
+               instead of loose files, with no intermediate files. Each
+               transfer appends to a shard of its own; --shard-size-mb caps
+               them (default 1024). <out>/archive-index.jsonl maps each key
+               to its shard, offset and size; re-runs skip indexed keys.
+  --zstd       With --archive, compress shards with zstd, one frame per
+               member, so single members stay seekable (.tar.zst)
+  --extract    KEY: write one archived file to stdout by seeking into its
+               shard, e.g. --out backup --extract proj1/a.jpg > a.jpg
+  --report     Append JSONL metrics: one record per listed directory (files,
+               subdirs, seconds), per transfer attempt (status, bytes, TTFB,
+               transfer time, retries, HTTP status) and per phase
+  --prometheus  Write a Prometheus textfile (node_exporter collector) with
+               per-status file counts, bytes, phase durations, TTFB and
+               per-file latency histograms and last-run success
+  --verify-only  Hash the local mirror against the listing in a process
+               pool without downloading; corrupt files are quarantined and
+               missing or corrupt files are written to the failed list
 
 Behavior:
   - Preserves directory structure
   - Resumes partial downloads using HTTP Range
+  - Treats a local file as complete only if it matches the listed Length
+  - Verifies SHA-256 while writing; corrupt files are moved to
+    <out>/.quarantine and fetched again
   - Robust XML parsing of Bunny listing
+  - Lists directories concurrently
+  - Memory stays flat for millions of objects: the listing is spooled to a
+    temporary file, downloads are submitted in a bounded window, results are
+    tallied (and streamed to --report) rather than kept, and one scandir
+    pass over --out answers the skip checks
   - Safe to re-run
 """
 
 import os
 import sys
+import random
+import time
 import argparse
+import array
+import asyncio
+import fnmatch
+import hashlib
+import heapq
+import importlib.util
 import json
+import queue
+import itertools
+import sqlite3
+import tarfile
+import tempfile
+import threading
 import requests
 import xml.etree.ElementTree as ET
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from datetime import datetime, timezone
 from urllib.parse import quote
 from tqdm import tqdm
 
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, --dedup uses hardlinks
+    fcntl = None
+
 BUNNY_API_BASE = "https://storage.bunnycdn.com"
+CHUNK_SIZE = 1024 * 1024
+PART_SUFFIX = ".part"
+SEGMENT_STATE_EVERY = 16 * CHUNK_SIZE
+QUARANTINE_DIR = ".quarantine"
+FAILED_LIST_NAME = ".bunny-failed.jsonl"
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+RETRY_BACKOFF_BASE = 1.0
+RETRY_BACKOFF_CAP = 60.0
+LATENCY_SPIKE_FACTOR = 4.0
+SORT_RUN = 65536  # (rank, offset) pairs sorted in memory at once for --order
+SORT_BLOCK = 4096  # pairs read back per sorted run while merging
+MANIFEST_NAME = ".bunny-manifest.sqlite"
+MANIFEST_COMMIT_EVERY = 500
+ARCHIVE_INDEX_NAME = "archive-index.jsonl"
+ARCHIVE_ZSTD_LEVEL = 3
+GLOB_CHARS = "*?["
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, XFS, ...)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+
+def make_entry(key, length=None, last_changed=None, checksum=None):
+    """Normalise one file from a listing. The XML fallback only yields keys,
+    so the remote metadata fields may be ``None``."""
+    return {
+        "key": key,
+        "length": int(length) if length is not None else None,
+        "last_changed": last_changed or None,
+        "checksum": (checksum or "").lower() or None,
+    }
 
 
-def list_files(zone, access_key):
-    """List all files in a zone, supporting Bunny JSON listings and XML fallback."""
+def list_directory(zone, prefix, access_key, session=None):
+    """List one directory of a zone, following pagination markers.
+
+    Returns a ``(files, dirs)`` tuple. ``files`` are listing entries (see
+    ``make_entry``) and ``dirs`` are directory keys with a trailing slash,
+    both relative to the zone root.
+    """
+    http = session or requests
     headers = {"AccessKey": access_key}
-    keys = []
+    files = []
+    dirs = []
+    marker = None
+    while True:
+        url = f"{BUNNY_API_BASE}/{zone}/{prefix}"
+        params = {}
+        if marker:
+            params["marker"] = marker
 
-    def walk(prefix=""):
-        marker = None
-        while True:
-            url = f"{BUNNY_API_BASE}/{zone}/{prefix}"
-            params = {}
-            if marker:
-                params["marker"] = marker
-
-            resp = requests.get(url, headers=headers, params=params, timeout=30)
-            resp.raise_for_status()
-            body = (resp.text or "").strip()
-
-            # Bunny Storage currently returns JSON array listing.
-            # Keep XML parsing as a fallback for compatibility.
-            if body.startswith("[") or body.startswith("{"):
-                payload = json.loads(body)
-                if isinstance(payload, dict):
-                    items = payload.get("Items") or payload.get("items") or []
-                else:
-                    items = payload
+        resp = http.get(url, headers=headers, params=params, timeout=30)
+        resp.raise_for_status()
+        body = (resp.text or "").strip()
 
-                for item in items:
-                    name = item.get("ObjectName")
-                    if not name:
-                        continue
-                    is_dir = bool(item.get("IsDirectory"))
-                    rel = f"{prefix}{name}" if prefix else name
-                    if is_dir:
-                        walk(f"{rel}/")
-                    else:
-                        keys.append(rel)
-
-                next_marker = None
-                for token in ("NextMarker", "ContinuationToken", "NextContinuationToken", "Marker"):
-                    value = None
-                    if isinstance(payload, dict):
-                        value = payload.get(token) or payload.get(token.lower())
-                    if value:
-                        next_marker = value
-                        break
-                if next_marker:
-                    marker = next_marker
-                    continue
-                break
+        # Bunny Storage currently returns JSON array listing.
+        # Keep XML parsing as a fallback for compatibility.
+        if body.startswith("[") or body.startswith("{"):
+            payload = json.loads(body)
+            if isinstance(payload, dict):
+                items = payload.get("Items") or payload.get("items") or []
+            else:
+                items = payload
 
-            # XML fallback
-            root = ET.fromstring(resp.content)
-            page_keys = [elem.text for elem in root.findall(".//File/Key") if elem is not None and elem.text]
-            keys.extend(page_keys)
+            for item in items:
+                name = item.get("ObjectName")
+                if not name:
+                    continue
+                is_dir = bool(item.get("IsDirectory"))
+                rel = f"{prefix}{name}" if prefix else name
+                if is_dir:
+                    dirs.append(f"{rel}/")
+                else:
+                    files.append(make_entry(rel, item.get("Length"), item.get("LastChanged"), item.get("Checksum")))
 
             next_marker = None
-            nm = root.find(".//NextMarker")
-            if nm is not None and nm.text:
-                next_marker = nm.text
-            if not next_marker:
-                ct = root.find(".//ContinuationToken") or root.find(".//NextContinuationToken")
-                if ct is not None and ct.text:
-                    next_marker = ct.text
-            if not next_marker:
-                m = root.find(".//Marker")
-                if m is not None and m.text:
-                    next_marker = m.text
+            for token in ("NextMarker", "ContinuationToken", "NextContinuationToken", "Marker"):
+                value = None
+                if isinstance(payload, dict):
+                    value = payload.get(token) or payload.get(token.lower())
+                if value:
+                    next_marker = value
+                    break
             if next_marker:
                 marker = next_marker
                 continue
             break
 
-    walk("")
-    return keys
+        # XML fallback
+        root = ET.fromstring(resp.content)
+        page_keys = [elem.text for elem in root.findall(".//File/Key") if elem is not None and elem.text]
+        files.extend(make_entry(k) for k in page_keys)
 
+        next_marker = None
+        nm = root.find(".//NextMarker")
+        if nm is not None and nm.text:
+            next_marker = nm.text
+        if not next_marker:
+            ct = root.find(".//ContinuationToken") or root.find(".//NextContinuationToken")
+            if ct is not None and ct.text:
+                next_marker = ct.text
+        if not next_marker:
+            m = root.find(".//Marker")
+            if m is not None and m.text:
+                next_marker = m.text
+        if next_marker:
+            marker = next_marker
+            continue
+        break
 
-def download_file(zone, key, access_key, outdir, session, force=False):
-    local_path = os.path.join(outdir, key)
-    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    return files, dirs
 
-    if os.path.exists(local_path) and not force:
-        if os.path.getsize(local_path) > 0:
-            return {"key": key, "status": "skipped", "path": local_path}
 
-    encoded_key = quote(key, safe="/")
-    url = f"{BUNNY_API_BASE}/{zone}/{encoded_key}"
-    headers = {"AccessKey": access_key}
+class KeyFilter:
+    """``--include``/``--exclude`` patterns, applied while walking the zone.
+
+    A pattern containing ``*``, ``?`` or ``[`` is matched against the whole
+    key with fnmatch (``*`` also matches ``/``); any other pattern is a key
+    prefix. A key is wanted if it matches some include (or there are none)
+    and no exclude. Directories that cannot hold a wanted key are not listed.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+
+    def __bool__(self):
+        return bool(self.include or self.exclude)
+
+    @staticmethod
+    def _is_glob(pattern):
+        return any(c in pattern for c in GLOB_CHARS)
+
+    @classmethod
+    def _match(cls, key, pattern):
+        return fnmatch.fnmatchcase(key, pattern) if cls._is_glob(pattern) else key.startswith(pattern)
+
+    @staticmethod
+    def _literal_prefix(pattern):
+        for i, c in enumerate(pattern):
+            if c in GLOB_CHARS:
+                return pattern[:i]
+        return pattern
+
+    def match(self, key):
+        if self.include and not any(self._match(key, p) for p in self.include):
+            return False
+        return not any(self._match(key, p) for p in self.exclude)
+
+    def walk(self, prefix):
+        """Whether the directory ``prefix`` (with a trailing slash) may hold wanted keys."""
+        for p in self.exclude:
+            # A prefix, or a glob ending in "*", that covers the directory covers everything below it.
+            if (not self._is_glob(p) or p.endswith("*")) and self._match(prefix, p):
+                return False
+        if not self.include:
+            return True
+        return any(prefix.startswith(lit) or lit.startswith(prefix) for lit in map(self._literal_prefix, self.include))
+
+
+def walk_zone(zone, access_key, on_file, workers=8, session=None, on_dir=None, key_filter=None):
+    """Walk a zone with ``workers`` concurrent directory listings.
+
+    ``on_file(entry)`` is called from the listing threads as soon as each file
+    is discovered, so it may block (e.g. on a bounded queue) to apply
+    backpressure. Returning ``False`` from it stops the walk early.
+    ``on_dir(prefix, files, dirs, seconds)`` is told how long each directory
+    took to list. With a ``KeyFilter`` unwanted files are dropped and
+    unwanted subtrees are never listed. The first listing error is re-raised
+    once the walk has drained.
+    """
+    lock = threading.Lock()
+    drained = threading.Event()
+    stop = threading.Event()
+    errors = []
+    pending = 0
+
+    ex = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="list")
+
+    def submit(prefix):
+        nonlocal pending
+        with lock:
+            pending += 1
+        ex.submit(visit, prefix)
+
+    def visit(prefix):
+        nonlocal pending
+        try:
+            if stop.is_set():
+                return
+            started = time.monotonic()
+            files, dirs = list_directory(zone, prefix, access_key, session)
+            if on_dir:
+                on_dir(prefix, len(files), len(dirs), time.monotonic() - started)
+            for d in dirs:
+                if not key_filter or key_filter.walk(d):
+                    submit(d)
+            for entry in files:
+                if key_filter and not key_filter.match(entry["key"]):
+                    continue
+                if stop.is_set() or on_file(entry) is False:
+                    stop.set()
+                    break
+        except Exception as e:
+            stop.set()
+            errors.append(e)
+        finally:
+            with lock:
+                pending -= 1
+                if pending == 0:
+                    drained.set()
+
+    submit("")
+    drained.wait()
+    ex.shutdown(wait=True)
+    if errors:
+        raise errors[0]
+
+
+def list_files(zone, access_key, workers=1, session=None, on_dir=None, key_filter=None):
+    """List all files in a zone, supporting Bunny JSON listings and XML fallback.
+
+    Returns listing entries (see ``make_entry``).
+    """
+    entries = []
+    walk_zone(zone, access_key, entries.append, workers=workers, session=session, on_dir=on_dir,
+              key_filter=key_filter)
+    return entries
+
+
+class LocalIndex:
+    """What is already under ``--out``, from one ``os.scandir`` walk up front.
+
+    Maps each key to its local size and remembers which directories exist, so
+    the skip check and ``makedirs`` cost no syscalls per key. Our own
+    bookkeeping (quarantine, manifest, failed list) is not indexed. The index
+    reflects the tree as it was when the run started.
+    """
+
+    def __init__(self, outdir):
+        self.sizes = {}
+        self.dirs = set()
+        if not os.path.isdir(outdir):
+            return
+        stack = [(outdir, "")]
+        while stack:
+            path, prefix = stack.pop()
+            self.dirs.add(path)
+            with os.scandir(path) as it:
+                for e in it:
+                    if not prefix and (e.name == QUARANTINE_DIR or e.name.startswith((MANIFEST_NAME, FAILED_LIST_NAME))):
+                        continue
+                    if e.is_dir(follow_symlinks=False):
+                        stack.append((e.path, prefix + e.name + "/"))
+                    elif e.is_file():
+                        self.sizes[prefix + e.name] = e.stat().st_size
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def size(self, key):
+        return self.sizes.get(key)
+
+    def makedirs(self, path):
+        if path not in self.dirs:
+            os.makedirs(path, exist_ok=True)
+            self.dirs.add(path)
+
+
+def plan_download(outdir, key, force=False, expected_size=None, index=None):
+    """Decide how to fetch ``key`` given what is already on disk.
+
+    Returns ``(local_path, mode, resume_pos)``; ``mode`` is ``None`` when the
+    local copy is complete and the download can be skipped. When
+    ``expected_size`` (the listing Length) is known, a local file only counts
+    as complete if it has exactly that size; otherwise any non-empty file is
+    skipped. With a ``LocalIndex`` the disk is not consulted at all.
+    """
+    local_path = os.path.join(outdir, key)
+    if index is not None:
+        index.makedirs(os.path.dirname(local_path))
+        local_size = index.size(key)
+    else:
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        local_size = os.path.getsize(local_path) if os.path.exists(local_path) else None
+    if local_size is not None and not force:
+        if expected_size is None and local_size > 0:
+            return local_path, None, 0
+        if expected_size is not None and local_size == expected_size:
+            return local_path, None, 0
 
     mode = "ab"
     resume_pos = 0
-    if os.path.exists(local_path):
-        resume_pos = os.path.getsize(local_path)
+    if local_size is not None:
+        resume_pos = local_size
+        try:
+            shared = os.stat(local_path).st_nlink > 1
+        except FileNotFoundError:
+            shared = False
+        if shared:
+            # A --dedup hardlink: writing in place would change every linked copy.
+            os.remove(local_path)
+            resume_pos = 0
+    if force or (expected_size is not None and resume_pos > expected_size):
+        mode = "wb"
+        resume_pos = 0
+    return local_path, mode, resume_pos
+
+
+def link_file(source, dest):
+    """Materialise ``dest`` as a copy of ``source`` without copying data: a
+    reflink where the filesystem supports it, otherwise a hardlink. Returns
+    ``"reflink"`` or ``"hardlink"``; raises ``OSError`` if neither works."""
+    tmp = dest + ".link"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    how = "hardlink"
+    if fcntl is not None:
+        try:
+            with open(source, "rb") as src, open(tmp, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            how = "reflink"
+        except OSError:
+            os.remove(tmp)
+    if how == "hardlink":
+        os.link(source, tmp)
+    os.replace(tmp, dest)
+    return how
+
+
+class DedupIndex:
+    """``--dedup``: one download per listing Checksum.
+
+    The first entry seen with a checksum owns it and downloads the content;
+    later entries wait for the owner and are linked to its file. If the owner
+    fails, the waiting entries download their own copy and the next entry
+    with that checksum becomes the owner.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sources = {}
+        self.pending = {}
+
+    def claim(self, entry):
+        """Return ``(owner, source)``: ``source`` is the local path of the
+        content, or a ``Future`` of it while the owner is still fetching."""
+        checksum = entry["checksum"]
+        if not checksum:
+            return True, None
+        with self.lock:
+            if checksum in self.sources:
+                return False, self.sources[checksum]
+            if checksum in self.pending:
+                return False, self.pending[checksum]
+            self.pending[checksum] = Future()
+            return True, None
+
+    def offer(self, entry, path):
+        """Record an unchanged local copy as the source for its checksum."""
+        if entry["checksum"]:
+            with self.lock:
+                self.sources.setdefault(entry["checksum"], path)
+
+    def resolve(self, entry, r):
+        checksum = entry["checksum"]
+        if not checksum:
+            return
+        path = r.get("path") if r.get("status") in ("downloaded", "skipped") else None
+        with self.lock:
+            fut = self.pending.pop(checksum, None)
+            if path:
+                self.sources[checksum] = path
+        if fut is not None:
+            fut.set_result(path)
+
+
+def object_url(zone, key):
+    return f"{BUNNY_API_BASE}/{zone}/{quote(key, safe='/')}"
+
+
+def sha256_file(path, hasher=None):
+    """SHA-256 of a file (or feed it into an existing ``hasher``)."""
+    hasher = hasher or hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(block)
+    return hasher
+
+
+def start_hash(local_path, mode, checksum):
+    """Hasher for the bytes that will end up in ``local_path``, or ``None``
+    when there is no checksum to compare against. When appending to a
+    partial file its existing prefix is hashed first."""
+    if not checksum:
+        return None
+    hasher = hashlib.sha256()
+    if mode == "ab" and os.path.exists(local_path):
+        sha256_file(local_path, hasher)
+    return hasher
+
+
+def off_loop(func, *args):
+    """Run blocking disk or SQLite work for the asyncio engine on the default
+    executor, so the event loop keeps serving other transfers meanwhile."""
+    return asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+def write_chunk(f, chunk, hasher=None):
+    f.write(chunk)
+    if hasher:
+        hasher.update(chunk)
+
+
+def quarantine(outdir, key, path):
+    """Move a corrupt download out of the mirror so it is never skipped as complete."""
+    dest = os.path.join(outdir, QUARANTINE_DIR, key)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.replace(path, dest)
+    return dest
+
+
+def finish_download(outdir, key, local_path, hasher, checksum, ttfb=None, transfer=None, nbytes=None):
+    """Result for a finished transfer: ``ttfb`` is the time to the response
+    headers, ``transfer`` the time spent on the body and ``nbytes`` its size."""
+    if hasher is not None and hasher.hexdigest() != checksum:
+        return {"key": key, "status": "error", "error": "checksum mismatch", "checksum_mismatch": True,
+                "quarantined": quarantine(outdir, key, local_path), "bytes": nbytes}
+    return {"key": key, "status": "downloaded", "path": local_path, "ttfb": ttfb, "transfer": transfer,
+            "bytes": nbytes}
+
+
+def download_file(zone, key, access_key, outdir, session, force=False, expected_size=None, bucket=None, checksum=None,
+                  index=None):
+    """Download one key, resuming a partial local copy (see ``plan_download``).
+
+    ``bucket`` is an optional ``TokenBucket`` capping the aggregate bandwidth.
+    With a ``checksum`` (lowercase SHA-256 hex from the listing) the body is
+    hashed as it is written and a mismatching file is quarantined.
+    """
+    local_path, mode, resume_pos = plan_download(outdir, key, force, expected_size, index)
+    if mode is None:
+        return {"key": key, "status": "skipped", "path": local_path}
+
+    url = object_url(zone, key)
+    headers = {"AccessKey": access_key}
 
     try:
         if resume_pos > 0:
             headers["Range"] = f"bytes={resume_pos}-"
+        started = time.monotonic()
         with session.get(url, headers=headers, stream=True, timeout=60) as r:
+            ttfb = time.monotonic() - started
             if r.status_code in (200, 206):
+                # A 200 carries the whole body even if we asked for a range.
+                mode = "wb" if r.status_code == 200 else mode
+                hasher = start_hash(local_path, mode, checksum)
+                nbytes = 0
                 with open(local_path, mode) as f:
-                    for chunk in r.iter_content(chunk_size=1024 * 1024):
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
                         if chunk:
+                            if bucket:
+                                time.sleep(bucket.reserve(len(chunk)))
                             f.write(chunk)
-                return {"key": key, "status": "downloaded", "path": local_path}
+                            nbytes += len(chunk)
+                            if hasher:
+                                hasher.update(chunk)
+                transfer = time.monotonic() - started - ttfb
+                return finish_download(outdir, key, local_path, hasher, checksum, ttfb, transfer, nbytes)
             else:
                 return {"key": key, "status": "error", "http_status": r.status_code, "text": r.text}
     except Exception as e:
-        return {"key": key, "status": "error", "error": str(e)}
+        return error_result(key, e)
+
+
+async def download_file_async(client, zone, key, access_key, outdir, force=False, expected_size=None, bucket=None,
+                              checksum=None, index=None):
+    """``download_file`` for the asyncio engine, streaming through an
+    ``httpx.AsyncClient`` so the event loop never blocks on the network.
+    Disk work (stats, writes, hashing, quarantine) runs via ``off_loop``."""
+    local_path, mode, resume_pos = await off_loop(plan_download, outdir, key, force, expected_size, index)
+    if mode is None:
+        return {"key": key, "status": "skipped", "path": local_path}
+
+    headers = {"AccessKey": access_key}
+    try:
+        if resume_pos > 0:
+            headers["Range"] = f"bytes={resume_pos}-"
+        started = time.monotonic()
+        async with client.stream("GET", object_url(zone, key), headers=headers) as r:
+            ttfb = time.monotonic() - started
+            if r.status_code in (200, 206):
+                mode = "wb" if r.status_code == 200 else mode
+                hasher = await off_loop(start_hash, local_path, mode, checksum)
+                nbytes = 0
+                f = await off_loop(open, local_path, mode)
+                try:
+                    async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                        if bucket:
+                            await asyncio.sleep(bucket.reserve(len(chunk)))
+                        await off_loop(write_chunk, f, chunk, hasher)
+                        nbytes += len(chunk)
+                finally:
+                    await off_loop(f.close)
+                transfer = time.monotonic() - started - ttfb
+                return await off_loop(finish_download, outdir, key, local_path, hasher, checksum, ttfb, transfer,
+                                      nbytes)
+            await r.aread()
+            return {"key": key, "status": "error", "http_status": r.status_code, "text": r.text}
+    except Exception as e:
+        return error_result(key, e)
+
+
+def error_result(key, e):
+    """Result dict for an exception; keeps the HTTP status of raised
+    ``HTTPError``/``HTTPStatusError`` so retries can classify it."""
+    r = {"key": key, "status": "error", "error": str(e), "error_type": type(e).__name__}
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        r["http_status"] = status
+    return r
+
+
+class RangeNotSupported(Exception):
+    """The server answered a segment request with the whole body."""
+
+
+class SegmentState:
+    """Progress of a segmented download, kept in a JSON sidecar next to the
+    ``.part`` file so every segment can resume on its own after a crash.
+
+    The sidecar records the object size and version (LastChanged/Checksum);
+    a mismatch on load means the object changed and the download restarts.
+    """
+
+    def __init__(self, path, size, version, segments):
+        self.path = path
+        self.size = size
+        self.version = version
+        self.segments = segments
+        self.lock = threading.Lock()
+        self.unsaved = 0
+
+    @classmethod
+    def load_or_create(cls, path, size, version, count, fresh=False):
+        if not fresh:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("size") == size and data.get("version") == version:
+                    return cls(path, size, version, data["segments"])
+            except (OSError, ValueError, KeyError):
+                pass
+        step = -(-size // count)
+        segments = [{"start": start, "end": min(start + step, size), "done": 0} for start in range(0, size, step)]
+        state = cls(path, size, version, segments)
+        state.save()
+        return state
+
+    def pending(self):
+        return [seg for seg in self.segments if seg["start"] + seg["done"] < seg["end"]]
+
+    def advance(self, seg, nbytes):
+        with self.lock:
+            seg["done"] += nbytes
+            self.unsaved += nbytes
+            if self.unsaved >= SEGMENT_STATE_EVERY or seg["start"] + seg["done"] >= seg["end"]:
+                self._save()
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"size": self.size, "version": self.version, "segments": self.segments}, f)
+        os.replace(tmp, self.path)
+        self.unsaved = 0
+
+
+def prepare_segments(outdir, key, size, segments, force=False, version=None):
+    """Set up a segmented download of ``key`` into a preallocated ``.part`` file.
+
+    Returns ``(local_path, part_path, state)``; ``state`` is ``None`` when the
+    local copy is already complete.
+    """
+    local_path, mode, _ = plan_download(outdir, key, force, size)
+    if mode is None:
+        return local_path, None, None
+    part_path = local_path + PART_SUFFIX
+    fresh = force or not os.path.exists(part_path)
+    state = SegmentState.load_or_create(part_path + ".json", size, version, segments, fresh=fresh)
+    with open(part_path, "r+b" if os.path.exists(part_path) else "wb") as f:
+        f.truncate(size)
+    return local_path, part_path, state
+
+
+def finish_segments(outdir, key, local_path, part_path, state, checksum=None, ttfb=None, transfer=None, nbytes=None):
+    """Promote a completed ``.part`` file. Segments arrive out of order, so
+    unlike single-stream downloads the checksum needs one read pass here."""
+    os.remove(state.path)
+    hasher = sha256_file(part_path) if checksum else None
+    os.replace(part_path, local_path)
+    return finish_download(outdir, key, local_path, hasher, checksum, ttfb, transfer, nbytes)
+
+
+def discard_segments(part_path, state):
+    """Remove a segmented download's ``.part`` file and its state, so a
+    single-stream fallback leaves nothing preallocated behind."""
+    for path in (part_path, state.path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def pending_bytes(segments):
+    return sum(seg["end"] - seg["start"] - seg["done"] for seg in segments)
+
+
+def segment_range(seg):
+    return f"bytes={seg['start'] + seg['done']}-{seg['end'] - 1}"
+
+
+def open_segment(part_path, seg):
+    f = open(part_path, "r+b")
+    f.seek(seg["start"] + seg["done"])
+    return f
+
+
+def write_segment(f, state, seg, chunk):
+    f.write(chunk)
+    f.flush()
+    state.advance(seg, len(chunk))
+
+
+def fetch_segment(session, url, access_key, part_path, state, seg, bucket=None):
+    """Fetch the rest of one segment; returns its time to first byte."""
+    headers = {"AccessKey": access_key, "Range": segment_range(seg)}
+    started = time.monotonic()
+    with session.get(url, headers=headers, stream=True, timeout=60) as r:
+        ttfb = time.monotonic() - started
+        if r.status_code == 200:
+            raise RangeNotSupported(url)
+        r.raise_for_status()
+        with open_segment(part_path, seg) as f:
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    if bucket:
+                        time.sleep(bucket.reserve(len(chunk)))
+                    write_segment(f, state, seg, chunk)
+    if seg["start"] + seg["done"] < seg["end"]:
+        raise IOError(f"short read on segment {segment_range(seg)}")
+    return ttfb
+
+
+def download_segmented(zone, key, access_key, outdir, session, size, segments, force=False, version=None, bucket=None,
+                       checksum=None):
+    """Fetch a large object as ``segments`` concurrent byte ranges written in
+    place into a preallocated file. Falls back to ``download_file`` if the
+    server ignores Range."""
+    local_path, part_path, state = prepare_segments(outdir, key, size, segments, force, version)
+    if state is None:
+        return {"key": key, "status": "skipped", "path": local_path}
+
+    url = object_url(zone, key)
+    pending = state.pending()
+    nbytes = pending_bytes(pending)
+    started = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="segment") as ex:
+            futures = [ex.submit(fetch_segment, session, url, access_key, part_path, state, seg, bucket) for seg in pending]
+            # The first segment to answer stands for the object's time to first byte.
+            ttfb = min((f.result() for f in as_completed(futures)), default=None)
+        return finish_segments(outdir, key, local_path, part_path, state, checksum, ttfb,
+                               time.monotonic() - started - (ttfb or 0), nbytes)
+    except RangeNotSupported:
+        discard_segments(part_path, state)
+        return download_file(zone, key, access_key, outdir, session, True, size, bucket, checksum)
+    except Exception as e:
+        return error_result(key, e)
+
+
+async def fetch_segment_async(client, url, access_key, part_path, state, seg, bucket=None):
+    headers = {"AccessKey": access_key, "Range": segment_range(seg)}
+    started = time.monotonic()
+    async with client.stream("GET", url, headers=headers) as r:
+        ttfb = time.monotonic() - started
+        if r.status_code == 200:
+            raise RangeNotSupported(url)
+        r.raise_for_status()
+        f = await off_loop(open_segment, part_path, seg)
+        try:
+            async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                if bucket:
+                    await asyncio.sleep(bucket.reserve(len(chunk)))
+                await off_loop(write_segment, f, state, seg, chunk)
+        finally:
+            await off_loop(f.close)
+    if seg["start"] + seg["done"] < seg["end"]:
+        raise IOError(f"short read on segment {segment_range(seg)}")
+    return ttfb
+
+
+async def download_segmented_async(client, zone, key, access_key, outdir, size, segments, force=False, version=None,
+                                   bucket=None, checksum=None):
+    local_path, part_path, state = await off_loop(prepare_segments, outdir, key, size, segments, force, version)
+    if state is None:
+        return {"key": key, "status": "skipped", "path": local_path}
+
+    url = object_url(zone, key)
+    pending = state.pending()
+    nbytes = pending_bytes(pending)
+    started = time.monotonic()
+    tasks = [asyncio.ensure_future(fetch_segment_async(client, url, access_key, part_path, state, seg, bucket))
+             for seg in pending]
+    try:
+        try:
+            ttfb = min(await asyncio.gather(*tasks), default=None)
+        except BaseException:
+            # gather() returns on the first failure; stop the other segments
+            # before anything else touches the .part file.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        # The whole-file hash is a full read of the object; run it on a worker thread.
+        return await off_loop(finish_segments, outdir, key, local_path, part_path, state, checksum, ttfb,
+                              time.monotonic() - started - (ttfb or 0), nbytes)
+    except RangeNotSupported:
+        await off_loop(discard_segments, part_path, state)
+        return await download_file_async(client, zone, key, access_key, outdir, True, size, bucket, checksum)
+    except Exception as e:
+        return error_result(key, e)
+
+
+def is_throttled(r):
+    return r.get("http_status") in (429, 503) or "Timeout" in r.get("error_type", "")
+
+
+def is_retryable(r):
+    """Errors worth another attempt: throttling, server errors and transport
+    failures (timeouts, resets). Client errors such as 404 are final."""
+    if r.get("status") != "error":
+        return False
+    status = r.get("http_status")
+    return status in RETRYABLE_STATUS if status is not None else "error" in r
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency window between 1 and ``--parallel`` transfers.
+
+    The window grows by about one slot per window of healthy transfers and
+    halves, at most once per ``cooldown`` seconds, on throttling: 429/503
+    responses, timeouts, or a time to first byte well above the running
+    baseline. Usable from worker threads (``acquire``/``release``) or from
+    the event loop (``acquire_async``/``release_async``).
+    """
+
+    def __init__(self, maximum, initial=4, cooldown=2.0):
+        self.maximum = max(1, maximum)
+        self.limit = float(min(self.maximum, initial))
+        self.cooldown = cooldown
+        self.active = 0
+        self.baseline = None
+        self.last_decrease = 0.0
+        self.cond = threading.Condition()
+        self.async_cond = None
+        self.async_loop = None
+
+    def acquire(self):
+        with self.cond:
+            while self.active >= int(self.limit):
+                self.cond.wait()
+            self.active += 1
+
+    def release(self, r):
+        with self.cond:
+            self.active -= 1
+            self._adjust(r)
+            self.cond.notify_all()
+
+    def _condition(self):
+        # An asyncio.Condition belongs to one event loop, and every retry
+        # round runs on a fresh one.
+        loop = asyncio.get_running_loop()
+        if self.async_loop is not loop:
+            self.async_cond = asyncio.Condition()
+            self.async_loop = loop
+        return self.async_cond
+
+    async def acquire_async(self):
+        cond = self._condition()
+        async with cond:
+            await cond.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def release_async(self, r):
+        cond = self._condition()
+        async with cond:
+            self.active -= 1
+            self._adjust(r)
+            cond.notify_all()
+
+    def _adjust(self, r):
+        ttfb = r.get("ttfb")
+        spike = ttfb is not None and self.baseline is not None and ttfb > LATENCY_SPIKE_FACTOR * self.baseline
+        if is_throttled(r) or spike:
+            now = time.monotonic()
+            if now - self.last_decrease >= self.cooldown:
+                self.limit = max(1.0, self.limit / 2)
+                self.last_decrease = now
+        elif r.get("status") == "downloaded":
+            self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+        if ttfb is not None:
+            self.baseline = ttfb if self.baseline is None else 0.9 * self.baseline + 0.1 * ttfb
+
+
+class TokenBucket:
+    """Aggregate bandwidth cap shared by all transfers (``--max-bandwidth``)."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        """Take ``nbytes`` tokens, going into debt if needed, and return how
+        many seconds the caller must wait before using them."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= nbytes
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class Throttle:
+    """The optional adaptive limiter and bandwidth bucket for one run."""
+
+    def __init__(self, limiter=None, bucket=None):
+        self.limiter = limiter
+        self.bucket = bucket
+
+    @classmethod
+    def from_args(cls, args):
+        limiter = AdaptiveLimiter(args.parallel) if args.adaptive else None
+        bucket = TokenBucket(args.max_bandwidth * 1024 * 1024) if args.max_bandwidth else None
+        return cls(limiter, bucket)
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for retry round ``attempt`` (1-based)."""
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt))
+
+
+def make_session(pool_size):
+    """A ``requests.Session`` whose connection pool fits ``pool_size``
+    concurrent users. urllib3 defaults to 10 connections per host and
+    discards the rest with pool-full warnings."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=max(10, pool_size))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class SyncManifest:
+    """SQLite manifest under ``--out`` recording, per key, the remote listing
+    metadata (Length, LastChanged, Checksum) and the local file last written
+    for it. Used by ``--incremental`` to transfer only new or changed objects.
+    """
+
+    def __init__(self, outdir):
+        os.makedirs(outdir, exist_ok=True)
+        self.outdir = outdir
+        self.path = os.path.join(outdir, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                remote_length INTEGER,
+                remote_last_changed TEXT,
+                remote_checksum TEXT,
+                local_size INTEGER,
+                local_mtime REAL,
+                synced_at TEXT,
+                seen_run INTEGER,
+                removed_upstream INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                complete INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+        cur = self.conn.execute("INSERT INTO runs (started_at) VALUES (?)", (_utcnow(),))
+        self.run_id = cur.lastrowid
+        self.conn.commit()
+
+    def check(self, entry, local_path, index=None):
+        """Return ``"unchanged"``, ``"changed"`` or ``"new"`` for a listing entry.
+
+        An entry is unchanged only if the remote metadata matches what was
+        recorded and the local file still has the size we wrote. With a
+        :class:`LocalIndex` the size comes from its scan instead of a stat.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT remote_length, remote_last_changed, remote_checksum, local_size FROM objects WHERE key = ?",
+                (entry["key"],),
+            ).fetchone()
+        if row is None:
+            return "new"
+        remote = (entry["length"], entry["last_changed"], entry["checksum"])
+        if tuple(row[:3]) != remote:
+            return "changed"
+        if index is not None:
+            local_size = index.size(entry["key"])
+        else:
+            try:
+                local_size = os.path.getsize(local_path)
+            except OSError:
+                local_size = None
+        if local_size is None:
+            return "new"
+        if local_size != row[3] or (entry["length"] is not None and local_size != entry["length"]):
+            return "new"
+        return "unchanged"
+
+    def mark_seen(self, key):
+        self._write("UPDATE objects SET seen_run = ?, removed_upstream = 0 WHERE key = ?", (self.run_id, key))
+
+    def record(self, entry, local_path):
+        st = os.stat(local_path)
+        self._write(
+            """
+            INSERT INTO objects (key, remote_length, remote_last_changed, remote_checksum,
+                                 local_size, local_mtime, synced_at, seen_run, removed_upstream)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+            ON CONFLICT(key) DO UPDATE SET
+                remote_length = excluded.remote_length,
+                remote_last_changed = excluded.remote_last_changed,
+                remote_checksum = excluded.remote_checksum,
+                local_size = excluded.local_size,
+                local_mtime = excluded.local_mtime,
+                synced_at = excluded.synced_at,
+                seen_run = excluded.seen_run,
+                removed_upstream = 0
+            """,
+            (entry["key"], entry["length"], entry["last_changed"], entry["checksum"],
+             st.st_size, st.st_mtime, _utcnow(), self.run_id),
+        )
+
+    def removed_upstream(self):
+        """Keys recorded by an earlier run but not listed in this one. Only
+        meaningful after a complete listing."""
+        with self.lock:
+            self.conn.commit()
+            rows = self.conn.execute(
+                "SELECT key FROM objects WHERE seen_run IS NULL OR seen_run != ?", (self.run_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def flag_removed(self, keys):
+        with self.lock:
+            self.conn.executemany("UPDATE objects SET removed_upstream = 1 WHERE key = ?", ((k,) for k in keys))
+            self.conn.commit()
+
+    def forget(self, keys):
+        with self.lock:
+            self.conn.executemany("DELETE FROM objects WHERE key = ?", ((k,) for k in keys))
+            self.conn.commit()
+
+    def delete_removed(self, keys):
+        """Delete local copies of ``keys``. Returns the keys that could not be deleted."""
+        failed, deleted = [], []
+        for key in keys:
+            try:
+                os.remove(os.path.join(self.outdir, key))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                failed.append((key, str(e)))
+                continue
+            deleted.append(key)
+        self.forget(deleted)
+        return failed
+
+    def close(self, complete=False):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE runs SET finished_at = ?, complete = ? WHERE id = ?",
+                (_utcnow(), int(complete), self.run_id),
+            )
+            self.conn.commit()
+            self.conn.close()
+
+    def _write(self, sql, params):
+        with self.lock:
+            self.conn.execute(sql, params)
+            self.pending += 1
+            if self.pending >= MANIFEST_COMMIT_EVERY:
+                self.conn.commit()
+                self.pending = 0
+
+
+class ZoneMirror:
+    """Destination side of ``--to-zone``. Plays the manifest role for the
+    runners: the destination zone is listed once up front, and objects
+    whose Length and Checksum already match there are skipped."""
+
+    def __init__(self, zone, access_key, session, list_workers=8):
+        self.zone = zone
+        self.access_key = access_key
+        self.session = session
+        self.lock = threading.Lock()
+        self.index = {}
+        self.seen = set()
+        print(f"Listing destination zone: {zone} ...")
+        walk_zone(zone, access_key, self._index, workers=list_workers, session=session)
+        print(f"Destination has {len(self.index)} files")
+
+    def _index(self, entry):
+        with self.lock:
+            self.index[entry["key"]] = (entry["length"], entry["checksum"])
+
+    def check(self, entry, local_path=None, index=None):
+        with self.lock:
+            current = self.index.get(entry["key"])
+        if current is None:
+            return "new"
+        if entry["checksum"] and current == (entry["length"], entry["checksum"]):
+            return "unchanged"
+        return "changed"
+
+    def mark_seen(self, key):
+        with self.lock:
+            self.seen.add(key)
+
+    def record(self, entry, path=None):
+        with self.lock:
+            self.seen.add(entry["key"])
+            self.index[entry["key"]] = (entry["length"], entry["checksum"])
+
+    def removed_upstream(self):
+        with self.lock:
+            return sorted(set(self.index) - self.seen)
+
+    def flag_removed(self, keys):
+        pass
+
+    def delete_removed(self, keys):
+        """Delete ``keys`` from the destination zone. Returns the keys that could not be deleted."""
+        failed = []
+        for key in keys:
+            try:
+                r = self.session.delete(object_url(self.zone, key), headers={"AccessKey": self.access_key}, timeout=30)
+            except requests.RequestException as e:
+                failed.append((key, str(e)))
+                continue
+            # 404: already gone, which is what we wanted.
+            if r.status_code not in (200, 204, 404):
+                failed.append((key, f"HTTP {r.status_code}"))
+        return failed
+
+    def close(self, complete=False):
+        pass
+
+
+class BodyStream:
+    """Request body that relays a GET response into a PUT chunk by chunk,
+    so a transfer holds at most one chunk in memory and touches no disk.
+    Bytes are hashed on the way through and can be throttled."""
+
+    def __init__(self, chunks, length=None, bucket=None):
+        self.chunks = chunks
+        self.length = length
+        self.bucket = bucket
+        self.hasher = hashlib.sha256()
+        self.nbytes = 0
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if chunk:
+                if self.bucket:
+                    time.sleep(self.bucket.reserve(len(chunk)))
+                self.hasher.update(chunk)
+                self.nbytes += len(chunk)
+                yield chunk
+
+    async def __aiter__(self):
+        async for chunk in self.chunks:
+            if chunk:
+                if self.bucket:
+                    await asyncio.sleep(self.bucket.reserve(len(chunk)))
+                self.hasher.update(chunk)
+                self.nbytes += len(chunk)
+                yield chunk
+
+
+def put_headers(dest_key, length=None, checksum=None):
+    headers = {"AccessKey": dest_key, "Content-Type": "application/octet-stream"}
+    if length is not None:
+        headers["Content-Length"] = str(length)
+    if checksum:
+        # Bunny rejects the upload if the stored bytes don't match.
+        headers["Checksum"] = checksum.upper()
+    return headers
+
+
+def copy_result(key, dest_zone, r, body, checksum, ttfb, transfer):
+    if r.status_code not in (200, 201):
+        return {"key": key, "status": "error", "http_status": r.status_code, "text": r.text}
+    if checksum and body.hasher.hexdigest() != checksum:
+        return {"key": key, "status": "error", "error": "checksum mismatch", "checksum_mismatch": True}
+    return {"key": key, "status": "downloaded", "path": f"{dest_zone}/{key}", "ttfb": ttfb, "transfer": transfer,
+            "bytes": body.nbytes}
+
+
+def copy_to_zone(zone, key, access_key, dest_zone, dest_key, session, length=None, bucket=None, checksum=None):
+    """Stream one object from ``zone`` straight into ``dest_zone``."""
+    try:
+        started = time.monotonic()
+        with session.get(object_url(zone, key), headers={"AccessKey": access_key}, stream=True, timeout=60) as src:
+            ttfb = time.monotonic() - started
+            if src.status_code != 200:
+                return {"key": key, "status": "error", "http_status": src.status_code, "text": src.text}
+            body = BodyStream(src.iter_content(chunk_size=CHUNK_SIZE), length, bucket)
+            r = session.put(object_url(dest_zone, key), data=body if length is not None else iter(body),
+                            headers=put_headers(dest_key, length, checksum), timeout=60)
+            return copy_result(key, dest_zone, r, body, checksum, ttfb, time.monotonic() - started - ttfb)
+    except Exception as e:
+        return error_result(key, e)
+
+
+async def copy_to_zone_async(client, zone, key, access_key, dest_zone, dest_key, length=None, bucket=None,
+                             checksum=None):
+    try:
+        started = time.monotonic()
+        async with client.stream("GET", object_url(zone, key), headers={"AccessKey": access_key}) as src:
+            ttfb = time.monotonic() - started
+            if src.status_code != 200:
+                await src.aread()
+                return {"key": key, "status": "error", "http_status": src.status_code, "text": src.text}
+            body = BodyStream(src.aiter_bytes(CHUNK_SIZE), length, bucket)
+            r = await client.put(object_url(dest_zone, key), content=body.__aiter__(),
+                                 headers=put_headers(dest_key, length, checksum))
+            return copy_result(key, dest_zone, r, body, checksum, ttfb, time.monotonic() - started - ttfb)
+    except Exception as e:
+        return error_result(key, e)
+
+
+class ArchiveShard:
+    """One tar shard being written. Each member is appended as a unit and,
+    with zstd, compressed as its own frame, so a member can be rolled back
+    by truncating and read back by seeking to where it starts. A zstd
+    compressor is not safe to share, so every shard has its own."""
+
+    def __init__(self, path, compressor=None):
+        self.path = path
+        self.compressor = compressor
+        self.f = open(path, "wb")
+        self.size = 0
+        self.start = 0
+        self.header = 0
+        self.cobj = None
+
+    def _emit(self, data):
+        if self.cobj is not None:
+            data = self.cobj.compress(data)
+        self.f.write(data)
+
+    def begin(self, key, length, mtime):
+        self.start = self.size
+        info = tarfile.TarInfo(key)
+        info.size = length
+        info.mtime = mtime
+        info.mode = 0o644
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8")
+        self.header = len(header)
+        self.cobj = self.compressor.compressobj() if self.compressor else None
+        self._emit(header)
+
+    def write(self, chunk):
+        self._emit(chunk)
+
+    def commit(self, length):
+        """Pad the member to a tar block and end its frame. Returns
+        ``(offset, stored)``: where the member starts in the file and how
+        many bytes it takes there."""
+        self._emit(b"\0" * (-length % tarfile.BLOCKSIZE))
+        if self.cobj is not None:
+            self.f.write(self.cobj.flush())
+            self.cobj = None
+        self.f.flush()
+        self.size = self.f.tell()
+        return self.start, self.size - self.start
+
+    def abort(self):
+        self.cobj = None
+        self.f.seek(self.start)
+        self.f.truncate()
+        self.size = self.start
+
+    def close(self):
+        # End-of-archive marker: two zero blocks.
+        end = b"\0" * (2 * tarfile.BLOCKSIZE)
+        self.f.write(self.compressor.compress(end) if self.compressor else end)
+        self.f.close()
+
+
+class Archive:
+    """``--archive``: downloaded bodies are streamed into size-capped tar
+    shards under ``--out`` instead of loose files.
+
+    Each concurrent transfer borrows a shard of its own, so up to
+    ``--parallel`` shards grow side by side. ``archive-index.jsonl`` maps
+    every key to its shard, offset and size, which lets ``extract_member``
+    restore one file with a seek; keys already in the index are skipped on
+    a re-run, and new shards are numbered after the existing ones.
+    """
+
+    def __init__(self, outdir, shard_bytes, compress=False):
+        self.outdir = outdir
+        self.shard_bytes = shard_bytes
+        self.compressor = None
+        self.suffix = ".tar"
+        if compress:
+            import zstandard
+            self.compressor = zstandard.ZstdCompressor
+            self.suffix = ".tar.zst"
+        os.makedirs(outdir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.free = []
+        self.archived = set()
+        index_path = os.path.join(outdir, ARCHIVE_INDEX_NAME)
+        if os.path.exists(index_path):
+            with open(index_path, "r", encoding="utf-8") as f:
+                self.archived = {json.loads(line)["key"] for line in f if line.strip()}
+        numbers = [int(n.split("-")[1].split(".")[0]) for n in os.listdir(outdir) if n.startswith("shard-")]
+        self.next_shard = max(numbers, default=-1) + 1
+        self.index = open(index_path, "a", encoding="utf-8")
+
+    def has(self, key):
+        return key in self.archived
+
+    def acquire(self):
+        with self.lock:
+            if self.free:
+                return self.free.pop()
+            n = self.next_shard
+            self.next_shard += 1
+        compressor = self.compressor(level=ARCHIVE_ZSTD_LEVEL) if self.compressor else None
+        return ArchiveShard(os.path.join(self.outdir, f"shard-{n:05d}{self.suffix}"), compressor)
+
+    def release(self, shard):
+        if shard.size >= self.shard_bytes:
+            shard.close()
+            return
+        with self.lock:
+            self.free.append(shard)
+
+    def record(self, key, shard, offset, stored, size, checksum):
+        line = json.dumps({"key": key, "shard": os.path.basename(shard.path), "offset": offset, "stored": stored,
+                           "header": shard.header, "size": size, "checksum": checksum})
+        with self.lock:
+            self.index.write(line + "\n")
+            self.index.flush()
+            self.archived.add(key)
+
+    def close(self):
+        with self.lock:
+            for shard in self.free:
+                shard.close()
+            self.free = []
+            self.index.close()
+
+
+def archive_mtime(entry):
+    try:
+        return int(datetime.fromisoformat(entry["last_changed"]).replace(tzinfo=timezone.utc).timestamp())
+    except (TypeError, ValueError):
+        return int(time.time())
+
+
+def archive_result(key, archive, shard, nbytes, hasher, checksum, ttfb, transfer):
+    """Commit or roll back the member just streamed into ``shard``."""
+    if checksum and hasher.hexdigest() != checksum:
+        shard.abort()
+        return {"key": key, "status": "error", "error": "checksum mismatch", "checksum_mismatch": True,
+                "bytes": nbytes}
+    offset, stored = shard.commit(nbytes)
+    archive.record(key, shard, offset, stored, nbytes, hasher.hexdigest())
+    return {"key": key, "status": "downloaded", "path": f"{shard.path}@{offset}", "ttfb": ttfb,
+            "transfer": transfer, "bytes": nbytes}
+
+
+def archive_entry(zone, entry, access_key, archive, session, bucket=None, checksum=None):
+    """Stream one object into a tar shard. The tar header needs the size up
+    front, so the listing Length is required and must match the body."""
+    key, length = entry["key"], entry["length"]
+    if archive.has(key):
+        return {"key": key, "status": "skipped", "path": archive.outdir}
+    if length is None:
+        return {"key": key, "status": "error", "error": "no Length in listing, cannot archive"}
+    shard = None
+    try:
+        started = time.monotonic()
+        with session.get(object_url(zone, key), headers={"AccessKey": access_key}, stream=True, timeout=60) as r:
+            ttfb = time.monotonic() - started
+            if r.status_code != 200:
+                return {"key": key, "status": "error", "http_status": r.status_code, "text": r.text}
+            shard = archive.acquire()
+            shard.begin(key, length, archive_mtime(entry))
+            hasher = hashlib.sha256()
+            nbytes = 0
+            for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    if bucket:
+                        time.sleep(bucket.reserve(len(chunk)))
+                    nbytes += len(chunk)
+                    if nbytes > length:
+                        break
+                    shard.write(chunk)
+                    hasher.update(chunk)
+            if nbytes != length:
+                raise IOError(f"body has {nbytes} bytes, listing says {length}")
+            return archive_result(key, archive, shard, nbytes, hasher, checksum, ttfb,
+                                  time.monotonic() - started - ttfb)
+    except Exception as e:
+        if shard is not None:
+            shard.abort()
+        return error_result(key, e)
+    finally:
+        if shard is not None:
+            archive.release(shard)
+
+
+async def archive_entry_async(client, zone, entry, access_key, archive, bucket=None, checksum=None):
+    key, length = entry["key"], entry["length"]
+    if archive.has(key):
+        return {"key": key, "status": "skipped", "path": archive.outdir}
+    if length is None:
+        return {"key": key, "status": "error", "error": "no Length in listing, cannot archive"}
+    shard = None
+    try:
+        started = time.monotonic()
+        async with client.stream("GET", object_url(zone, key), headers={"AccessKey": access_key}) as r:
+            ttfb = time.monotonic() - started
+            if r.status_code != 200:
+                await r.aread()
+                return {"key": key, "status": "error", "http_status": r.status_code, "text": r.text}
+            shard = await off_loop(archive.acquire)
+            await off_loop(shard.begin, key, length, archive_mtime(entry))
+            hasher = hashlib.sha256()
+            nbytes = 0
+            async for chunk in r.aiter_bytes(CHUNK_SIZE):
+                if bucket:
+                    await asyncio.sleep(bucket.reserve(len(chunk)))
+                nbytes += len(chunk)
+                if nbytes > length:
+                    break
+                await off_loop(write_chunk, shard, chunk, hasher)
+            if nbytes != length:
+                raise IOError(f"body has {nbytes} bytes, listing says {length}")
+            return await off_loop(archive_result, key, archive, shard, nbytes, hasher, checksum, ttfb,
+                                            time.monotonic() - started - ttfb)
+    except Exception as e:
+        if shard is not None:
+            await off_loop(shard.abort)
+        return error_result(key, e)
+    finally:
+        if shard is not None:
+            await off_loop(archive.release, shard)
+
+
+def extract_member(outdir, key, out):
+    """Copy one archived key to the binary file object ``out``, seeking
+    straight to its member (and its zstd frame) via the archive index."""
+    with open(os.path.join(outdir, ARCHIVE_INDEX_NAME), "r", encoding="utf-8") as f:
+        rec = None
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if row["key"] == key:
+                    rec = row
+    if rec is None:
+        raise KeyError(key)
+    with open(os.path.join(outdir, rec["shard"]), "rb") as f:
+        f.seek(rec["offset"])
+        if rec["shard"].endswith(".zst"):
+            import zstandard
+            f = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=False)
+        remaining = rec["header"]
+        while remaining:
+            skipped = len(f.read(min(remaining, CHUNK_SIZE)))
+            if not skipped:
+                raise IOError(f"shard {rec['shard']} is truncated")
+            remaining -= skipped
+        remaining = rec["size"]
+        while remaining:
+            chunk = f.read(min(remaining, CHUNK_SIZE))
+            if not chunk:
+                raise IOError(f"shard {rec['shard']} is truncated")
+            out.write(chunk)
+            remaining -= len(chunk)
+    return rec
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def check_manifest(args, entry, manifest=None):
+    """Consult the manifest in ``--incremental`` mode (or the destination
+    index in ``--to-zone`` mode).
+
+    Returns ``(result, force)``: ``result`` is a ready "skipped" result for
+    unchanged objects, otherwise ``None`` and ``force`` says whether the
+    local copy is stale and must be rewritten rather than resumed.
+    """
+    key = entry["key"]
+    if manifest is None:
+        return None, args.force
+    # Listed means present upstream, whatever happens to the transfer: a key
+    # whose download fails must not be taken for one removed upstream.
+    manifest.mark_seen(key)
+    if args.force:
+        return None, True
+    state = manifest.check(entry, os.path.join(args.out, key), entry_index(args, entry))
+    if state == "unchanged":
+        return {"key": key, "status": "skipped", "path": os.path.join(args.out, key)}, False
+    return None, state == "changed"
+
+
+def use_segments(args, entry):
+    """Large objects with a known size are fetched as parallel byte ranges."""
+    return not (args.to_zone or args.archive) and args.segments > 1 and bool(entry["length"]) and entry["length"] >= args.segment_threshold_mb * 1024 * 1024
+
+
+def schedule_key(order, entry):
+    """Sort key for ``--order``: largest or smallest listing Length first;
+    0 for listing order (ties keep the order in which keys were found)."""
+    size = entry["length"] or 0
+    if order == "largest":
+        return -size
+    if order == "smallest":
+        return size
+    return 0
+
+
+def entry_version(entry):
+    return entry["checksum"] or entry["last_changed"]
+
+
+def record_result(entry, r, manifest=None):
+    if manifest is not None and r.get("status") in ("downloaded", "skipped", "linked"):
+        manifest.record(entry, r["path"])
+    if r.get("status") == "error":
+        r["entry"] = entry
+    if entry.get("retries"):
+        r["retries"] = entry["retries"]
+    return r
+
+
+def entry_checksum(args, entry):
+    return None if args.no_verify else entry["checksum"]
+
+
+def entry_index(args, entry):
+    # Retries may have left partial files behind since the index was built.
+    return None if entry.get("retries") else getattr(args, "local_index", None)
+
+
+def fetch_entry(args, entry, access_key, session, force=False, bucket=None):
+    if args.archive:
+        return archive_entry(args.zone, entry, access_key, args.archive_writer, session, bucket,
+                             entry_checksum(args, entry))
+    if args.to_zone:
+        return copy_to_zone(args.zone, entry["key"], access_key, args.to_zone, args.to_access_key, session,
+                            entry["length"], bucket, entry_checksum(args, entry))
+    if use_segments(args, entry):
+        return download_segmented(args.zone, entry["key"], access_key, args.out, session, entry["length"],
+                                  args.segments, force, entry_version(entry), bucket, entry_checksum(args, entry))
+    return download_file(args.zone, entry["key"], access_key, args.out, session, force, entry["length"],
+                         bucket, entry_checksum(args, entry), entry_index(args, entry))
+
+
+async def fetch_entry_async(args, entry, access_key, client, force=False, bucket=None):
+    if args.archive:
+        return await archive_entry_async(client, args.zone, entry, access_key, args.archive_writer, bucket,
+                                         entry_checksum(args, entry))
+    if args.to_zone:
+        return await copy_to_zone_async(client, args.zone, entry["key"], access_key, args.to_zone, args.to_access_key,
+                                        entry["length"], bucket, entry_checksum(args, entry))
+    if use_segments(args, entry):
+        return await download_segmented_async(client, args.zone, entry["key"], access_key, args.out, entry["length"],
+                                              args.segments, force, entry_version(entry), bucket,
+                                              entry_checksum(args, entry))
+    return await download_file_async(client, args.zone, entry["key"], access_key, args.out, force, entry["length"],
+                                     bucket, entry_checksum(args, entry), entry_index(args, entry))
+
+
+def link_entry(args, entry, source, force=False, manifest=None):
+    """Materialise a duplicate from the local copy of its content. Returns
+    ``None`` if linking is impossible, so the caller downloads it instead."""
+    key = entry["key"]
+    local_path, mode, _ = plan_download(args.out, key, force, entry["length"], entry_index(args, entry))
+    if mode is None:
+        return record_result(entry, {"key": key, "status": "skipped", "path": local_path}, manifest)
+    try:
+        how = link_file(source, local_path)
+    except OSError:
+        return None
+    return record_result(entry, {"key": key, "status": "linked", "path": local_path, "source": source, "link": how},
+                         manifest)
+
+
+def process_entry(args, entry, access_key, session, manifest=None, throttle=None):
+    """Sync one listing entry, consulting the manifest in ``--incremental`` mode."""
+    dedup = getattr(args, "dedup_index", None)
+    skipped, force = check_manifest(args, entry, manifest)
+    if skipped:
+        if dedup:
+            dedup.offer(entry, skipped["path"])
+        return skipped
+    owner, source = dedup.claim(entry) if dedup else (True, None)
+    if not owner:
+        if isinstance(source, Future):
+            source = source.result()
+        linked = link_entry(args, entry, source, force, manifest) if source else None
+        if linked:
+            return linked
+    throttle = throttle or Throttle()
+    if throttle.limiter:
+        throttle.limiter.acquire()
+    r = {"key": entry["key"], "status": "error", "error": "aborted"}
+    try:
+        r = fetch_entry(args, entry, access_key, session, force, throttle.bucket)
+        if r.get("checksum_mismatch"):
+            # The corrupt copy was quarantined; fetch it once more from scratch.
+            r = fetch_entry(args, entry, access_key, session, True, throttle.bucket)
+    finally:
+        if throttle.limiter:
+            throttle.limiter.release(r)
+        if dedup and owner:
+            dedup.resolve(entry, r)
+    return record_result(entry, r, manifest)
+
+
+async def process_entry_async(args, entry, access_key, client, manifest=None, throttle=None):
+    dedup = getattr(args, "dedup_index", None)
+    # Manifest lookups and writes are SQLite calls, and linking touches the
+    # disk: all of it runs off the event loop.
+    skipped, force = await off_loop(check_manifest, args, entry, manifest)
+    if skipped:
+        if dedup:
+            dedup.offer(entry, skipped["path"])
+        return skipped
+    owner, source = dedup.claim(entry) if dedup else (True, None)
+    if not owner:
+        if isinstance(source, Future):
+            source = await asyncio.wrap_future(source)
+        linked = await off_loop(link_entry, args, entry, source, force, manifest) if source else None
+        if linked:
+            return linked
+    throttle = throttle or Throttle()
+    if throttle.limiter:
+        await throttle.limiter.acquire_async()
+    r = {"key": entry["key"], "status": "error", "error": "aborted"}
+    try:
+        r = await fetch_entry_async(args, entry, access_key, client, force, throttle.bucket)
+        if r.get("checksum_mismatch"):
+            r = await fetch_entry_async(args, entry, access_key, client, True, throttle.bucket)
+    finally:
+        if throttle.limiter:
+            await throttle.limiter.release_async(r)
+        if dedup and owner:
+            dedup.resolve(entry, r)
+    return await off_loop(record_result, entry, r, manifest)
+
+
+def handle_removed(manifest, delete=False):
+    """Flag (or delete) mirrored copies of keys that disappeared upstream."""
+    removed = manifest.removed_upstream()
+    if not removed:
+        return
+    if delete:
+        failed = manifest.delete_removed(removed)
+        print(f"Deleted {len(removed) - len(failed)} mirrored files removed upstream")
+        if failed:
+            print(f"ERROR: could not delete {len(failed)} of them (first 10):", file=sys.stderr)
+            for key, error in failed[:10]:
+                print(f"  {key}: {error}", file=sys.stderr)
+    else:
+        manifest.flag_removed(removed)
+        print(f"Flagged {len(removed)} mirrored files removed upstream (first 10):")
+        for key in removed[:10]:
+            print(f"  {key}")
+
+
+class Results:
+    """Running tally of transfer results.
+
+    Only per-status counts and the failed results (the retry queue and the
+    failed list need them) stay in memory; each result is streamed to the
+    ``RunReport`` as it arrives instead of being accumulated. Thread-safe.
+    """
+
+    def __init__(self, report=None):
+        self.report = report
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.errors = []
+
+    def __len__(self):
+        return sum(self.counts.values())
+
+    def add(self, r):
+        if self.report:
+            self.report.file(r)
+        with self.lock:
+            self.counts[r.get("status")] = self.counts.get(r.get("status"), 0) + 1
+            if r.get("status") == "error":
+                self.errors.append(r)
+
+    def take_retryable(self):
+        """Remove and return the failed results worth another attempt."""
+        with self.lock:
+            retry = [r for r in self.errors if is_retryable(r) and "entry" in r]
+            self.errors = [r for r in self.errors if not (is_retryable(r) and "entry" in r)]
+            self.counts["error"] = len(self.errors)
+        return retry
+
+    def merge(self, other):
+        with self.lock:
+            for status, count in other.counts.items():
+                self.counts[status] = self.counts.get(status, 0) + count
+            self.errors.extend(other.errors)
+
+
+def print_summary(results):
+    counts = results.counts
+    linked = f"Linked: {counts['linked']}, " if counts.get("linked") else ""
+    print(f"Downloaded: {counts.get('downloaded', 0)}, {linked}Skipped: {counts.get('skipped', 0)}, "
+          f"Errors: {counts.get('error', 0)}")
+    if results.errors:
+        print("Errors (first 10):")
+        for e in results.errors[:10]:
+            print({k: v for k, v in e.items() if k != "entry"})
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus style, cumulative on export)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.n = 0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.total += value
+        self.n += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (an approximation)."""
+        if not self.n:
+            return None
+        target = q * self.n
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+    def prometheus(self, name, labels):
+        lines = []
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {seen}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.n}')
+        lines.append(f"{name}_sum{{{labels}}} {self.total:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {self.n}")
+        return lines
+
+
+class RunReport:
+    """Structured metrics for one run.
+
+    With ``--report`` every listed directory and every transfer attempt is
+    appended to a JSONL file as it happens; with ``--prometheus`` the totals
+    are written as a node_exporter textfile when the run ends. Either way a
+    throughput and latency summary is printed. Thread-safe.
+    """
+
+    def __init__(self, zone, path=None, prometheus=None):
+        self.zone = zone
+        self.prometheus_path = prometheus
+        self.lock = threading.Lock()
+        self.out = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.out = open(path, "a", encoding="utf-8")
+        self.dirs = 0
+        self.list_seconds = 0.0
+        self.bytes = 0
+        self.phases = {}
+        self.statuses = {}
+        self.ttfb = Histogram()
+        self.file_seconds = Histogram()
+        self.started = time.time()
+
+    def _write(self, record):
+        if self.out:
+            self.out.write(json.dumps(record) + "\n")
+
+    def directory(self, prefix, files, dirs, seconds):
+        with self.lock:
+            self.dirs += 1
+            self.list_seconds += seconds
+            self._write({"type": "directory", "ts": time.time(), "prefix": prefix, "files": files,
+                         "dirs": dirs, "seconds": round(seconds, 6)})
+
+    def file(self, r):
+        with self.lock:
+            self.bytes += r.get("bytes") or 0
+            if r.get("ttfb") is not None:
+                self.ttfb.observe(r["ttfb"])
+                self.file_seconds.observe(r["ttfb"] + (r.get("transfer") or 0))
+            self._write({"type": "file", "ts": time.time(), "key": r.get("key"), "status": r.get("status"),
+                         "bytes": r.get("bytes"), "ttfb": r.get("ttfb"), "transfer": r.get("transfer"),
+                         "retries": r.get("retries", 0), "http_status": r.get("http_status"),
+                         "error": r.get("error")})
+
+    def phase(self, name, seconds):
+        with self.lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self._write({"type": "phase", "ts": time.time(), "phase": name, "seconds": round(seconds, 6)})
+
+    def finish(self, results):
+        """Take the final statuses (after retries) and print the summary."""
+        self.statuses = dict(results.counts)
+        listing = self.phases.get("listing")
+        transfer = self.phases.get("transfer")
+        if listing:
+            print(f"Listing: {self.dirs} dirs in {listing:.1f}s ({self.dirs / listing:.1f} dirs/s)")
+        if transfer:
+            print(f"Transfer: {self.bytes / 2**20:.1f} MiB in {transfer:.1f}s "
+                  f"({self.bytes / 2**20 / transfer:.2f} MiB/s)")
+        if self.ttfb.n:
+            print(f"TTFB p50/p99: {self.ttfb.quantile(0.5)}s/{self.ttfb.quantile(0.99)}s, "
+                  f"per-file p50/p99: {self.file_seconds.quantile(0.5)}s/{self.file_seconds.quantile(0.99)}s "
+                  "(bucket upper bounds)")
+
+    def write_prometheus(self, success):
+        labels = f'zone="{self.zone}"'
+        prefix = "bunny_download"
+        lines = [f"# TYPE {prefix}_files_total counter"]
+        for status, count in sorted(self.statuses.items()):
+            lines.append(f'{prefix}_files_total{{{labels},status="{status}"}} {count}')
+        lines += [f"# TYPE {prefix}_bytes_total counter", f"{prefix}_bytes_total{{{labels}}} {self.bytes}",
+                  f"# TYPE {prefix}_directories_total counter", f"{prefix}_directories_total{{{labels}}} {self.dirs}",
+                  f"# TYPE {prefix}_phase_seconds gauge"]
+        for name, seconds in sorted(self.phases.items()):
+            lines.append(f'{prefix}_phase_seconds{{{labels},phase="{name}"}} {seconds:.6f}')
+        lines.append(f"# TYPE {prefix}_ttfb_seconds histogram")
+        lines += self.ttfb.prometheus(f"{prefix}_ttfb_seconds", labels)
+        lines.append(f"# TYPE {prefix}_file_seconds histogram")
+        lines += self.file_seconds.prometheus(f"{prefix}_file_seconds", labels)
+        lines += [f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+                  f"{prefix}_last_run_timestamp_seconds{{{labels}}} {self.started:.0f}",
+                  f"# TYPE {prefix}_last_run_success gauge",
+                  f"{prefix}_last_run_success{{{labels}}} {int(bool(success) and not self.statuses.get('error'))}"]
+        # Write-then-rename so the textfile collector never reads a partial file.
+        tmp = self.prometheus_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.prometheus_path)
+
+    def close(self, success):
+        if self.prometheus_path:
+            self.write_prometheus(success)
+        if self.out:
+            self.out.close()
+
+
+def zone_feed(args, access_key, session, report=None):
+    """Feed for the runners that walks the zone listing."""
+    def feed(on_file):
+        started = time.monotonic()
+        walk_zone(args.zone, access_key, on_file, workers=args.list_parallel, session=session,
+                  on_dir=report.directory if report else None, key_filter=args.key_filter)
+        if report:
+            report.phase("listing", time.monotonic() - started)
+    return feed
+
+
+def list_feed(entries, delays=None):
+    """Feed for the runners that replays known entries. With ``delays``,
+    each entry is released only once its own delay has elapsed."""
+    def feed(on_file):
+        if delays is None:
+            scheduled = [(0.0, e) for e in entries]
+        else:
+            scheduled = sorted(zip(delays, entries), key=lambda pair: pair[0])
+        started = time.monotonic()
+        for delay, entry in scheduled:
+            wait = started + delay - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            if on_file(entry) is False:
+                break
+    return feed
+
+
+def run_pipeline(args, access_key, session, manifest=None, throttle=None, feed=None, report=None):
+    """List and download concurrently: listing threads feed a bounded queue
+    that the download workers drain as soon as the first key appears. The
+    queue hands out the keys it holds in ``--order``.
+
+    ``feed(on_file)`` produces the entries (``zone_feed`` by default).
+    Returns ``(results, complete)`` where ``complete`` is true if the feed
+    ran to the end without errors.
+    """
+    feed = feed or zone_feed(args, access_key, session, report)
+    workers = max(1, args.parallel)
+    entries = queue.PriorityQueue(maxsize=max(1, args.queue_size))
+    done = object()
+    lock = threading.Lock()
+    results = Results(report)
+    listing_errors = []
+    queued = 0
+    truncated = False
+
+    def on_file(entry):
+        nonlocal queued, truncated
+        with lock:
+            if args.limit and queued >= args.limit:
+                truncated = True
+                return False
+            queued += 1
+            seq = queued
+        entries.put((schedule_key(args.order, entry), seq, entry))
+        return True
+
+    def produce():
+        try:
+            feed(on_file)
+        except Exception as e:
+            listing_errors.append(e)
+        finally:
+            for i in range(workers):
+                entries.put((float("inf"), i, done))
+
+    def consume(bar):
+        while True:
+            _, _, entry = entries.get()
+            if entry is done:
+                return
+            try:
+                r = process_entry(args, entry, access_key, session, manifest, throttle)
+            except Exception as e:
+                r = dict(error_result(entry["key"], e), entry=entry)
+            results.add(r)
+            with lock:
+                bar.update(1)
+
+    with tqdm(desc="Downloading", unit="file") as bar:
+        threads = [threading.Thread(target=produce, name="producer", daemon=True)]
+        threads += [threading.Thread(target=consume, args=(bar,), name=f"download-{i}", daemon=True) for i in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    if listing_errors:
+        print(f"ERROR: listing failed, results are incomplete: {listing_errors[0]}", file=sys.stderr)
+    return results, not (listing_errors or truncated)
+
+
+def run_async(args, access_key, session, manifest=None, throttle=None, feed=None, report=None):
+    """Asyncio engine: up to ``--parallel`` transfers share one event loop and
+    one pooled ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed).
+    Listing reuses the threaded ``walk_zone`` and feeds an asyncio queue, so
+    downloads start as soon as the first key is found.
+
+    Returns ``(results, complete)`` like ``run_pipeline``.
+    """
+    try:
+        import httpx
+    except ImportError:
+        print("ERROR: --engine async requires httpx (pip install 'httpx[http2]')", file=sys.stderr)
+        sys.exit(2)
+    # HTTP/2 needs the h2 package; without it httpx speaks HTTP/1.1.
+    http2 = importlib.util.find_spec("h2") is not None
+    feed = feed or zone_feed(args, access_key, session, report)
+    return asyncio.run(_run_async(httpx, http2, args, access_key, manifest, throttle, feed, report))
+
+
+async def _run_async(httpx, http2, args, access_key, manifest, throttle, feed, report=None):
+    loop = asyncio.get_running_loop()
+    workers = max(1, args.parallel)
+    entries = asyncio.PriorityQueue(maxsize=max(1, args.queue_size))
+    done = object()
+    lock = threading.Lock()
+    results = Results(report)
+    listing_errors = []
+    queued = 0
+    truncated = False
+
+    def on_file(entry):
+        # Runs on listing threads; blocks while the queue is full.
+        nonlocal queued, truncated
+        with lock:
+            if args.limit and queued >= args.limit:
+                truncated = True
+                return False
+            queued += 1
+            seq = queued
+        asyncio.run_coroutine_threadsafe(entries.put((schedule_key(args.order, entry), seq, entry)), loop).result()
+        return True
+
+    def produce():
+        try:
+            feed(on_file)
+        except Exception as e:
+            listing_errors.append(e)
+
+    async def consume(client, bar):
+        while True:
+            _, _, entry = await entries.get()
+            if entry is done:
+                return
+            try:
+                r = await process_entry_async(args, entry, access_key, client, manifest, throttle)
+            except Exception as e:
+                r = dict(error_result(entry["key"], e), entry=entry)
+            # With --report this appends to the JSONL file.
+            await off_loop(results.add, r)
+            bar.update(1)
+
+    connections = workers * max(1, args.segments)
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    timeout = httpx.Timeout(60.0, connect=30.0)
+    async with httpx.AsyncClient(http2=http2, limits=limits, timeout=timeout) as client:
+        with tqdm(desc=f"Downloading (async, http2={http2})", unit="file") as bar:
+            tasks = [asyncio.create_task(consume(client, bar)) for _ in range(workers)]
+            await loop.run_in_executor(None, produce)
+            for i in range(workers):
+                await entries.put((float("inf"), i, done))
+            await asyncio.gather(*tasks)
+
+    if listing_errors:
+        print(f"ERROR: listing failed, results are incomplete: {listing_errors[0]}", file=sys.stderr)
+    return results, not (listing_errors or truncated)
+
+
+def run_batch(args, entries, access_key, session, manifest=None, throttle=None, report=None, total=None):
+    """The default mode: download an already listed set of entries.
+
+    ``entries`` may be any iterable; at most ``--queue-size`` downloads are
+    submitted at a time, so memory does not grow with the size of the zone.
+    """
+    results = Results(report)
+    entries = iter(entries)
+    window = max(1, args.parallel, args.queue_size)
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as ex, \
+            tqdm(total=total, desc="Downloading", unit="file") as bar:
+        def submit():
+            for entry in itertools.islice(entries, window - len(futures)):
+                futures[ex.submit(process_entry, args, entry, access_key, session, manifest, throttle)] = entry
+
+        submit()
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for f in finished:
+                entry = futures.pop(f)
+                try:
+                    r = f.result()
+                except Exception as e:
+                    r = dict(error_result(entry["key"], e), entry=entry)
+                results.add(r)
+                bar.update(1)
+            submit()
+    return results
+
+
+def retry_failed(args, access_key, session, results, manifest=None, throttle=None, report=None):
+    """Drain the retry queue: retryable errors are re-run for up to
+    ``--retries`` rounds, each entry released after its own jittered
+    exponential backoff. Returns the final results."""
+    run = run_async if args.engine == "async" else run_pipeline
+    for attempt in range(1, args.retries + 1):
+        retry = [dict(r["entry"], retries=attempt) for r in results.take_retryable()]
+        if not retry:
+            break
+        print(f"Retrying {len(retry)} failed files (attempt {attempt}/{args.retries}) ...")
+        delays = [backoff_delay(attempt) for _ in retry]
+        retried, _ = run(args, access_key, session, manifest, throttle, feed=list_feed(retry, delays), report=report)
+        results.merge(retried)
+    return results
+
+
+def write_failed_list(args, errors):
+    """Persist entries that still failed as JSONL, re-runnable with --from-list."""
+    failed = [r for r in errors if "entry" in r]
+    path = args.failed_list or os.path.join(args.out, FAILED_LIST_NAME)
+    if not failed:
+        # A stale list would make a later --from-list retry fetch keys that
+        # have since downloaded. A run limited by --include/--exclude/--limit
+        # only vouches for the list it was started from.
+        covered = not (args.key_filter or args.limit) and not args.from_list
+        if (covered or args.from_list and os.path.abspath(args.from_list) == os.path.abspath(path)) \
+                and os.path.exists(path):
+            os.remove(path)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for r in failed:
+            f.write(json.dumps(dict(r["entry"], last_error=r.get("http_status") or r.get("error"))) + "\n")
+    print(f"Wrote {len(failed)} failed files to {path} (re-run with --from-list {path})")
+
+
+def read_entry_list(path):
+    with open(path, "r", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [make_entry(r["key"], r.get("length"), r.get("last_changed"), r.get("checksum")) for r in rows]
+
+
+def spool_listing(args, access_key, session, report=None):
+    """List the zone into an anonymous temporary JSONL file instead of memory.
+
+    Returns ``(spool, order, count, complete)``. ``order`` lists the byte
+    offsets of the entries in ``--order`` (``None`` for listing order); only
+    the offsets and sizes are held in memory to compute it. Listing stops
+    early once ``--limit`` files have been found.
+    """
+    spool = tempfile.TemporaryFile("w+b")
+    lock = threading.Lock()
+    offsets = array.array("q")
+    ranks = array.array("q")
+    count = 0
+    truncated = False
+
+    def on_file(entry):
+        nonlocal count, truncated
+        with lock:
+            if args.limit and count >= args.limit:
+                truncated = True
+                return False
+            count += 1
+            offsets.append(spool.tell())
+            ranks.append(schedule_key(args.order, entry))
+            spool.write(json.dumps(entry).encode("utf-8") + b"\n")
+        return True
+
+    walk_zone(args.zone, access_key, on_file, workers=args.list_parallel, session=session,
+              on_dir=report.directory if report else None, key_filter=args.key_filter)
+    order = sort_offsets(ranks, offsets) if args.order != "listing" else None
+    spool.seek(0)
+    return spool, order, count, not truncated
+
+
+def sort_offsets(ranks, offsets):
+    """Spool offsets ordered by rank, ties in listing order.
+
+    An external merge sort: runs of ``SORT_RUN`` pairs are sorted and packed
+    into a temporary file, then merged back lazily, so at most one run is
+    held as Python objects while sorting and a block per run while merging.
+    """
+    runs = tempfile.TemporaryFile("w+b")
+    bounds = []
+    for start in range(0, len(offsets), SORT_RUN):
+        packed = array.array("q")
+        # Offsets grow in listing order, so the pair order breaks ties for us.
+        for pair in sorted(zip(ranks[start:start + SORT_RUN], offsets[start:start + SORT_RUN])):
+            packed.extend(pair)
+        bounds.append((runs.tell(), len(packed) // 2))
+        packed.tofile(runs)
+    return _merge_runs(runs, bounds)
+
+
+def _read_run(runs, start, length):
+    pos = start
+    while length:
+        n = min(length, SORT_BLOCK)
+        block = array.array("q")
+        runs.seek(pos)
+        block.fromfile(runs, 2 * n)
+        pos += n * block.itemsize * 2
+        length -= n
+        yield from zip(block[::2], block[1::2])
+
+
+def _merge_runs(runs, bounds):
+    with runs:
+        for _, offset in heapq.merge(*(_read_run(runs, start, n) for start, n in bounds)):
+            yield offset
+
+
+def read_spool(spool, order=None):
+    """Entries from a listing spool, in file order or in the order of the
+    byte offsets in ``order``."""
+    if order is None:
+        for line in spool:
+            yield json.loads(line)
+        return
+    for offset in order:
+        spool.seek(offset)
+        yield json.loads(spool.readline())
+
+
+def verify_local(outdir, entry):
+    """Compare one local file against its listing checksum (runs in a worker process)."""
+    path = os.path.join(outdir, entry["key"])
+    if not os.path.exists(path):
+        return {"key": entry["key"], "status": "error", "error": "missing", "entry": entry}
+    if not entry["checksum"]:
+        return {"key": entry["key"], "status": "unverified", "path": path}
+    if sha256_file(path).hexdigest() != entry["checksum"]:
+        return {"key": entry["key"], "status": "error", "error": "checksum mismatch", "entry": entry,
+                "quarantined": quarantine(outdir, entry["key"], path)}
+    return {"key": entry["key"], "status": "verified", "path": path}
+
+
+def verify_only(args, access_key, session):
+    """Hash the local mirror against the listing in a process pool; nothing
+    is downloaded. Corrupt files are quarantined, and they and missing files
+    go to the failed list for a --from-list re-run."""
+    if args.from_list:
+        entries = read_entry_list(args.from_list)
+    else:
+        print(f"Listing files in zone: {args.zone} ...")
+        entries = list_files(args.zone, access_key, workers=args.list_parallel, session=session,
+                             key_filter=args.key_filter)
+    if args.limit and args.limit > 0:
+        entries = entries[:args.limit]
+    print(f"Verifying {len(entries)} files in {args.out} ...")
+
+    counts = {}
+    errors = []
+    with ProcessPoolExecutor() as ex:
+        for r in tqdm(ex.map(verify_local, [args.out] * len(entries), entries, chunksize=64),
+                      total=len(entries), desc="Verifying", unit="file"):
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+            if r["status"] == "error":
+                errors.append(r)
+
+    print(f"Verified: {counts.get('verified', 0)}, No checksum: {counts.get('unverified', 0)}, "
+          f"Missing or corrupt: {counts.get('error', 0)}")
+    for r in errors[:10]:
+        print(f"  {r['error']}: {r['key']}")
+    write_failed_list(args, errors)
+
+
+def sync(args, access_key, session, manifest=None, report=None):
+    """Run one listing + download pass. Returns true if the whole zone was listed."""
+    throttle = Throttle.from_args(args)
+    args.local_index = None
+    args.dedup_index = DedupIndex() if args.dedup else None
+    if not (args.to_zone or args.archive):
+        args.local_index = LocalIndex(args.out)
+        print(f"Indexed {len(args.local_index)} local files in {args.out}")
+    feed = None
+    if args.from_list:
+        entries = [e for e in read_entry_list(args.from_list) if args.key_filter.match(e["key"])]
+        entries.sort(key=lambda e: schedule_key(args.order, e))
+        print(f"Loaded {len(entries)} files from {args.from_list}")
+        feed = list_feed(entries)
+
+    if args.engine == "async" or args.pipeline or feed:
+        if not feed:
+            print(f"Listing and downloading files in zone: {args.zone} ...")
+        run = run_async if args.engine == "async" else run_pipeline
+        started = time.monotonic()
+        results, complete = run(args, access_key, session, manifest, throttle, feed=feed, report=report)
+        if report:
+            report.phase("transfer", time.monotonic() - started)
+        print(f"Found {len(results)} files")
+    else:
+        print(f"Listing files in zone: {args.zone} ...")
+        started = time.monotonic()
+        spool, order, count, complete = spool_listing(args, access_key, session, report)
+        if report:
+            report.phase("listing", time.monotonic() - started)
+        print(f"Found {count} files")
+        started = time.monotonic()
+        with spool:
+            results = run_batch(args, read_spool(spool, order), access_key, session, manifest,
+                                throttle, report, total=count)
+        if report:
+            report.phase("transfer", time.monotonic() - started)
+
+    started = time.monotonic()
+    results = retry_failed(args, access_key, session, results, manifest, throttle, report)
+    if report:
+        report.phase("retry", time.monotonic() - started)
+    write_failed_list(args, results.errors)
+    print_summary(results)
+    if report:
+        report.finish(results)
+    # A filtered run has not seen the whole zone, so nothing counts as removed.
+    return complete and not args.from_list and not args.key_filter
 
 
 def main():
@@ -153,39 +2367,84 @@ def main():
     parser.add_argument("--parallel", type=int, default=4, help="Parallel downloads")
     parser.add_argument("--force", action="store_true", help="Force re-download even if file exists")
     parser.add_argument("--limit", type=int, default=0, help="Limit number of files to download (0 = all)")
+    parser.add_argument("--list-parallel", type=int, default=8, help="Parallel directory listings")
+    parser.add_argument("--pipeline", action="store_true", help="Start downloading while the zone is still being listed")
+    parser.add_argument("--queue-size", type=int, default=1000, help="Max listed keys waiting for a download worker in --pipeline mode")
+    parser.add_argument("--incremental", action="store_true", help="Only download objects that are new or changed since the last run (uses a manifest under --out)")
+    parser.add_argument("--delete-removed", action="store_true", help="With --incremental, delete local files removed upstream instead of flagging them")
+    parser.add_argument("--engine", choices=("threads", "async"), default="threads", help="Download engine; async runs all --parallel transfers on one event loop (needs httpx)")
+    parser.add_argument("--segments", type=int, default=4, help="Byte-range segments fetched concurrently for large objects (1 = off)")
+    parser.add_argument("--segment-threshold-mb", type=int, default=256, help="Objects at least this large (MiB) are downloaded in segments")
+    parser.add_argument("--adaptive", action="store_true", help="Adapt concurrency (AIMD) to throttling and latency, with --parallel as the ceiling")
+    parser.add_argument("--max-bandwidth", type=float, default=0, help="Cap aggregate download bandwidth in MiB/s (0 = unlimited)")
+    parser.add_argument("--retries", type=int, default=3, help="Retry rounds for throttled/transient failures")
+    parser.add_argument("--failed-list", default=None, help=f"Where to write files that still fail (default <out>/{FAILED_LIST_NAME})")
+    parser.add_argument("--from-list", default=None, help="Download only the entries in a failed list instead of listing the zone")
+    parser.add_argument("--no-verify", action="store_true", help="Skip SHA-256 verification against the listing Checksum")
+    parser.add_argument("--verify-only", action="store_true", help="Hash the local mirror against the listing without downloading")
+    parser.add_argument("--to-zone", default=None, help="Mirror into this storage zone instead of --out (key from BUNNY_DEST_ACCESS_KEY)")
+    parser.add_argument("--order", choices=("largest", "smallest", "listing"), default="largest",
+                        help="Download order by listing size: largest first (default), smallest first, or as listed")
+    parser.add_argument("--include", action="append", default=[], help="Only sync keys matching this glob or prefix (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], help="Skip keys matching this glob or prefix (repeatable)")
+    parser.add_argument("--dedup", action="store_true", help="Download each listing Checksum once; link the other paths to it")
+    parser.add_argument("--archive", action="store_true", help="Write size-capped tar shards plus a key index under --out instead of loose files")
+    parser.add_argument("--shard-size-mb", type=int, default=1024, help="Start a new --archive shard once one reaches this size (MiB)")
+    parser.add_argument("--zstd", action="store_true", help="Compress --archive shards with zstd (needs the zstandard package)")
+    parser.add_argument("--extract", default=None, metavar="KEY", help="Write KEY from the --archive under --out to stdout and exit")
+    parser.add_argument("--report", default=None, help="Append per-directory and per-file metrics to this JSONL file")
+    parser.add_argument("--prometheus", default=None, help="Write run metrics to this Prometheus textfile when the run ends")
     args = parser.parse_args()
+    if args.to_zone and (args.incremental or args.verify_only):
+        parser.error("--to-zone cannot be combined with --incremental or --verify-only")
+    if args.to_zone and args.dedup:
+        parser.error("--dedup only applies to local downloads")
+    if args.archive and (args.to_zone or args.incremental or args.dedup or args.verify_only):
+        parser.error("--archive cannot be combined with --to-zone, --incremental, --dedup or --verify-only")
+
+    if args.extract:
+        try:
+            extract_member(args.out, args.extract, sys.stdout.buffer)
+        except KeyError:
+            print(f"ERROR: {args.extract} is not in the archive under {args.out}", file=sys.stderr)
+            sys.exit(1)
+        return
 
     access_key = os.getenv("BUNNY_ACCESS_KEY")
     if not access_key:
         print("ERROR: set BUNNY_ACCESS_KEY environment variable", file=sys.stderr)
         sys.exit(2)
 
-    print(f"Listing files in zone: {args.zone} ...")
-    keys = list_files(args.zone, access_key)
-    if args.limit and args.limit > 0:
-        keys = keys[:args.limit]
-    print(f"Found {len(keys)} files")
-
-    session = requests.Session()
-    results = []
-    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as ex:
-        futures = [ex.submit(download_file, args.zone, key, access_key, args.out, session, args.force) for key in keys]
+    args.to_access_key = os.getenv("BUNNY_DEST_ACCESS_KEY") or access_key
+    args.key_filter = KeyFilter(args.include, args.exclude)
 
-        for f in tqdm(as_completed(futures), total=len(futures), desc="Downloading", unit="file"):
-            try:
-                r = f.result()
-                results.append(r)
-            except Exception as e:
-                results.append({"status": "error", "error": str(e)})
-
-    downloaded = [r for r in results if r.get("status") == "downloaded"]
-    skipped = [r for r in results if r.get("status") == "skipped"]
-    errors = [r for r in results if r.get("status") == "error"]
-    print(f"Downloaded: {len(downloaded)}, Skipped: {len(skipped)}, Errors: {len(errors)}")
-    if errors:
-        print("Errors (first 10):")
-        for e in errors[:10]:
-            print(e)
+    session = make_session(max(args.parallel * max(1, args.segments), args.list_parallel))
+    if args.verify_only:
+        verify_only(args, access_key, session)
+        return
+    if args.to_zone:
+        manifest = ZoneMirror(args.to_zone, args.to_access_key, session, args.list_parallel)
+    else:
+        manifest = SyncManifest(args.out) if args.incremental else None
+    args.archive_writer = None
+    if args.archive:
+        try:
+            args.archive_writer = Archive(args.out, args.shard_size_mb * 1024 * 1024, compress=args.zstd)
+        except ImportError:
+            print("ERROR: --zstd requires zstandard (pip install zstandard)", file=sys.stderr)
+            sys.exit(2)
+    report = RunReport(args.zone, args.report, args.prometheus)
+    complete = False
+    try:
+        complete = sync(args, access_key, session, manifest, report)
+        if manifest is not None and complete:
+            handle_removed(manifest, delete=args.delete_removed)
+    finally:
+        if manifest is not None:
+            manifest.close(complete=complete)
+        if args.archive_writer is not None:
+            args.archive_writer.close()
+        report.close(success=complete)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,398 @@
+"""
+Tests for tools/download_bunny.py, run against the fake Bunny Storage server
+from bench_download_bunny.py.
+
+Usage:
+  python -m pytest tools/test_download_bunny.py
+"""
+
+import argparse
+import array
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+import bench_download_bunny as bench
+import download_bunny as db
+
+
+@pytest.fixture
+def zone(monkeypatch):
+    """A small synthetic zone served locally that also takes DELETEs. Keys in
+    ``zone.failing`` answer 500, keys in ``zone.dropping`` get the connection
+    closed without a response, and Range headers are ignored while
+    ``zone.ranges`` is false."""
+    zone = bench.SyntheticZone(files=4, files_per_dir=2, size_dist="fixed:4k")
+    zone.failing = set()
+    zone.dropping = set()
+    zone.ranges = True
+    handler = bench.make_handler(zone)
+
+    class FailingHandler(handler):
+        def do_GET(self):
+            _, _, rel = self.path.lstrip("/").partition("/")
+            if rel in zone.failing:
+                return self.send_empty(500)
+            if not zone.ranges:
+                del self.headers["Range"]
+            return super().do_GET()
+
+        def do_DELETE(self):
+            _, _, rel = self.path.lstrip("/").partition("/")
+            if rel in zone.dropping:
+                self.close_connection = True
+                return
+            if rel in zone.failing:
+                return self.send_empty(500)
+            if rel not in zone.objects:
+                return self.send_empty(404)
+            del zone.objects[rel]
+            zone.dirs[rel.rpartition("/")[0] + "/"][1].remove(rel)
+            self.send_empty(200)
+
+    server = bench.FakeBunnyServer(("127.0.0.1", 0), FailingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(db, "BUNNY_API_BASE", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setenv("BUNNY_ACCESS_KEY", bench.ACCESS_KEY)
+    yield zone
+    server.shutdown()
+    server.server_close()
+
+
+def run_main(monkeypatch, *args):
+    monkeypatch.setattr(sys, "argv", ["download_bunny.py", "--zone", bench.ZONE, *args])
+    db.main()
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_failed_download_survives_delete_removed(zone, monkeypatch, tmp_path, engine):
+    if engine == "async":
+        pytest.importorskip("httpx")
+    out = str(tmp_path)
+    run_main(monkeypatch, "--out", out, "--incremental", "--engine", engine)
+    key = "proj0/aud0/file0.jpg"
+    path = os.path.join(out, key)
+    with open(path, "rb") as f:
+        original = f.read()
+
+    # The object changes upstream, and fetching the new version fails.
+    size, offset = zone.objects[key]
+    zone.objects[key] = (size + 1, offset)
+    zone._checksum_cache.pop(key, None)
+    zone.failing.add(key)
+    run_main(monkeypatch, "--out", out, "--incremental", "--delete-removed", "--retries", "0", "--engine", engine)
+
+    with open(path, "rb") as f:
+        assert f.read() == original
+    manifest = db.SyncManifest(out)
+    try:
+        assert manifest.conn.execute("SELECT COUNT(*) FROM objects WHERE key = ?", (key,)).fetchone()[0] == 1
+    finally:
+        manifest.close()
+
+
+def test_incremental_check_uses_local_index_sizes(zone, monkeypatch, tmp_path):
+    out = str(tmp_path)
+    run_main(monkeypatch, "--out", out, "--incremental")
+    truncated = "proj0/aud0/file1.jpg"
+    with open(os.path.join(out, truncated), "r+b") as f:
+        f.truncate(100)
+
+    stat_calls = []
+    getsize = os.path.getsize
+
+    def counting_getsize(path):
+        stat_calls.append(path)
+        return getsize(path)
+
+    monkeypatch.setattr(os.path, "getsize", counting_getsize)
+    run_main(monkeypatch, "--out", out, "--incremental")
+
+    assert stat_calls == []
+    with open(os.path.join(out, truncated), "rb") as f:
+        assert f.read() == body(zone, truncated)
+
+
+def test_delete_removed_still_removes_unlisted_keys(zone, monkeypatch, tmp_path):
+    out = str(tmp_path)
+    run_main(monkeypatch, "--out", out, "--incremental")
+    key = "proj0/aud1/file3.jpg"
+    del zone.objects[key]
+    zone.dirs["proj0/aud1/"][1].remove(key)
+    run_main(monkeypatch, "--out", out, "--incremental", "--delete-removed")
+
+    assert not os.path.exists(os.path.join(out, key))
+    assert os.path.exists(os.path.join(out, "proj0/aud1/file2.jpg"))
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_segmented_fallback_removes_part_files(zone, tmp_path, engine):
+    zone.ranges = False
+    out = str(tmp_path)
+    key = "proj0/aud0/file1.jpg"
+    size = zone.objects[key][0]
+    if engine == "async":
+        httpx = pytest.importorskip("httpx")
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await db.download_segmented_async(client, bench.ZONE, key, bench.ACCESS_KEY, out, size, 4)
+
+        r = asyncio.run(run())
+    else:
+        r = db.download_segmented(bench.ZONE, key, bench.ACCESS_KEY, out, db.make_session(4), size, 4)
+
+    path = os.path.join(out, key)
+    assert r["status"] == "downloaded"
+    assert os.path.getsize(path) == size
+    assert not os.path.exists(path + db.PART_SUFFIX)
+    assert not os.path.exists(path + db.PART_SUFFIX + ".json")
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_segmented_download_records_first_segment_ttfb(zone, monkeypatch, tmp_path, engine):
+    out = str(tmp_path)
+    key = "proj0/aud0/file1.jpg"
+    size = zone.objects[key][0]
+    if engine == "async":
+        httpx = pytest.importorskip("httpx")
+        loop_thread = threading.current_thread()
+        writers = []
+        write_segment = db.write_segment
+
+        def recording_write_segment(*args):
+            writers.append(threading.current_thread())
+            return write_segment(*args)
+
+        monkeypatch.setattr(db, "write_segment", recording_write_segment)
+
+        async def run():
+            async with httpx.AsyncClient() as client:
+                return await db.download_segmented_async(client, bench.ZONE, key, bench.ACCESS_KEY, out, size, 4,
+                                                         checksum=zone.checksum(key).lower())
+
+        r = asyncio.run(run())
+        assert writers and loop_thread not in writers
+    else:
+        r = db.download_segmented(bench.ZONE, key, bench.ACCESS_KEY, out, db.make_session(4), size, 4,
+                                  checksum=zone.checksum(key).lower())
+
+    assert r["status"] == "downloaded"
+    assert r["ttfb"] is not None and r["ttfb"] >= 0
+    assert r["transfer"] >= 0
+    with open(os.path.join(out, key), "rb") as f:
+        assert f.read() == body(zone, key)
+
+
+def test_adaptive_limiter_across_event_loops():
+    limiter = db.AdaptiveLimiter(1, initial=1)
+
+    async def transfer():
+        await limiter.acquire_async()
+        await asyncio.sleep(0.01)
+        await limiter.release_async({"status": "downloaded"})
+
+    async def round_():
+        await asyncio.gather(transfer(), transfer())
+
+    # Every retry round runs on its own event loop.
+    for _ in range(3):
+        asyncio.run(round_())
+    assert limiter.active == 0
+
+
+def test_zone_mirror_delete_removed_keeps_going(zone):
+    mirror = db.ZoneMirror(bench.ZONE, bench.ACCESS_KEY, db.make_session(4))
+    zone.failing.add("proj0/aud0/file0.jpg")
+    zone.dropping.add("proj0/aud0/file1.jpg")
+    keys = ["proj0/aud0/file0.jpg", "proj0/aud0/file1.jpg", "proj0/aud1/file2.jpg", "proj0/aud1/gone.jpg"]
+
+    failed = mirror.delete_removed(keys)
+
+    assert [key for key, _ in failed] == keys[:2]
+    assert "proj0/aud1/file2.jpg" not in zone.objects
+
+
+def archive_index(out):
+    with open(os.path.join(out, db.ARCHIVE_INDEX_NAME), encoding="utf-8") as f:
+        return {row["key"]: row for row in map(json.loads, f) if row}
+
+
+def test_extract_member_truncated_shard(zone, monkeypatch, tmp_path):
+    out = str(tmp_path)
+    run_main(monkeypatch, "--out", out, "--archive")
+    rec = archive_index(out)["proj0/aud1/file3.jpg"]
+    # Cut the shard inside the member's tar header.
+    os.truncate(os.path.join(out, rec["shard"]), rec["offset"] + rec["header"] // 2)
+
+    with pytest.raises(IOError, match="truncated"):
+        db.extract_member(out, rec["key"], io.BytesIO())
+
+
+def test_clean_run_removes_stale_failed_list(zone, monkeypatch, tmp_path):
+    out = str(tmp_path)
+    failed_list = os.path.join(out, db.FAILED_LIST_NAME)
+    zone.failing.add("proj0/aud0/file0.jpg")
+    run_main(monkeypatch, "--out", out, "--retries", "0")
+    assert os.path.exists(failed_list)
+
+    # A filtered run only speaks for the keys it covered.
+    zone.failing.clear()
+    run_main(monkeypatch, "--out", out, "--include", "proj0/aud1/")
+    assert os.path.exists(failed_list)
+
+    run_main(monkeypatch, "--out", out)
+    assert not os.path.exists(failed_list)
+
+
+def test_key_filter_match():
+    keys = db.KeyFilter(include=["proj1/", "*.mov"], exclude=["proj1/aud3/", "*/tmp-*"])
+
+    assert keys.match("proj1/aud0/file0.jpg")
+    assert keys.match("proj0/aud0/clip.mov")
+    assert not keys.match("proj0/aud0/file0.jpg")
+    assert not keys.match("proj1/aud3/file0.jpg")
+    assert not keys.match("proj1/aud0/tmp-file0.jpg")
+    assert db.KeyFilter().match("anything") and not db.KeyFilter()
+
+
+def test_key_filter_prunes_unwanted_directories(monkeypatch):
+    zone = bench.SyntheticZone(files=40, files_per_dir=2, size_dist="fixed:1k")
+    listed = []
+    keys = db.KeyFilter(include=["proj1/aud3/"])
+    server = bench.FakeBunnyServer(("127.0.0.1", 0), bench.make_handler(zone))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(db, "BUNNY_API_BASE", f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        entries = db.list_files(bench.ZONE, bench.ACCESS_KEY, workers=4, key_filter=keys,
+                                on_dir=lambda prefix, files, dirs, seconds: listed.append(prefix))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert sorted(listed) == ["", "proj1/", "proj1/aud3/"]
+    assert sorted(e["key"] for e in entries) == ["proj1/aud3/file26.jpg", "proj1/aud3/file27.jpg"]
+
+
+def test_sort_offsets_merges_runs_in_order(monkeypatch):
+    monkeypatch.setattr(db, "SORT_RUN", 7)
+    monkeypatch.setattr(db, "SORT_BLOCK", 3)
+    ranks = array.array("q", [-5, 0, -5, -9, 3, -5, 0, 2, -9, 1] * 5)
+    offsets = array.array("q", range(0, 500, 10))
+
+    ordered = list(db.sort_offsets(ranks, offsets))
+
+    # By rank, and in listing (offset) order among equal ranks.
+    assert ordered == sorted(offsets, key=lambda o: (ranks[o // 10], o))
+
+
+@pytest.mark.parametrize("order", ["largest", "smallest", "listing"])
+def test_spool_listing_order(zone, order):
+    for i, key in enumerate(sorted(zone.objects)):
+        zone.objects[key] = (1000 + 100 * (i % 3), zone.objects[key][1])
+    args = argparse.Namespace(zone=bench.ZONE, limit=0, order=order, list_parallel=1, key_filter=db.KeyFilter())
+
+    spool, offsets, count, complete = db.spool_listing(args, bench.ACCESS_KEY, db.make_session(1))
+    with spool:
+        sizes = [e["length"] for e in db.read_spool(spool, offsets)]
+
+    assert count == 4 and complete
+    if order == "listing":
+        assert offsets is None
+    else:
+        assert sizes == sorted(sizes, reverse=order == "largest")
+
+
+def body(zone, key):
+    return b"".join(zone.body(key))
+
+
+def test_link_file_hardlink_fallback(tmp_path, monkeypatch):
+    source, dest = tmp_path / "a", tmp_path / "b"
+    source.write_bytes(b"content")
+    assert db.link_file(str(source), str(dest)) in ("reflink", "hardlink")
+    assert dest.read_bytes() == b"content"
+
+    # Without reflink support (no fcntl, or a filesystem that refuses FICLONE).
+    monkeypatch.setattr(db, "fcntl", None)
+    os.remove(dest)
+    assert db.link_file(str(source), str(dest)) == "hardlink"
+    assert os.path.samefile(source, dest)
+
+
+def test_dedup_links_duplicates_and_rewrites_without_touching_links(zone, monkeypatch, tmp_path):
+    out = str(tmp_path)
+    first, second = "proj0/aud0/file0.jpg", "proj0/aud1/file2.jpg"
+    zone.objects[second] = zone.objects[first]
+    zone._checksum_cache.clear()
+    monkeypatch.setattr(db, "fcntl", None)  # hardlinks, whatever the filesystem
+    run_main(monkeypatch, "--out", out, "--dedup")
+    assert os.path.samefile(os.path.join(out, first), os.path.join(out, second))
+
+    # The first key changes upstream; rewriting it must not change its link.
+    size, offset = zone.objects[first]
+    zone.objects[first] = (size + 100, (offset + 1) % bench.PATTERN_SIZE)
+    zone._checksum_cache.clear()
+    run_main(monkeypatch, "--out", out, "--dedup")
+
+    with open(os.path.join(out, first), "rb") as f:
+        assert f.read() == body(zone, first)
+    with open(os.path.join(out, second), "rb") as f:
+        assert f.read() == body(zone, second)
+    assert not os.path.samefile(os.path.join(out, first), os.path.join(out, second))
+
+
+@pytest.mark.parametrize("zstd", [False, True])
+def test_archive_extract_round_trip(zone, monkeypatch, tmp_path, zstd):
+    if zstd:
+        pytest.importorskip("zstandard")
+    out = str(tmp_path)
+    # A tiny shard size puts every key in a shard of its own.
+    run_main(monkeypatch, "--out", out, "--archive", "--shard-size-mb", "0", *(["--zstd"] if zstd else []))
+
+    index = archive_index(out)
+    assert sorted(index) == sorted(zone.objects)
+    assert len({rec["shard"] for rec in index.values()}) == len(index)
+    assert all(rec["shard"].endswith(".zst") == zstd for rec in index.values())
+    for key in zone.objects:
+        extracted = io.BytesIO()
+        db.extract_member(out, key, extracted)
+        assert extracted.getvalue() == body(zone, key)
+    with pytest.raises(KeyError):
+        db.extract_member(out, "proj9/missing.jpg", io.BytesIO())
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_checksum_mismatch_is_quarantined_and_fetched_again(zone, monkeypatch, tmp_path, engine):
+    if engine == "async":
+        pytest.importorskip("httpx")
+    out = str(tmp_path)
+    key = "proj0/aud0/file1.jpg"
+    good = body(zone, key)
+    served = zone.body
+    corrupted = []
+
+    def flaky_body(k, start=0, end=None):
+        for block in served(k, start, end):
+            if k == key and not corrupted:
+                corrupted.append(k)
+                block = bytes([block[0] ^ 0xFF]) + block[1:]
+            yield block
+
+    for k in zone.objects:  # the listing's checksums must come from the good bodies
+        zone.checksum(k)
+    monkeypatch.setattr(zone, "body", flaky_body)
+    run_main(monkeypatch, "--out", out, "--retries", "0", "--engine", engine)
+
+    assert corrupted
+    with open(os.path.join(out, key), "rb") as f:
+        assert f.read() == good
+    with open(os.path.join(out, db.QUARANTINE_DIR, key), "rb") as f:
+        quarantined = f.read()
+    assert quarantined != good and len(quarantined) == len(good)
+    assert not os.path.exists(os.path.join(out, db.FAILED_LIST_NAME))